@@ -0,0 +1,49 @@
+import sys
+import tempfile
+import time
+from pathlib import Path
+
+import h5py
+
+import snap_conv
+from synthetic import write_swift
+
+
+class _CountingFile(h5py.File):
+    opens = 0
+
+    def __init__(self, *args, **kwargs):
+        type(self).opens += 1
+        super().__init__(*args, **kwargs)
+
+
+def sweep(data):
+    for ptype in ["gas", "dark_matter", "stars", "black_holes"]:
+        dataset = getattr(data, ptype)
+        for name in list(vars(type(dataset))):
+            if isinstance(getattr(type(dataset), name), property):
+                getattr(dataset, name)
+
+
+def main(num_part=100_000):
+    with tempfile.TemporaryDirectory() as tmp:
+        fname = Path(tmp) / "snap.hdf5"
+        write_swift(fname, num_part=(num_part, num_part, 0, 0, num_part // 10, 10))
+
+        h5py.File = _CountingFile
+        try:
+            start = time.perf_counter()
+            with snap_conv.SwiftFrontend(fname) as data:
+                sweep(data)
+                data.write_as(snap_conv.GadgetFrontend, Path(tmp) / "out.hdf5")
+            elapsed = time.perf_counter() - start
+        finally:
+            h5py.File = _CountingFile.__bases__[0]
+
+    # The output file accounts for one of the opens.
+    print(f"file opens: {_CountingFile.opens}")
+    print(f"sweep + write_as: {elapsed:.3f} s")
+
+
+if __name__ == "__main__":
+    main(*map(int, sys.argv[1:]))
@@ -0,0 +1,70 @@
+import os
+import statistics
+import subprocess
+import sys
+import tempfile
+import time
+from pathlib import Path
+
+from synthetic import write_swift
+
+ROOT = Path(__file__).resolve().parent.parent
+
+# Budgets, in milliseconds, for the median of each measurement.
+IMPORT_BUDGET = 50
+HEADER_OPEN_BUDGET = 20
+
+
+def _python(code: str) -> float:
+    out = subprocess.check_output(
+        [sys.executable, "-c", code],
+        cwd=ROOT,
+        env={**os.environ, "PYTHONPATH": str(ROOT)},
+    )
+    return float(out)
+
+
+def import_time() -> float:
+    # A fresh interpreter each time, as for a newly spawned worker.
+    return _python(
+        "import time; t = time.perf_counter(); import snap_conv; "
+        "print((time.perf_counter() - t) * 1e3)"
+    )
+
+
+def open_time(fname, **kwargs) -> float:
+    import snap_conv
+
+    start = time.perf_counter()
+    with snap_conv.SwiftFrontend(fname, **kwargs) as data:
+        data.header.num_part
+    return (time.perf_counter() - start) * 1e3
+
+
+def main(repeat=10):
+    results = {}
+    results["import snap_conv"] = [import_time() for _ in range(repeat)]
+    with tempfile.TemporaryDirectory() as tmp:
+        fname = Path(tmp) / "snap.hdf5"
+        write_swift(fname, num_part=(1000, 1000, 0, 0, 100, 10))
+        open_time(fname)  # warm up h5py and unyt
+        results["open"] = [open_time(fname) for _ in range(repeat)]
+        results["open, header_only"] = [
+            open_time(fname, header_only=True) for _ in range(repeat)
+        ]
+
+    for name, times in results.items():
+        print(f"{name}: {statistics.median(times):.2f} ms")
+
+    failed = []
+    if statistics.median(results["import snap_conv"]) > IMPORT_BUDGET:
+        failed.append("import")
+    if statistics.median(results["open, header_only"]) > HEADER_OPEN_BUDGET:
+        failed.append("header_only open")
+    if failed:
+        print("over budget: " + ", ".join(failed))
+        sys.exit(1)
+
+
+if __name__ == "__main__":
+    main(*map(int, sys.argv[1:]))
@@ -0,0 +1,227 @@
+"""Benchmark suite for the frontends, writing machine-readable results.
+
+    python run.py --num-part 1000000 --output results.json
+    python run.py --compare baseline.json
+
+Run from this directory with the package importable (e.g. PYTHONPATH=..).
+"""
+
+import argparse
+import json
+import platform
+import statistics
+import sys
+import tempfile
+import time
+from pathlib import Path
+
+import h5py
+import numpy as np
+
+import snap_conv
+from snap_conv.util import git_version
+from synthetic import write_gadget, write_swift
+
+_writers = {"swift": write_swift, "gadget": write_gadget}
+_frontends = {"swift": "SwiftFrontend", "gadget": "GadgetFrontend"}
+
+
+def _time(fn, repeat):
+    times = []
+    for _ in range(repeat):
+        start = time.perf_counter()
+        fn()
+        times.append(time.perf_counter() - start)
+    return dict(median_s=statistics.median(times), min_s=min(times), repeat=len(times))
+
+
+def bench_open(fname, frontend, repeat):
+    def open_eager():
+        frontend(fname).close()
+
+    def open_header():
+        frontend(fname, header_only=True).close()
+
+    return {
+        "open": _time(open_eager, repeat),
+        "open_header_only": _time(open_header, repeat),
+    }
+
+
+def bench_access(fname, frontend, repeat):
+    def first():
+        with frontend(fname) as data:
+            data.gas.Coordinates[:]
+
+    data = frontend(fname)
+    data.gas.Coordinates[:]
+
+    def second():
+        data.gas.Coordinates[:]
+
+    results = {
+        "first_access": _time(first, repeat),
+        "second_access": _time(second, repeat),
+    }
+    data.close()
+    return results
+
+
+def bench_eviction(fname, frontend, repeat):
+    # Cycle through every gas field with room for about half of them.
+    with frontend(fname) as probe:
+        fields = list(probe.gas._fields)
+        total = sum(
+            int(np.prod(shape)) * dtype.itemsize
+            for shape, dtype in probe.gas._fields.values()
+        )
+    data = frontend(fname, cache_size=total // 2)
+
+    def sweep():
+        for _ in range(2):
+            for name in fields:
+                data.gas.load(name)
+
+    result = _time(sweep, repeat)
+    stats = data.cache_stats
+    result.update(hit_rate=stats.hit_rate, evictions=stats.evictions)
+    data.close()
+    return {"cache_eviction": result}
+
+
+def bench_slices(fname, frontend, repeat, seed=0):
+    rng = np.random.default_rng(seed)
+    data = frontend(fname, cache_size=0)
+    n = len(data.gas.Coordinates)
+    width = max(1, n // 100)
+    starts = rng.integers(0, max(1, n - width), 100)
+    rows = np.sort(rng.choice(n, size=min(n, 10_000), replace=False))
+
+    def slices():
+        for start in starts:
+            data.gas.Coordinates[start : start + width]
+
+    def index():
+        data.gas.Coordinates[rows]
+
+    results = {
+        "sliced_reads": _time(slices, repeat),
+        "index_read": _time(index, repeat),
+    }
+    data.close()
+    return results
+
+
+def bench_ids(fname, frontend, repeat, seed=0):
+    # Follow 1% of the gas, as when tracking particles between snapshots.
+    rng = np.random.default_rng(seed)
+    data = frontend(fname, cache_size=0)
+    ids = data.gas.ParticleIDs[:]
+    tracked = rng.choice(ids, size=max(1, len(ids) // 100), replace=False)
+
+    def build():
+        data.build_id_index(save=False)
+
+    def select():
+        data.select_by_ids(tracked, ["Coordinates", "Masses"], ptypes=["gas"])
+
+    results = {
+        "build_id_index": _time(build, repeat),
+        "select_by_ids": _time(select, repeat),
+    }
+    data.close()
+    return results
+
+
+def bench_write(fname, frontend, target, tmp, repeat):
+    out = Path(tmp) / "out.hdf5"
+
+    def whole():
+        with frontend(fname) as data:
+            data.write_as(target, out)
+
+    def streamed():
+        with frontend(fname) as data:
+            data.write_as(target, out, chunk_bytes=16 * 1024**2)
+
+    return {
+        f"write_as_{target.__name__}": _time(whole, repeat),
+        f"write_as_{target.__name__}_streamed": _time(streamed, repeat),
+    }
+
+
+def run(num_part, repeat, formats, compression=None):
+    counts = (num_part, num_part, 0, 0, num_part // 10, max(1, num_part // 1000))
+    results = {}
+    with tempfile.TemporaryDirectory() as tmp:
+        for fmt in formats:
+            fname = Path(tmp) / f"{fmt}.hdf5"
+            _writers[fmt](fname, num_part=counts, compression=compression)
+            frontend = getattr(snap_conv, _frontends[fmt])
+            other = getattr(
+                snap_conv, _frontends["gadget" if fmt == "swift" else "swift"]
+            )
+            cases = {}
+            cases.update(bench_open(fname, frontend, repeat))
+            cases.update(bench_access(fname, frontend, repeat))
+            cases.update(bench_eviction(fname, frontend, repeat))
+            cases.update(bench_slices(fname, frontend, repeat))
+            cases.update(bench_ids(fname, frontend, repeat))
+            cases.update(bench_write(fname, frontend, other, tmp, repeat))
+            for name, result in cases.items():
+                results[f"{fmt}/{name}"] = result
+    return results
+
+
+def environment():
+    return dict(
+        snap_conv=snap_conv.__version__,
+        git=git_version(),
+        python=platform.python_version(),
+        numpy=np.__version__,
+        h5py=h5py.version.version,
+        hdf5=h5py.version.hdf5_version,
+        platform=platform.platform(),
+    )
+
+
+def compare(results, baseline):
+    for name, result in results.items():
+        if name not in baseline:
+            continue
+        ratio = result["median_s"] / baseline[name]["median_s"]
+        flag = "  slower" if ratio > 1.1 else "  faster" if ratio < 0.9 else ""
+        print(f"{name:<50} {ratio:6.2f}x{flag}")
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--num-part", type=int, default=100_000)
+    parser.add_argument("--repeat", type=int, default=5)
+    parser.add_argument("--format", choices=list(_writers), action="append")
+    parser.add_argument("--compression", default=None)
+    parser.add_argument("--output", type=Path)
+    parser.add_argument("--compare", type=Path, help="earlier results to compare to")
+    args = parser.parse_args(argv)
+
+    results = run(
+        args.num_part, args.repeat, args.format or list(_writers), args.compression
+    )
+    report = dict(
+        environment=environment(),
+        params=dict(
+            num_part=args.num_part, repeat=args.repeat, compression=args.compression
+        ),
+        results=results,
+    )
+    text = json.dumps(report, indent=2)
+    if args.output is not None:
+        args.output.write_text(text + "\n")
+    else:
+        print(text)
+    if args.compare is not None:
+        compare(results, json.loads(args.compare.read_text())["results"])
+
+
+if __name__ == "__main__":
+    main(sys.argv[1:])
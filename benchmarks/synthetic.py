@@ -0,0 +1,291 @@
+import h5py
+import numpy as np
+
+_cgs_name = "Conversion factor to CGS (not including cosmological corrections)"
+
+# name -> (trailing shape, dtype, CGS factor, (I, L, M, T, t) exponents)
+_swift_fields = dict(
+    ParticleIDs=((), np.uint64, 1.0, (0, 0, 0, 0, 0)),
+    Coordinates=((3,), np.float64, 3.08567758e24, (0, 1, 0, 0, 0)),
+    Velocities=((3,), np.float32, 1e5, (0, 1, 0, 0, -1)),
+    Masses=((), np.float32, 1.98841e43, (0, 0, 1, 0, 0)),
+)
+_swift_gas_fields = dict(
+    Densities=((), np.float32, 6.76989e-31, (0, -3, 1, 0, 0)),
+    InternalEnergies=((), np.float32, 1e10, (0, 2, 0, 0, -2)),
+    SmoothingLengths=((), np.float32, 3.08567758e24, (0, 1, 0, 0, 0)),
+    StarFormationRates=((), np.float32, 6.30e25, (0, 0, 1, 0, -1)),
+)
+_swift_star_fields = dict(
+    SmoothingLengths=((), np.float32, 3.08567758e24, (0, 1, 0, 0, 0)),
+    InitialMasses=((), np.float32, 1.98841e43, (0, 0, 1, 0, 0)),
+    BirthScaleFactors=((), np.float32, 1.0, (0, 0, 0, 0, 0)),
+)
+_swift_bh_fields = dict(
+    SmoothingLengths=((), np.float32, 3.08567758e24, (0, 1, 0, 0, 0)),
+    SubgridMasses=((), np.float32, 1.98841e43, (0, 0, 1, 0, 0)),
+    AccretionRates=((), np.float32, 6.30e25, (0, 0, 1, 0, -1)),
+)
+_swift_extra = {0: _swift_gas_fields, 4: _swift_star_fields, 5: _swift_bh_fields}
+
+_binary_header = np.dtype(
+    [
+        ("npart", "i4", 6),
+        ("massarr", "f8", 6),
+        ("time", "f8"),
+        ("redshift", "f8"),
+        ("flag_sfr", "i4"),
+        ("flag_feedback", "i4"),
+        ("npartTotal", "u4", 6),
+        ("flag_cooling", "i4"),
+        ("num_files", "i4"),
+        ("BoxSize", "f8"),
+        ("Omega0", "f8"),
+        ("OmegaLambda", "f8"),
+        ("HubbleParam", "f8"),
+        ("flag_stellarage", "i4"),
+        ("flag_metals", "i4"),
+        ("npartTotalHighWord", "u4", 6),
+        ("flag_entropy_instead_u", "i4"),
+    ]
+)
+
+# name -> (trailing shape, dtype), in GadgetFrontend's units.
+_gadget_fields = dict(
+    ParticleIDs=((), np.uint64),
+    Coordinates=((3,), np.float32),
+    Velocities=((3,), np.float32),
+    Masses=((), np.float32),
+)
+_gadget_extra = {
+    0: dict(
+        Density=((), np.float32),
+        InternalEnergy=((), np.float32),
+        SmoothingLength=((), np.float32),
+        StarFormationRate=((), np.float32),
+    ),
+    4: dict(
+        SmoothingLength=((), np.float32),
+        InitialMass=((), np.float32),
+        StellarFormationTime=((), np.float32),
+    ),
+    5: dict(
+        SmoothingLength=((), np.float32),
+        Mdot=((), np.float32),
+    ),
+}
+
+
+def _particle_data(name, shape, dtype, n, coordinates, first_id, rng):
+    if name == "ParticleIDs":
+        return np.arange(n, dtype=dtype) + first_id
+    if name == "Coordinates":
+        return coordinates.astype(dtype)
+    return rng.uniform(0, 1, (n, *shape)).astype(dtype)
+
+
+def _selected(fields, name):
+    # Coordinates are always written, since the frontends need them.
+    return fields is None or name in fields or name == "Coordinates"
+
+
+def write_swift(
+    fname,
+    num_part=(1000, 1000, 0, 0, 100, 10),
+    box_size=25.0,
+    seed=0,
+    cells=None,
+    fields=None,
+    compression=None,
+):
+    """Write a SWIFT-layout snapshot of uniformly random particles.
+
+    `box_size` is in Mpc. `fields` restricts the written fields to those
+    names, and `compression` is passed on to every dataset.
+    """
+    rng = np.random.default_rng(seed)
+    num_part = np.asarray(num_part, dtype=np.uint64)
+    with h5py.File(fname, "w") as f:
+        header = f.create_group("Header").attrs
+        header["BoxSize"] = np.full(3, box_size)
+        header["NumFilesPerSnapshot"] = [1]
+        header["NumPart_ThisFile"] = num_part
+        header["NumPart_Total"] = num_part
+        header["NumPart_Total_HighWord"] = np.zeros_like(num_part)
+        header["Redshift"] = [0.0]
+        header["Scale-factor"] = [1.0]
+
+        cosmo = f.create_group("Cosmology").attrs
+        cosmo["H0 [internal units]"] = [67.11]
+        cosmo["Omega_b"] = [0.049]
+        cosmo["Omega_cdm"] = [0.2685]
+        cosmo["Omega_lambda"] = [0.6825]
+        cosmo["Omega_m"] = [0.3175]
+
+        if cells is not None:
+            cell_group = f.create_group("Cells")
+            size = box_size / cells
+            grid = (np.indices((cells,) * 3).reshape(3, -1).T + 0.5) * size
+            cell_group["Centres"] = grid
+            meta = cell_group.create_group("Meta-data").attrs
+            meta["size"] = np.full(3, size)
+            meta["dimension"] = np.full(3, cells)
+            cell_group.create_group("Counts")
+            cell_group.create_group("OffsetsInFile")
+
+        for i, n in enumerate(num_part):
+            if n == 0:
+                continue
+            n = int(n)
+            group = f.create_group(f"PartType{i}")
+            coordinates = rng.uniform(0, box_size, (n, 3))
+            if cells is not None:
+                # SWIFT stores particles grouped by their top-level cell.
+                index = np.ravel_multi_index(
+                    (coordinates // (box_size / cells)).astype(int).T, (cells,) * 3
+                )
+                coordinates = coordinates[np.argsort(index, kind="stable")]
+                counts = np.bincount(index, minlength=cells**3)
+                cell_group["Counts"][f"PartType{i}"] = counts
+                offsets = np.concatenate([[0], np.cumsum(counts)[:-1]])
+                cell_group["OffsetsInFile"][f"PartType{i}"] = offsets
+
+            all_fields = dict(_swift_fields, **_swift_extra.get(i, {}))
+            for name, (shape, dtype, factor, exponents) in all_fields.items():
+                if not _selected(fields, name):
+                    continue
+                data = _particle_data(
+                    name, shape, dtype, n, coordinates, int(num_part[:i].sum()), rng
+                )
+                group.create_dataset(name, data=data, compression=compression)
+                attrs = group[name].attrs
+                attrs[_cgs_name] = [factor]
+                for c, e in zip("ILMTt", exponents):
+                    attrs[f"U_{c} exponent"] = [float(e)]
+
+
+def write_gadget(
+    fname,
+    num_part=(1000, 1000, 0, 0, 100, 10),
+    box_size=25.0,
+    seed=0,
+    h=0.6711,
+    fields=None,
+    compression=None,
+):
+    """Write a Gadget-layout snapshot, with the same arguments as `write_swift`."""
+    rng = np.random.default_rng(seed)
+    num_part = np.asarray(num_part, dtype=np.uint64)
+    # GadgetFrontend works in kpc/h.
+    box = box_size * 1000 * h
+    with h5py.File(fname, "w") as f:
+        header = f.create_group("Header").attrs
+        header["BoxSize"] = box
+        header["HubbleParam"] = h
+        header["MassTable"] = np.zeros(6)
+        header["NumFilesPerSnapshot"] = 1
+        header["NumPart_ThisFile"] = num_part
+        header["NumPart_Total"] = num_part
+        header["NumPart_Total_HighWord"] = np.zeros_like(num_part)
+        header["Omega0"] = 0.3175
+        header["OmegaLambda"] = 0.6825
+        header["Redshift"] = 0.0
+        header["Time"] = 1.0
+
+        for i, n in enumerate(num_part):
+            if n == 0:
+                continue
+            n = int(n)
+            group = f.create_group(f"PartType{i}")
+            coordinates = rng.uniform(0, box, (n, 3))
+            all_fields = dict(_gadget_fields, **_gadget_extra.get(i, {}))
+            for name, (shape, dtype) in all_fields.items():
+                if not _selected(fields, name):
+                    continue
+                data = _particle_data(
+                    name, shape, dtype, n, coordinates, int(num_part[:i].sum()), rng
+                )
+                group.create_dataset(name, data=data, compression=compression)
+
+
+def write_gadget_binary(
+    fname,
+    num_part=(1000, 1000, 0, 0, 100, 10),
+    box_size=25.0,
+    seed=0,
+    h=0.6711,
+    snap_format=2,
+    endian="<",
+    num_files=1,
+    mass_table=(0, 0, 0, 0, 0, 0),
+):
+    """Write a Gadget-2 binary snapshot, split into `fname.0`, `fname.1`, ...
+    when `num_files > 1`."""
+    rng = np.random.default_rng(seed)
+    num_part = np.asarray(num_part, dtype=np.int64)
+    box = box_size * 1000 * h
+    order = "little" if endian == "<" else "big"
+    bounds = np.linspace(0, num_part, num_files + 1).astype(np.int64)
+    ids = np.arange(num_part.sum(), dtype=np.uint32)
+    ranges = np.concatenate([[0], np.cumsum(num_part)])
+
+    header = np.zeros((), dtype=_binary_header)
+    header["massarr"] = mass_table
+    header["npartTotal"] = num_part
+    header["num_files"] = num_files
+    header["BoxSize"] = box
+    header["Omega0"] = 0.3175
+    header["OmegaLambda"] = 0.6825
+    header["HubbleParam"] = h
+    header["time"] = 1.0
+
+    # (label, particle types, components, dtype)
+    blocks = [
+        ("POS", range(6), 3, "f4"),
+        ("VEL", range(6), 3, "f4"),
+        ("ID", range(6), 1, "u4"),
+        ("MASS", [t for t in range(6) if mass_table[t] == 0], 1, "f4"),
+        ("U", [0], 1, "f4"),
+        ("RHO", [0], 1, "f4"),
+        ("HSML", [0], 1, "f4"),
+    ]
+    if snap_format == 2:
+        blocks.append(("AGE", [4], 1, "f4"))
+    data = {}
+    for label, types, components, dtype in blocks:
+        for t in types:
+            shape = (int(num_part[t]), components) if components > 1 else num_part[t]
+            if label == "POS":
+                values = rng.uniform(0, box, shape)
+            elif label == "ID":
+                values = ids[ranges[t] : ranges[t + 1]]
+            else:
+                values = rng.uniform(0, 1, shape)
+            data[(label, t)] = values.astype(endian + dtype)
+
+    def record(f, payload: bytes):
+        marker = len(payload).to_bytes(4, order)
+        f.write(marker + payload + marker)
+
+    names = [fname] if num_files == 1 else [f"{fname}.{i}" for i in range(num_files)]
+    for i, name in enumerate(names):
+        this = bounds[i + 1] - bounds[i]
+        header["npart"] = this
+        with open(name, "wb") as f:
+            for label, types, components, dtype in [("HEAD", [], 1, "")] + blocks:
+                parts = [
+                    data[(label, t)][bounds[i][t] : bounds[i + 1][t]]
+                    for t in types
+                    if this[t] > 0
+                ]
+                if label != "HEAD" and not parts:
+                    continue
+                if label == "HEAD":
+                    payload = header.astype(_binary_header.newbyteorder(endian))
+                    payload = payload.tobytes().ljust(256, b"\0")
+                else:
+                    payload = b"".join(p.tobytes() for p in parts)
+                if snap_format == 2:
+                    size = (len(payload) + 8).to_bytes(4, order)
+                    record(f, label.ljust(4).encode() + size)
+                record(f, payload)
@@ -1,5 +1,41 @@
-from . import frontends
-from .frontends import GadgetFrontend, Hdf5Frontend, SwiftFrontend
+import importlib
 
 __version__ = "0.1.0"
-__all__ = ["frontends", "Hdf5Frontend", "SwiftFrontend", "GadgetFrontend"]
+__all__ = [
+    "frontends",
+    "Hdf5Frontend",
+    "SwiftFrontend",
+    "GadgetFrontend",
+    "GadgetBinaryFrontend",
+    "FieldStorage",
+    "StoragePolicy",
+    "DtypePolicy",
+    "DerivedField",
+    "shared_cache",
+    "DiskCache",
+    "Instruments",
+    "ChromeTrace",
+    "SnapshotSeries",
+    "load",
+    "detect_format",
+    "BatchConverter",
+    "convert_many",
+]
+# Names not found in `frontends`.
+_modules = {"BatchConverter": ".batch", "convert_many": ".batch"}
+
+
+def __getattr__(name: str):
+    # Keep `import snap_conv` cheap: h5py and unyt load with the first frontend.
+    if name == "frontends":
+        return importlib.import_module(".frontends", __name__)
+    if name in __all__:
+        module = importlib.import_module(_modules.get(name, ".frontends"), __name__)
+        value = getattr(module, name)
+        globals()[name] = value
+        return value
+    raise AttributeError(f"module {__name__!r} has no attribute {name!r}")
+
+
+def __dir__():
+    return sorted([*globals(), *__all__])
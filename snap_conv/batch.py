@@ -0,0 +1,363 @@
+import json
+import os
+import shutil
+import time
+from concurrent.futures import FIRST_COMPLETED, ProcessPoolExecutor, wait
+from dataclasses import dataclass
+from typing import Any, Callable, Dict, Iterable, List, Optional, Tuple
+
+import h5py
+import numpy as np
+
+from .frontends.detect import detect_format
+from .frontends.files import _binary_piece, _piece, is_later_piece, snapshot_files
+from .frontends.spatial import file_stamps
+
+MANIFEST = "snap_conv-manifest.json"
+_partial = ".partial"
+# Files written next to snapshots by the frontends.
+_sidecars = (".blocks.json", ".sindex.hdf5", ".idindex.hdf5")
+
+
+@dataclass(kw_only=True, slots=True)
+class Job:
+    source: str
+    frontend: type
+    # Relative to the output directory.
+    output: str
+    # Peak memory the conversion is expected to use, in bytes.
+    nbytes: int = 0
+    chunk_bytes: Optional[int] = None
+
+
+@dataclass(kw_only=True, slots=True)
+class JobResult:
+    source: str
+    output: str
+    # "converted", "skipped" or "failed".
+    status: str
+    seconds: float = 0.0
+    error: Optional[str] = None
+
+
+def _output_name(name: str) -> str:
+    for pattern in (_piece, _binary_piece):
+        if (match := pattern.match(name)) is not None:
+            return match["base"] + ".hdf5"
+    return name.removesuffix(".hdf5") + ".hdf5"
+
+
+def discover(paths: Iterable, exclude: Iterable = ()) -> List[Tuple[str, type, str]]:
+    """Find the snapshots in `paths` (files or directory trees), returning
+    (file, frontend class, output name) for each, in a stable order.
+
+    Output names are relative to the directory searched, with multi-file
+    snapshots named after their base name.
+    """
+    exclude = {os.path.abspath(os.fsdecode(p)) for p in exclude}
+    found = []
+    for path in map(os.fsdecode, paths):
+        if os.path.isdir(path):
+            candidates = []
+            for root, dirs, files in os.walk(path):
+                dirs[:] = sorted(
+                    d
+                    for d in dirs
+                    if not d.startswith(".")
+                    and os.path.abspath(os.path.join(root, d)) not in exclude
+                )
+                candidates += [os.path.join(root, f) for f in sorted(files)]
+            rel = lambda f: os.path.relpath(f, path)
+        else:
+            candidates = [path]
+            rel = os.path.basename
+        for fname in candidates:
+            name = os.path.basename(fname)
+            if (
+                name.startswith(".")
+                or name == MANIFEST
+                or name.endswith(_sidecars)
+                or is_later_piece(fname)
+            ):
+                continue
+            try:
+                cls = detect_format(fname)
+            except OSError:
+                cls = None
+            if cls is not None:
+                out = rel(fname)
+                found.append(
+                    (fname, cls, os.path.join(os.path.dirname(out), _output_name(name)))
+                )
+    return found
+
+
+def _peak_nbytes(source, target, workers: int, chunk_bytes: Optional[int]) -> int:
+    # The largest field is held once as read and once converted.
+    largest = 0
+    for group, fields in target.output_fields.items():
+        if (particles := source.particles(group)) is None:
+            continue
+        for names in fields:
+            name = next((n for n in names if particles.has(n)), None)
+            if name is None:
+                continue
+            if (info := particles.field_info(name)) is not None:
+                largest = max(largest, int(np.prod(info[0])) * info[1].itemsize)
+    if chunk_bytes is not None:
+        largest = min(largest, chunk_bytes)
+    return 2 * largest * max(1, workers)
+
+
+def _check_output(target: type, paths: List[str], num_part: List[int]):
+    """Raises ValueError unless every piece of the snapshot starting at
+    `paths[0]` exists and each of its datasets holds, summed over the
+    pieces, one row per particle of its type in the source."""
+    with h5py.File(paths[0], "r") as f:
+        pieces = snapshot_files(paths[0], f)
+    if missing := [p for p in pieces if not os.path.exists(p)]:
+        raise ValueError(f"missing pieces of the output: {missing}")
+    rows: Dict[Tuple[str, str], int] = {}
+    for piece in pieces:
+        with h5py.File(piece, "r") as f:
+            for group in f:
+                if not group.startswith("PartType"):
+                    continue
+                for name, dataset in f[group].items():
+                    if isinstance(dataset, h5py.Dataset):
+                        key = (group, name)
+                        rows[key] = rows.get(key, 0) + len(dataset)
+    for group in target.output_fields:
+        if num_part[int(group[8:])] and not any(g == group for g, _ in rows):
+            raise ValueError(f"{group} is missing from the output")
+    for (group, name), n in rows.items():
+        if n != num_part[int(group[8:])]:
+            raise ValueError(
+                f"{group}/{name} has {n} rows, the source"
+                f" {num_part[int(group[8:])]} particles"
+            )
+
+
+def _convert(job: Job, target: type, tmp: str, kwargs: Dict[str, Any]):
+    start = time.perf_counter()
+    try:
+        shutil.rmtree(tmp, ignore_errors=True)
+        os.makedirs(tmp)
+        if job.chunk_bytes is not None:
+            kwargs = {**kwargs, "chunk_bytes": job.chunk_bytes}
+        with job.frontend(job.source, cache_size=0) as source:
+            source_files = list(source.files)
+            num_part = np.asarray(source.header.num_part).tolist()
+            source.write_as(
+                target, os.path.join(tmp, os.path.basename(job.output)), **kwargs
+            )
+        files = sorted(os.listdir(tmp))
+        _check_output(target, [os.path.join(tmp, f) for f in files], num_part)
+    except Exception as e:
+        return None, f"{type(e).__name__}: {e}", time.perf_counter() - start
+    return (source_files, files, num_part), None, time.perf_counter() - start
+
+
+class BatchConverter:
+    """Converts many snapshots to one format, in parallel processes.
+
+    Finished outputs are recorded in a manifest in the output directory,
+    along with the sizes and modification times of their sources and
+    outputs, so that a rerun skips them and an interrupted run resumes where
+    it stopped. Conversions are written under `.partial/` and only moved
+    into place once every piece is there and each dataset has as many rows
+    as the source has particles of its type.
+    """
+
+    def __init__(
+        self,
+        target: type,
+        output_dir,
+        workers: Optional[int] = None,
+        memory_budget: Optional[int] = None,
+        overwrite: bool = False,
+        progress: Optional[Callable[[JobResult], None]] = None,
+        **write_kwargs,
+    ):
+        target.check_writable()
+        self.target = target
+        self.output_dir = os.fsdecode(output_dir)
+        self.workers = workers or os.cpu_count() or 1
+        self.memory_budget = memory_budget
+        self.overwrite = overwrite
+        self.progress = progress
+        self.write_kwargs = write_kwargs
+        self._manifest_path = os.path.join(self.output_dir, MANIFEST)
+        self.manifest: Dict[str, Dict[str, Any]] = {}
+        try:
+            with open(self._manifest_path) as f:
+                self.manifest = json.load(f)
+        except FileNotFoundError:
+            pass
+
+    @property
+    def _options(self) -> Dict[str, str]:
+        # Options that change the output; the parallelism does not.
+        options = {
+            k: repr(v)
+            for k, v in sorted(self.write_kwargs.items())
+            if k not in ("workers", "executor")
+        }
+        return {"target": self.target.__name__, **options}
+
+    def is_done(self, output: str) -> bool:
+        """Whether `output` was converted by an earlier run with the same
+        options, and neither it nor its source have changed since."""
+        entry = self.manifest.get(output)
+        if entry is None or entry["options"] != self._options:
+            return False
+        files = [os.path.join(self.output_dir, f) for f in entry["files"]]
+        try:
+            if (
+                file_stamps(entry["source_files"]).tolist() != entry["source_stamps"]
+                or file_stamps(files).tolist() != entry["stamps"]
+            ):
+                return False
+            _check_output(self.target, files, entry["num_part"])
+            return True
+        except (OSError, KeyError, ValueError):
+            return False
+
+    def plan(self, paths: Iterable) -> Tuple[List[Job], List[JobResult]]:
+        jobs, skipped = [], []
+        budget = self.memory_budget
+        job_workers = self.write_kwargs.get("workers") or 1
+        chunk_bytes = self.write_kwargs.get("chunk_bytes")
+        outputs = set()
+        for fname, cls, output in discover(paths, exclude=[self.output_dir]):
+            if output in outputs:
+                raise ValueError(f"two snapshots would both be written to {output}")
+            outputs.add(output)
+            if not self.overwrite and self.is_done(output):
+                skipped.append(JobResult(source=fname, output=output, status="skipped"))
+                continue
+            job = Job(source=fname, frontend=cls, output=output)
+            with cls(fname, header_only=True) as source:
+                job.nbytes = _peak_nbytes(source, self.target, job_workers, chunk_bytes)
+            if budget is not None and job.nbytes > budget and chunk_bytes is None:
+                # Too large to convert whole within the budget: stream it.
+                job.chunk_bytes = max(1, budget // (2 * job_workers))
+                job.nbytes = budget
+            jobs.append(job)
+        return jobs, skipped
+
+    def run(self, paths: Iterable) -> List[JobResult]:
+        os.makedirs(self.output_dir, exist_ok=True)
+        jobs, results = self.plan(paths)
+        for result in results:
+            self._report(result)
+        if self.workers <= 1 or len(jobs) <= 1:
+            for job in jobs:
+                results.append(self._finish(job, *_convert(job, *self._args(job))))
+        else:
+            results += self._run_pool(jobs)
+        shutil.rmtree(os.path.join(self.output_dir, _partial), ignore_errors=True)
+        return results
+
+    def _args(self, job: Job):
+        tmp = os.path.join(self.output_dir, _partial, job.output)
+        return self.target, tmp, self.write_kwargs
+
+    def _run_pool(self, jobs: List[Job]) -> List[JobResult]:
+        # Start jobs in order while their estimated peak memory fits in the
+        # budget; one job always runs, however large.
+        budget = self.memory_budget
+        pending = list(jobs)
+        running = {}
+        in_use = 0
+        results = []
+        with ProcessPoolExecutor(min(self.workers, len(jobs))) as pool:
+            try:
+                while pending or running:
+                    while pending and len(running) < self.workers:
+                        job = next(
+                            (
+                                j
+                                for j in pending
+                                if not running
+                                or budget is None
+                                or in_use + j.nbytes <= budget
+                            ),
+                            None,
+                        )
+                        if job is None:
+                            break
+                        pending.remove(job)
+                        running[pool.submit(_convert, job, *self._args(job))] = job
+                        in_use += job.nbytes
+                    done, _ = wait(running, return_when=FIRST_COMPLETED)
+                    for future in done:
+                        job = running.pop(future)
+                        in_use -= job.nbytes
+                        results.append(self._finish(job, *future.result()))
+            except BaseException:
+                pool.shutdown(wait=False, cancel_futures=True)
+                raise
+        return results
+
+    def _finish(self, job: Job, written, error: Optional[str], seconds: float):
+        result = JobResult(
+            source=job.source, output=job.output, status="failed", seconds=seconds
+        )
+        if written is None:
+            result.error = error
+            self._report(result)
+            return result
+
+        source_files, files, num_part = written
+        tmp = self._args(job)[1]
+        directory = os.path.dirname(job.output)
+        os.makedirs(os.path.join(self.output_dir, directory), exist_ok=True)
+        files = [os.path.join(directory, f) for f in files]
+        for f in files:
+            os.replace(
+                os.path.join(tmp, os.path.basename(f)),
+                os.path.join(self.output_dir, f),
+            )
+        # An earlier conversion may have been split into more files.
+        previous = self.manifest.pop(job.output, {})
+        for f in set(previous.get("files", ())) - set(files):
+            try:
+                os.remove(os.path.join(self.output_dir, f))
+            except FileNotFoundError:
+                pass
+        self.manifest[job.output] = dict(
+            source_files=[os.path.abspath(f) for f in source_files],
+            source_stamps=file_stamps(source_files).tolist(),
+            options=self._options,
+            files=files,
+            stamps=file_stamps(
+                [os.path.join(self.output_dir, f) for f in files]
+            ).tolist(),
+            num_part=num_part,
+        )
+        self._save_manifest()
+        result.status = "converted"
+        self._report(result)
+        return result
+
+    def _save_manifest(self):
+        tmp = self._manifest_path + ".tmp"
+        with open(tmp, "w") as f:
+            json.dump(self.manifest, f, indent=1)
+        os.replace(tmp, self._manifest_path)
+
+    def _report(self, result: JobResult):
+        if self.progress is not None:
+            self.progress(result)
+
+
+def convert_many(paths, target: type, output_dir, **kwargs) -> List[JobResult]:
+    """Convert every snapshot found in `paths` to `target`, into `output_dir`.
+
+    See `BatchConverter` for the keyword arguments; the remaining ones are
+    passed on to `write`.
+    """
+    if isinstance(paths, (str, bytes, os.PathLike)):
+        paths = [paths]
+    return BatchConverter(target, output_dir, **kwargs).run(paths)
@@ -0,0 +1,113 @@
+"""Convert snapshots between formats from the shell.
+
+snap-conv convert ./output -o ./converted --to gadget -j 8 --memory 64G
+snap-conv info snap_0090.hdf5
+"""
+
+import argparse
+import re
+import sys
+
+_targets = {
+    "swift": "SwiftFrontend",
+    "gadget": "GadgetFrontend",
+}
+_suffixes = {"": 1, "K": 1024, "M": 1024**2, "G": 1024**3, "T": 1024**4}
+
+
+def size(text: str) -> int:
+    """Parse a byte count such as "512M" or "64G"."""
+    match = re.fullmatch(r"\s*(\d+(?:\.\d*)?)\s*([KMGT]?)i?B?\s*", text, re.I)
+    if match is None:
+        raise argparse.ArgumentTypeError(f"not a size: {text!r}")
+    return int(float(match[1]) * _suffixes[match[2].upper()])
+
+
+def _convert(args) -> int:
+    import snap_conv
+    from snap_conv.batch import convert_many
+
+    def progress(result):
+        line = f"{result.status:>9}  {result.source} -> {result.output}"
+        if result.status == "converted":
+            line += f" ({result.seconds:.1f} s)"
+        elif result.error is not None:
+            line += f": {result.error}"
+        print(line, flush=True)
+
+    kwargs = dict(
+        workers=args.workers,
+        memory_budget=args.memory,
+        overwrite=args.overwrite,
+        progress=progress,
+        units=args.units,
+    )
+    for name in ("chunk_bytes", "max_file_bytes"):
+        if (value := getattr(args, name)) is not None:
+            kwargs[name] = value
+    target = getattr(snap_conv, _targets[args.to])
+    results = convert_many(args.paths, target, args.output, **kwargs)
+    counts = {
+        s: sum(r.status == s for r in results)
+        for s in ("converted", "skipped", "failed")
+    }
+    print(", ".join(f"{n} {s}" for s, n in counts.items()))
+    return 1 if counts["failed"] else 0
+
+
+def _info(args) -> int:
+    from snap_conv.frontends.detect import detect_format
+
+    status = 0
+    for path in args.paths:
+        cls = detect_format(path)
+        if cls is None:
+            print(f"{path}: not a recognised snapshot")
+            status = 1
+            continue
+        with cls(path, header_only=True) as data:
+            header = data.header
+            print(f"{path}: {cls.__name__}, {len(data.files)} file(s)")
+            print(f"  redshift {float(header.redshift):.4g}, box {header.box_size}")
+            print(f"  particles {list(map(int, header.num_part))}")
+    return status
+
+
+def main(argv=None) -> int:
+    parser = argparse.ArgumentParser(
+        prog="snap-conv", description=__doc__.splitlines()[0]
+    )
+    commands = parser.add_subparsers(dest="command", required=True)
+
+    convert = commands.add_parser(
+        "convert", help="convert snapshots or directories of them"
+    )
+    convert.add_argument(
+        "paths", nargs="+", help="snapshot files or directories to search"
+    )
+    convert.add_argument("-o", "--output", required=True, help="output directory")
+    convert.add_argument("--to", choices=list(_targets), required=True)
+    convert.add_argument(
+        "-j", "--workers", type=int, default=None, help="parallel conversions"
+    )
+    convert.add_argument(
+        "--memory", type=size, default=None, help="memory budget, e.g. 64G"
+    )
+    convert.add_argument("--chunk-bytes", type=size, default=None)
+    convert.add_argument("--max-file-bytes", type=size, default=None)
+    convert.add_argument("--units", choices=["auto", "convert"], default="auto")
+    convert.add_argument(
+        "--overwrite", action="store_true", help="reconvert finished outputs"
+    )
+    convert.set_defaults(run=_convert)
+
+    info = commands.add_parser("info", help="show the format and header of snapshots")
+    info.add_argument("paths", nargs="+")
+    info.set_defaults(run=_info)
+
+    args = parser.parse_args(argv)
+    return args.run(args)
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -1,5 +1,34 @@
-from .gadget import GadgetFrontend
-from .hdf5 import Hdf5Frontend
-from .swift import SwiftFrontend
+import importlib
 
-__all__ = ["Hdf5Frontend", "SwiftFrontend", "GadgetFrontend"]
+# Frontends pull in h5py and unyt, so they are imported on first use.
+_exports = {
+    "Hdf5Frontend": ".hdf5",
+    "SwiftFrontend": ".swift",
+    "GadgetFrontend": ".gadget",
+    "GadgetBinaryFrontend": ".gadget_binary",
+    "FieldStorage": ".storage",
+    "StoragePolicy": ".storage",
+    "DtypePolicy": ".dtypes",
+    "DerivedField": ".derived",
+    "shared_cache": ".cache",
+    "DiskCache": ".disk_cache",
+    "Instruments": ".instruments",
+    "ChromeTrace": ".instruments",
+    "SnapshotSeries": ".series",
+    "detect_format": ".detect",
+    "load": ".detect",
+}
+
+__all__ = list(_exports)
+
+
+def __getattr__(name: str):
+    if name not in _exports:
+        raise AttributeError(f"module {__name__!r} has no attribute {name!r}")
+    value = getattr(importlib.import_module(_exports[name], __name__), name)
+    globals()[name] = value
+    return value
+
+
+def __dir__():
+    return sorted([*globals(), *__all__])
@@ -0,0 +1,323 @@
+import itertools
+import threading
+import weakref
+from collections import OrderedDict
+from dataclasses import dataclass
+from typing import Any, Callable, Dict, Hashable, List, Optional, Set, Tuple
+
+import numpy as np
+
+EvictHook = Callable[[Hashable, Any], None]
+
+
+@dataclass(slots=True)
+class CacheStats:
+    hits: int = 0
+    misses: int = 0
+    evictions: int = 0
+    bytes_inserted: int = 0
+    bytes_evicted: int = 0
+
+    @property
+    def hit_rate(self) -> float:
+        total = self.hits + self.misses
+        return self.hits / total if total else 0.0
+
+
+def _owner(data) -> Any:
+    # The array holding the memory, kept alive by every view of it.
+    while isinstance(getattr(data, "base", None), np.ndarray):
+        data = data.base
+    return data
+
+
+class FieldCache:
+    """Least-recently-used store of loaded fields with a byte budget.
+
+    Pinned entries are kept out of the LRU order and are never evicted,
+    but still count towards `nbytes`.
+
+    Entries dropped while something else still references their memory are
+    tracked through weak references and counted in `outside_nbytes` until
+    they are freed. With `count_outside`, that memory also counts against
+    `max_bytes`.
+    """
+
+    max_bytes: Optional[int]
+    nbytes: int
+    outside_nbytes: int
+    stats: CacheStats
+
+    def __init__(self, max_bytes: Optional[int] = None, count_outside: bool = False):
+        self.max_bytes = max_bytes
+        self.count_outside = count_outside
+        self.nbytes = 0
+        self.outside_nbytes = 0
+        self.stats = CacheStats()
+        # id(owner) -> (weak reference, nbytes, key)
+        self._outside: Dict[int, Tuple[weakref.ref, int, Hashable]] = {}
+        self._lru: "OrderedDict[Hashable, Tuple[Any, int]]" = OrderedDict()
+        self._pinned: Dict[Hashable, Tuple[Any, int]] = {}
+        self._pins: Set[Hashable] = set()
+        self._evict_hooks: List[EvictHook] = []
+        self._lock = threading.RLock()
+
+    def __len__(self) -> int:
+        return len(self._lru) + len(self._pinned)
+
+    def __contains__(self, key: Hashable) -> bool:
+        return key in self._lru or key in self._pinned
+
+    def keys(self) -> List[Hashable]:
+        return [*self._pinned, *self._lru]
+
+    def get(self, key: Hashable) -> Any:
+        with self._lock:
+            if key in self._pinned:
+                self.stats.hits += 1
+                return self._pinned[key][0]
+            entry = self._lru.get(key)
+            if entry is None:
+                self.stats.misses += 1
+                return None
+            self._lru.move_to_end(key)
+            self.stats.hits += 1
+            return entry[0]
+
+    def peek(self, key: Hashable) -> Any:
+        # Like `get`, but without touching the LRU order or the stats.
+        with self._lock:
+            entry = self._pinned.get(key) or self._lru.get(key)
+            return entry[0] if entry is not None else None
+
+    def put(self, key: Hashable, data: Any, nbytes: Optional[int] = None):
+        with self._lock:
+            if nbytes is None:
+                nbytes = data.nbytes
+            self.discard(key)
+            self._untrack(data)
+            self.make_room(nbytes)
+            if key in self._pins:
+                self._pinned[key] = (data, nbytes)
+            else:
+                self._lru[key] = (data, nbytes)
+            self.nbytes += nbytes
+            self.stats.bytes_inserted += nbytes
+
+    def make_room(self, incoming: int):
+        with self._lock:
+            if self.max_bytes is None:
+                return
+            while self._lru and self._used() + incoming > self.max_bytes:
+                key, (data, nbytes) = self._lru.popitem(last=False)
+                self.nbytes -= nbytes
+                self.stats.evictions += 1
+                self.stats.bytes_evicted += nbytes
+                for hook in self._evict_hooks:
+                    hook(key, data)
+                self._track(key, data, nbytes)
+                # Otherwise this reference keeps the entry counted as outside
+                # when the loop checks the budget again.
+                del data
+
+    def _used(self) -> int:
+        if self.count_outside:
+            return self.nbytes + self.outside_nbytes
+        return self.nbytes
+
+    @property
+    def free_bytes(self) -> Optional[int]:
+        """Bytes that can be added without evicting anything."""
+        if self.max_bytes is None:
+            return None
+        with self._lock:
+            return max(0, self.max_bytes - self._used())
+
+    def discard(self, key: Hashable):
+        with self._lock:
+            entry = self._lru.pop(key, None) or self._pinned.pop(key, None)
+            if entry is not None:
+                self.nbytes -= entry[1]
+                self._track(key, *entry)
+
+    def clear(self):
+        with self._lock:
+            for key in self.keys():
+                self.discard(key)
+
+    def _track(self, key: Hashable, data: Any, nbytes: int):
+        # Called for entries leaving the cache; the reference dies with the
+        # caller's unless something else holds on to the memory.
+        if nbytes == 0:
+            return
+        owner = _owner(data)
+        try:
+            ref = weakref.ref(owner, self._freed)
+        except TypeError:
+            return
+        self._untrack(owner)
+        self._outside[id(owner)] = (ref, nbytes, key)
+        self.outside_nbytes += nbytes
+
+    def _untrack(self, data: Any):
+        owner = _owner(data)
+        entry = self._outside.get(id(owner))
+        if entry is not None and entry[0]() is owner:
+            del self._outside[id(owner)]
+            self.outside_nbytes -= entry[1]
+
+    def _freed(self, ref: weakref.ref):
+        with self._lock:
+            for oid, entry in list(self._outside.items()):
+                if entry[0] is ref:
+                    del self._outside[oid]
+                    self.outside_nbytes -= entry[1]
+                    return
+
+    def outside(self) -> Dict[Hashable, int]:
+        """Bytes no longer cached but still referenced, by key."""
+        with self._lock:
+            totals: Dict[Hashable, int] = {}
+            for _, nbytes, key in list(self._outside.values()):
+                totals[key] = totals.get(key, 0) + nbytes
+            return totals
+
+    def pin(self, key: Hashable):
+        with self._lock:
+            self._pins.add(key)
+            if key in self._lru:
+                self._pinned[key] = self._lru.pop(key)
+
+    def unpin(self, key: Hashable):
+        with self._lock:
+            self._pins.discard(key)
+            if key in self._pinned:
+                self._lru[key] = self._pinned.pop(key)
+
+    def add_evict_hook(self, hook: EvictHook):
+        self._evict_hooks.append(hook)
+
+    def remove_evict_hook(self, hook: EvictHook):
+        self._evict_hooks.remove(hook)
+
+
+class CacheView:
+    """One frontend's share of a FieldCache used by several.
+
+    Keys are stored as `(namespace, key)`, so the byte budget, LRU order and
+    stats are those of the shared cache, while each frontend only sees and
+    clears its own entries.
+    """
+
+    def __init__(self, cache: FieldCache, namespace: Hashable):
+        self.shared = cache
+        self.namespace = namespace
+        self._hooks: Dict[EvictHook, EvictHook] = {}
+
+    @property
+    def max_bytes(self) -> Optional[int]:
+        return self.shared.max_bytes
+
+    @max_bytes.setter
+    def max_bytes(self, value: Optional[int]):
+        self.shared.max_bytes = value
+
+    @property
+    def stats(self) -> CacheStats:
+        return self.shared.stats
+
+    @property
+    def free_bytes(self) -> Optional[int]:
+        return self.shared.free_bytes
+
+    @property
+    def nbytes(self) -> int:
+        with self.shared._lock:
+            return sum(
+                nbytes
+                for entries in (self.shared._lru, self.shared._pinned)
+                for key, (_, nbytes) in entries.items()
+                if key[0] == self.namespace
+            )
+
+    @property
+    def outside_nbytes(self) -> int:
+        return sum(
+            nbytes
+            for key, nbytes in self.shared.outside().items()
+            if key[0] == self.namespace
+        )
+
+    def outside(self) -> Dict[Hashable, int]:
+        return {
+            key[1]: nbytes
+            for key, nbytes in self.shared.outside().items()
+            if key[0] == self.namespace
+        }
+
+    def __len__(self) -> int:
+        return len(self.keys())
+
+    def __contains__(self, key: Hashable) -> bool:
+        return (self.namespace, key) in self.shared
+
+    def keys(self) -> List[Hashable]:
+        return [k[1] for k in self.shared.keys() if k[0] == self.namespace]
+
+    def get(self, key: Hashable) -> Any:
+        return self.shared.get((self.namespace, key))
+
+    def peek(self, key: Hashable) -> Any:
+        return self.shared.peek((self.namespace, key))
+
+    def put(self, key: Hashable, data: Any, nbytes: Optional[int] = None):
+        self.shared.put((self.namespace, key), data, nbytes)
+
+    def make_room(self, incoming: int):
+        self.shared.make_room(incoming)
+
+    def discard(self, key: Hashable):
+        self.shared.discard((self.namespace, key))
+
+    def clear(self):
+        with self.shared._lock:
+            for key in self.keys():
+                self.discard(key)
+
+    def pin(self, key: Hashable):
+        self.shared.pin((self.namespace, key))
+
+    def unpin(self, key: Hashable):
+        self.shared.unpin((self.namespace, key))
+
+    def add_evict_hook(self, hook: EvictHook):
+        def own(key, data):
+            if key[0] == self.namespace:
+                hook(key[1], data)
+
+        self._hooks[hook] = own
+        self.shared.add_evict_hook(own)
+
+    def remove_evict_hook(self, hook: EvictHook):
+        self.shared.remove_evict_hook(self._hooks.pop(hook))
+
+
+_shared: Optional[FieldCache] = None
+_shared_lock = threading.Lock()
+_namespaces = itertools.count()
+
+
+def shared_cache() -> FieldCache:
+    """The cache of every frontend opened with `cache="shared"` in this process.
+
+    Its budget starts at 1 GiB; set `shared_cache().max_bytes` to change it.
+    """
+    global _shared
+    with _shared_lock:
+        if _shared is None:
+            _shared = FieldCache(1024**3)
+        return _shared
+
+
+def shared_view() -> CacheView:
+    return CacheView(shared_cache(), next(_namespaces))
@@ -0,0 +1,51 @@
+from dataclasses import dataclass
+from typing import Any, Callable, Dict, Optional, Tuple
+
+import numpy as np
+
+
+@dataclass(kw_only=True, slots=True, frozen=True)
+class DerivedField:
+    """A field computed row by row from other fields of the same particle type.
+
+    `function` receives the `depends` fields (raw, aliased or derived) as
+    arrays over the same rows and returns one value per row, so it can be
+    evaluated on any selection or chunk of rows.
+    """
+
+    name: str
+    depends: Tuple[str, ...]
+    function: Callable[..., Any]
+    # Particle types ("gas", "stars", ...) it applies to, or None for all
+    # types that have the dependencies.
+    ptypes: Optional[Tuple[str, ...]] = None
+
+
+def make_derived(name: str, depends, function, ptypes=None) -> DerivedField:
+    if isinstance(depends, str):
+        depends = (depends,)
+    if isinstance(ptypes, str):
+        ptypes = (ptypes,)
+    return DerivedField(
+        name=name,
+        depends=tuple(depends),
+        function=function,
+        ptypes=tuple(ptypes) if ptypes is not None else None,
+    )
+
+
+def registry(cls) -> Dict[str, DerivedField]:
+    fields: Dict[str, DerivedField] = {}
+    for klass in reversed(cls.__mro__):
+        fields.update(vars(klass).get("_derived_fields", {}))
+    return fields
+
+
+def values(data) -> np.ndarray:
+    return data.view(np.ndarray) if isinstance(data, np.ndarray) else np.asarray(data)
+
+
+def clip_negative(data):
+    data = data.copy()
+    data[data < 0] = 0
+    return data
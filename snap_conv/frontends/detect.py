@@ -0,0 +1,49 @@
+import os
+from typing import Optional
+
+import h5py
+
+from .files import resolve_snapshot
+from .gadget import GadgetFrontend
+from .gadget_binary import GadgetBinaryFrontend
+from .swift import SwiftFrontend
+
+_hdf5_signature = b"\x89HDF\r\n\x1a\n"
+
+
+def _resolve(fname) -> str:
+    fname = resolve_snapshot(fname)
+    if not os.path.exists(fname) and os.path.exists(f"{fname}.0"):
+        return f"{fname}.0"
+    return fname
+
+
+def detect_format(fname) -> Optional[type]:
+    """The frontend class for a snapshot, judged from the file contents, or
+    None if it is not a snapshot any frontend reads."""
+    fname = _resolve(fname)
+    with open(fname, "rb") as f:
+        head = f.read(8)
+    if head == _hdf5_signature:
+        with h5py.File(fname, "r") as f:
+            if "Header" not in f:
+                return None
+            if "Cosmology" in f:
+                return SwiftFrontend
+            if "NumPart_Total" in f["Header"].attrs:
+                return GadgetFrontend
+        return None
+    # Fortran record marker of the header, or of a SnapFormat=2 label.
+    if len(head) >= 4 and any(
+        int.from_bytes(head[:4], order) in (8, 256) for order in ("little", "big")
+    ):
+        return GadgetBinaryFrontend
+    return None
+
+
+def load(fname, **kwargs):
+    """Open a snapshot with the frontend matching its contents."""
+    cls = detect_format(fname)
+    if cls is None:
+        raise ValueError(f"{os.fsdecode(fname)} is not a recognised snapshot")
+    return cls(fname, **kwargs)
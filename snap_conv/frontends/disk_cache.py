@@ -0,0 +1,224 @@
+import hashlib
+import os
+import pickle
+import shutil
+import threading
+import types
+from functools import partial
+from typing import Any, Dict, Iterable, List, Optional, Tuple
+
+import numpy as np
+
+from .spatial import file_stamps
+
+_stamps = "stamps.npy"
+
+
+def _digest(*parts) -> str:
+    return hashlib.sha1(repr(parts).encode()).hexdigest()
+
+
+class _Unhashable(Exception):
+    pass
+
+
+def function_token(function) -> Optional[str]:
+    """Identifies a derived field's function by its code and by the values
+    it uses (closure cells, defaults and globals), so that changing any of
+    them makes earlier results miss. None if one of those values cannot be
+    hashed, in which case the field is not cached."""
+    digest = hashlib.sha1()
+    try:
+        _fingerprint(function, digest, set())
+    except _Unhashable:
+        return None
+    return digest.hexdigest()
+
+
+def _global_names(code: types.CodeType) -> Iterable[str]:
+    yield from code.co_names
+    for const in code.co_consts:
+        if isinstance(const, types.CodeType):
+            yield from _global_names(const)
+
+
+def _fingerprint(value, digest, seen: set):
+    update = lambda *parts: digest.update(repr(parts).encode())
+    if isinstance(value, np.ndarray):
+        update("array", value.dtype.str, value.shape, str(getattr(value, "units", "")))
+        if value.dtype.hasobject:
+            raise _Unhashable
+        digest.update(np.ascontiguousarray(value).tobytes())
+    elif isinstance(value, types.CodeType):
+        update("code", value.co_code, value.co_names)
+        for const in value.co_consts:
+            _fingerprint(const, digest, seen)
+    elif isinstance(value, types.FunctionType):
+        update("function", value.__module__, value.__qualname__)
+        if id(value) in seen:
+            return
+        seen.add(id(value))
+        _fingerprint(value.__code__, digest, seen)
+        for cell in value.__closure__ or ():
+            try:
+                contents = cell.cell_contents
+            except ValueError:
+                contents = None  # not yet assigned
+            _fingerprint(contents, digest, seen)
+        _fingerprint(value.__defaults__, digest, seen)
+        _fingerprint(value.__kwdefaults__, digest, seen)
+        for name in sorted(set(_global_names(value.__code__))):
+            if name in value.__globals__:
+                update("global", name)
+                _fingerprint(value.__globals__[name], digest, seen)
+    elif isinstance(value, partial):
+        update("partial")
+        _fingerprint((value.func, value.args, value.keywords), digest, seen)
+    elif isinstance(value, types.ModuleType):
+        update("module", value.__name__)
+    elif isinstance(value, type):
+        update("type", value.__module__, value.__qualname__)
+    elif isinstance(value, (tuple, list)):
+        update(type(value).__name__, len(value))
+        for item in value:
+            _fingerprint(item, digest, seen)
+    elif isinstance(value, dict):
+        update("dict", len(value))
+        for key, item in value.items():
+            _fingerprint(key, digest, seen)
+            _fingerprint(item, digest, seen)
+    else:
+        try:
+            digest.update(pickle.dumps(value, protocol=4))
+        except Exception:
+            raise _Unhashable from None
+
+
+class DiskCache:
+    """Arrays kept in `.npy` files under `directory`, shared between
+    processes and runs.
+
+    Entries are grouped by snapshot, in a directory named after its files,
+    and keyed by field, units and dtype. A snapshot whose files changed size
+    or modification time has its entries removed on first use. Once the
+    entries take up more than `max_bytes`, the least recently used are
+    deleted.
+    """
+
+    directory: str
+    max_bytes: Optional[int]
+
+    def __init__(self, directory, max_bytes: Optional[int] = 16 * 1024**3):
+        self.directory = os.path.expanduser(os.fsdecode(directory))
+        self.max_bytes = max_bytes
+        # Snapshot directories whose stamps were checked by this process.
+        self._checked: Dict[str, bool] = {}
+
+    def __getstate__(self):
+        return {"directory": self.directory, "max_bytes": self.max_bytes}
+
+    def __setstate__(self, state):
+        self.__init__(**state)
+
+    def _snapshot_dir(self, files: List[str]) -> str:
+        path = os.path.join(
+            self.directory, _digest(*(os.path.abspath(f) for f in files))
+        )
+        if path in self._checked:
+            return path
+        stamps = file_stamps(files)
+        try:
+            stale = not np.array_equal(np.load(os.path.join(path, _stamps)), stamps)
+        except (OSError, ValueError):
+            stale = os.path.isdir(path)
+        if stale:
+            shutil.rmtree(path, ignore_errors=True)
+        if not os.path.isdir(path):
+            os.makedirs(path, exist_ok=True)
+            self._save(os.path.join(path, _stamps), stamps)
+        self._checked[path] = True
+        return path
+
+    def _path(self, files: List[str], key: Tuple) -> str:
+        return os.path.join(self._snapshot_dir(files), _digest(*key) + ".npy")
+
+    def has(self, files: List[str], key: Tuple) -> bool:
+        return os.path.exists(self._path(files, key))
+
+    def get(self, files: List[str], key: Tuple) -> Optional[np.ndarray]:
+        path = self._path(files, key)
+        try:
+            data = np.load(path)
+            # The modification time orders entries for eviction.
+            os.utime(path)
+        except (OSError, ValueError):
+            return None
+        return data
+
+    def put(self, files: List[str], key: Tuple, data):
+        data = data.view(np.ndarray) if isinstance(data, np.ndarray) else data
+        if self.max_bytes is not None and data.nbytes > self.max_bytes:
+            return
+        self._save(self._path(files, key), data)
+        self.make_room()
+
+    @staticmethod
+    def _save(path: str, data):
+        # Written under a unique name and renamed, so that readers in other
+        # processes never see a partial file.
+        tmp = f"{path}.{os.getpid()}-{threading.get_ident()}.tmp"
+        with open(tmp, "wb") as f:
+            np.save(f, data)
+        os.replace(tmp, path)
+
+    def entries(self) -> List[Tuple[float, int, str]]:
+        """(last use, size, path) of every entry, oldest first."""
+        found = []
+        for path in self._files():
+            try:
+                stat = os.stat(path)
+            except FileNotFoundError:
+                continue
+            found.append((stat.st_mtime, stat.st_size, path))
+        return sorted(found)
+
+    def _files(self) -> Iterable[str]:
+        if not os.path.isdir(self.directory):
+            return
+        for snapshot in os.scandir(self.directory):
+            if not snapshot.is_dir():
+                continue
+            for entry in os.scandir(snapshot.path):
+                if entry.name.endswith(".npy") and entry.name != _stamps:
+                    yield entry.path
+
+    @property
+    def nbytes(self) -> int:
+        return sum(size for _, size, _ in self.entries())
+
+    def make_room(self, incoming: int = 0):
+        if self.max_bytes is None:
+            return
+        entries = self.entries()
+        total = sum(size for _, size, _ in entries) + incoming
+        for _, size, path in entries:
+            if total <= self.max_bytes:
+                break
+            try:
+                os.remove(path)
+            except FileNotFoundError:
+                pass
+            total -= size
+
+    def clear(self):
+        shutil.rmtree(self.directory, ignore_errors=True)
+        self._checked.clear()
+
+    def __repr__(self) -> str:
+        return f"DiskCache({self.directory!r}, max_bytes={self.max_bytes})"
+
+
+def as_disk_cache(cache: Any) -> Optional[DiskCache]:
+    if cache is None or isinstance(cache, DiskCache):
+        return cache
+    return DiskCache(cache)
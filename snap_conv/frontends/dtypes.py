@@ -0,0 +1,37 @@
+from dataclasses import dataclass, field
+from typing import Any, Dict, Optional
+
+import numpy as np
+
+
+@dataclass(kw_only=True, slots=True)
+class DtypePolicy:
+    """The dtypes fields are read as.
+
+    `floats` narrows every wider floating point field, and `fields`
+    overrides it per field name or "PartTypeN/name", with None keeping the
+    dtype in the file. Integer fields, such as ParticleIDs, are only changed
+    by an entry in `fields`.
+    """
+
+    floats: Any = None
+    fields: Dict[str, Any] = field(default_factory=dict)
+
+    def lookup(self, group: str, name: str, dtype) -> np.dtype:
+        dtype = np.dtype(dtype)
+        for key in (f"{group}/{name}", name):
+            if key in self.fields:
+                target = self.fields[key]
+                return dtype if target is None else np.dtype(target)
+        if self.floats is not None and np.issubdtype(dtype, np.floating):
+            floats = np.dtype(self.floats)
+            if floats.itemsize < dtype.itemsize:
+                return floats
+        return dtype
+
+
+def as_policy(dtypes) -> Optional[DtypePolicy]:
+    # A bare dtype, such as "float32", applies to floating point fields.
+    if dtypes is None or isinstance(dtypes, DtypePolicy):
+        return dtypes
+    return DtypePolicy(floats=dtypes)
@@ -0,0 +1,50 @@
+import os
+import re
+from typing import List
+
+import h5py
+import numpy as np
+
+_piece = re.compile(r"^(?P<base>.*)\.(?P<index>\d+)\.hdf5$")
+_binary_piece = re.compile(r"^(?P<base>.*)\.(?P<index>\d+)$")
+
+
+def resolve_snapshot(fname) -> str:
+    fname = os.fsdecode(fname)
+    if not os.path.exists(fname):
+        base = fname.removesuffix(".hdf5")
+        if os.path.exists(f"{base}.0.hdf5"):
+            return f"{base}.0.hdf5"
+    return fname
+
+
+def snapshot_files(fname: str, f: h5py.File) -> List[str]:
+    header = f["Header"].attrs
+    num_files = int(np.atleast_1d(header.get("NumFilesPerSnapshot", 1))[0])
+    this_file = header.get("NumPart_ThisFile")
+    total = header.get("NumPart_Total")
+    # A virtual or merged file already presents every piece.
+    if num_files <= 1 or np.array_equal(this_file, total):
+        return [fname]
+    match = _piece.match(fname)
+    if match is None:
+        return [fname]
+    return [f"{match['base']}.{i}.hdf5" for i in range(num_files)]
+
+
+def piece_name(fname, index: int) -> str:
+    fname = os.fsdecode(fname)
+    match = _piece.match(fname)
+    base = match["base"] if match is not None else fname.removesuffix(".hdf5")
+    return f"{base}.{index}.hdf5"
+
+
+def is_later_piece(path) -> bool:
+    """Whether `path` is a piece, other than the first, of a multi-file
+    snapshot whose first piece sits next to it."""
+    directory, name = os.path.split(os.fsdecode(path))
+    for pattern, first in ((_piece, "{}.0.hdf5"), (_binary_piece, "{}.0")):
+        match = pattern.match(name)
+        if match is not None and int(match["index"]) > 0:
+            return os.path.exists(os.path.join(directory, first.format(match["base"])))
+    return False
@@ -0,0 +1,335 @@
+import json
+import os
+import re
+from typing import Dict, List, Optional, Tuple
+
+import numpy as np
+import unyt as u
+
+from .gadget import GadgetFrontend
+from .hdf5 import _particle_names
+from .spatial import file_stamps
+
+_piece = re.compile(r"^(?P<base>.*)\.(?P<index>\d+)$")
+
+_header_dtype = np.dtype(
+    [
+        ("npart", "i4", 6),
+        ("massarr", "f8", 6),
+        ("time", "f8"),
+        ("redshift", "f8"),
+        ("flag_sfr", "i4"),
+        ("flag_feedback", "i4"),
+        ("npartTotal", "u4", 6),
+        ("flag_cooling", "i4"),
+        ("num_files", "i4"),
+        ("BoxSize", "f8"),
+        ("Omega0", "f8"),
+        ("OmegaLambda", "f8"),
+        ("HubbleParam", "f8"),
+        ("flag_stellarage", "i4"),
+        ("flag_metals", "i4"),
+        ("npartTotalHighWord", "u4", 6),
+        ("flag_entropy_instead_u", "i4"),
+    ]
+)
+
+_all = (0, 1, 2, 3, 4, 5)
+# block label -> (field name, particle types it covers, components)
+_blocks = dict(
+    POS=("Coordinates", _all, 3),
+    VEL=("Velocities", _all, 3),
+    ID=("ParticleIDs", _all, 1),
+    MASS=("Masses", _all, 1),
+    U=("InternalEnergy", (0,), 1),
+    RHO=("Density", (0,), 1),
+    HSML=("SmoothingLength", (0,), 1),
+    NE=("ElectronAbundance", (0,), 1),
+    NH=("NeutralHydrogenAbundance", (0,), 1),
+    SFR=("StarFormationRate", (0,), 1),
+    AGE=("StellarFormationTime", (4,), 1),
+    Z=("Metallicity", (0, 4), 1),
+    POT=("Potential", _all, 1),
+    ACCE=("Acceleration", _all, 3),
+    ENDT=("RateOfChangeOfEntropy", (0,), 1),
+    TSTP=("TimeStep", _all, 1),
+    BHMA=("BH_Mass", (5,), 1),
+    BHMD=("Mdot", (5,), 1),
+)
+# Bumped when the block index sidecar of earlier versions can be wrong.
+_index_version = 2
+
+# (label, offset of the payload, payload bytes)
+Block = Tuple[str, int, int]
+
+
+def _byte_order(path, first: bytes) -> Tuple[str, str, bool]:
+    # The first record is the 256 byte header, or an 8 byte block label.
+    for order, endian in (("little", "<"), ("big", ">")):
+        if int.from_bytes(first, order) in (8, 256):
+            return order, endian, int.from_bytes(first, order) == 8
+    raise ValueError(f"{path} is not a Gadget binary snapshot")
+
+
+def scan_blocks(path) -> Tuple[str, List[Block]]:
+    """Walk the Fortran record markers of one file, returning its byte order
+    and the labelled blocks it contains."""
+    size = os.path.getsize(path)
+    with open(path, "rb") as f:
+        order, endian, labelled = _byte_order(path, f.read(4))
+
+        records = []
+        pos = 0
+        while pos < size:
+            f.seek(pos)
+            n = int.from_bytes(f.read(4), order)
+            f.seek(pos + 4 + n)
+            if pos + 8 + n > size or int.from_bytes(f.read(4), order) != n:
+                raise ValueError(f"{path}: bad record marker at byte {pos}")
+            records.append((pos + 4, n))
+            pos += 8 + n
+
+        blocks = []
+        if labelled:
+            # SnapFormat=2: every block is preceded by an 8 byte label record.
+            for (label_at, _), (offset, n) in zip(records[::2], records[1::2]):
+                f.seek(label_at)
+                label = f.read(4).decode("ascii", "replace").strip()
+                blocks.append((label, offset, n))
+    if not labelled:
+        header = read_header(path, endian, ("HEAD", *records[0]))
+        blocks = _format1_blocks(path, header, records)
+    return endian, blocks
+
+
+def _format1_blocks(path, header, records) -> List[Block]:
+    # SnapFormat=1 files have no labels, only the standard order, in which
+    # MASS is left out when every type present has a MassTable entry and
+    # the gas blocks when there is no gas.
+    npart, massarr = header["npart"], header["massarr"]
+    labels = ["HEAD", "POS", "VEL", "ID"]
+    if any(npart[t] > 0 and massarr[t] == 0 for t in _all):
+        labels.append("MASS")
+    if npart[0] > 0:
+        labels += ["U", "RHO", "HSML"]
+    blocks = []
+    for label, (offset, n) in zip(labels, records):
+        if label != "HEAD":
+            _, types, components = _blocks[label]
+            if label == "MASS":
+                types = tuple(t for t in types if massarr[t] == 0)
+            values = int(sum(npart[t] for t in types)) * components
+            if n not in (values * 4, values * 8):
+                raise ValueError(
+                    f"{path}: record {len(blocks)} should be the {label} block of "
+                    f"{values} values, but holds {n} bytes"
+                )
+        blocks.append((label, offset, n))
+    return blocks
+
+
+def _block_layout(label: str, nbytes: int, npart: np.ndarray, massarr: np.ndarray):
+    """The field name, particle types, components and dtype of a block, or
+    None to skip it."""
+    if label in _blocks:
+        name, types, components = _blocks[label]
+        if label == "MASS":
+            types = tuple(t for t in types if massarr[t] == 0)
+        candidates = [(name, types, components)]
+    else:
+        # Unknown labelled blocks: guess from their size.
+        candidates = [(label, types, c) for types in (_all, (0,)) for c in (1, 3)]
+    for name, types, components in candidates:
+        types = tuple(t for t in types if npart[t] > 0)
+        rows = int(sum(npart[t] for t in types))
+        if rows == 0 or nbytes % (rows * components):
+            continue
+        itemsize = nbytes // (rows * components)
+        if itemsize not in (4, 8):
+            continue
+        kind = "u" if label == "ID" else "f"
+        return name, types, components, f"{kind}{itemsize}"
+    return None
+
+
+def read_header(fname, endian: Optional[str] = None, block: Optional[Block] = None):
+    if block is None:
+        with open(fname, "rb") as f:
+            _, endian, labelled = _byte_order(fname, f.read(4))
+        # Skip the label record of SnapFormat=2 files.
+        block = ("HEAD", 20 if labelled else 4, _header_dtype.itemsize)
+    label, offset, nbytes = block
+    if label != "HEAD" or nbytes < _header_dtype.itemsize:
+        raise ValueError(f"{fname} does not start with a header block")
+    raw = np.fromfile(
+        fname, dtype=_header_dtype.newbyteorder(endian), count=1, offset=offset
+    )[0]
+    return {name: raw[name] for name in _header_dtype.names}
+
+
+class GadgetBinaryFrontend(GadgetFrontend):
+    """Gadget-2 binary snapshots (SnapFormat 1 and 2), read through np.memmap.
+
+    The record markers are scanned once and the block offsets kept in a
+    `<file>.blocks.json` sidecar. Files of either byte order are read without
+    converting them. Unlabelled (SnapFormat=1) files only expose the
+    standard blocks up to HSML. Snapshots can only be read in this format,
+    not written.
+    """
+
+    def __init__(self, fname, *args, mmap: bool = True, **kwargs):
+        super().__init__(fname, *args, mmap=mmap, **kwargs)
+
+    # No filters in a binary file.
+    _compressed = False
+    writable = False
+
+    def _open_files(self, fname):
+        fname = os.fsdecode(fname)
+        if not os.path.exists(fname) and os.path.exists(f"{fname}.0"):
+            fname = f"{fname}.0"
+        self._handles = []
+        self.files = [fname]
+        num_files = int(read_header(fname)["num_files"])
+        if num_files > 1 and (match := _piece.match(fname)) is not None:
+            self.files = [f"{match['base']}.{i}" for i in range(num_files)]
+        self._index = index = self._load_block_index()
+        self._headers = [
+            read_header(f, endian, blocks[0])
+            for f, (endian, blocks) in zip(self.files, index)
+        ]
+
+    def _index_path(self) -> str:
+        return self.files[0] + ".blocks.json"
+
+    def _load_block_index(self) -> List[Tuple[str, List[Block]]]:
+        path = self._index_path()
+        stamps = file_stamps(self.files).tolist()
+        try:
+            with open(path) as f:
+                saved = json.load(f)
+            if saved["stamps"] == stamps and saved.get("version") == _index_version:
+                return [(e, [tuple(b) for b in blocks]) for e, blocks in saved["files"]]
+        except (OSError, ValueError, KeyError):
+            pass
+        index = [scan_blocks(f) for f in self.files]
+        try:
+            with open(path, "w") as f:
+                json.dump(dict(version=_index_version, stamps=stamps, files=index), f)
+        except OSError:
+            # A read-only archive just gets rescanned next time.
+            pass
+        return index
+
+    def _get_metadata(self):
+        counts = np.array([h["npart"] for h in self._headers], dtype=np.int64)
+        self._maps: List[Dict[str, Dict[str, np.memmap]]] = []
+        for fname, header, (endian, blocks) in zip(
+            self.files, self._headers, self._index
+        ):
+            maps: Dict[str, Dict[str, np.memmap]] = {}
+            npart, massarr = header["npart"], header["massarr"]
+            for label, offset, nbytes in blocks:
+                layout = _block_layout(label, nbytes, npart, massarr)
+                if label == "HEAD" or layout is None:
+                    continue
+                name, types, components, dtype = layout
+                dtype = np.dtype(endian + dtype)
+                trailing = (components,) if components > 1 else ()
+                for t in types:
+                    maps.setdefault(f"PartType{t}", {})[name] = np.memmap(
+                        fname,
+                        dtype=dtype,
+                        mode="r",
+                        offset=offset,
+                        shape=(int(npart[t]), *trailing),
+                    )
+                    offset += int(npart[t]) * dtype.itemsize * components
+            self._maps.append(maps)
+
+        self._offsets = {}
+        self._group_sources = {}
+        for i in range(6):
+            group = f"PartType{i}"
+            piece = next(
+                (p for p, maps in enumerate(self._maps) if group in maps), None
+            )
+            if piece is None:
+                continue
+            self._offsets[group] = np.concatenate([[0], np.cumsum(counts[:, i])])
+            self._group_sources[group] = piece
+
+        # Types with a fixed mass have no MASS block, only a MassTable entry.
+        massarr = self._headers[0]["massarr"]
+        for i, name in enumerate(_particle_names):
+            if name is not None and massarr[i] > 0:
+                self.derive("Masses", "ParticleIDs", _constant(massarr[i]), name)
+
+        if not self.header_only:
+            for group in self._group_sources:
+                self._build_particles(group)
+
+    def _group_datasets(self, group: str):
+        return self._maps[self._group_sources[group]][group]
+
+    def load_header(self):
+        header = self._headers[0]
+        total = header["npartTotal"].astype(np.uint64)
+        total += header["npartTotalHighWord"].astype(np.uint64) << np.uint64(32)
+        return self._make_header(
+            dict(
+                Redshift=header["redshift"],
+                Time=header["time"],
+                HubbleParam=header["HubbleParam"],
+                BoxSize=header["BoxSize"],
+                NumPart_Total=total,
+                Omega0=header["Omega0"],
+                OmegaLambda=header["OmegaLambda"],
+            )
+        )
+
+    def _read_pieces(self, group: str, key: str, start: int, stop: int) -> np.ndarray:
+        offsets = self._offsets[group]
+        parts = []
+        for piece in range(len(self.files)):
+            lo = max(start, offsets[piece])
+            hi = min(stop, offsets[piece + 1])
+            if lo < hi:
+                data = self._maps[piece][group][key]
+                parts.append(data[lo - offsets[piece] : hi - offsets[piece]])
+        shape, dtype = self.particles(group)._fields[key]
+        if len(parts) == 1 and parts[0].dtype == dtype:
+            # A read-only view of the mapped file.
+            return parts[0]
+        if not parts:
+            return np.empty((0, *shape[1:]), dtype=dtype)
+        return np.concatenate(parts, dtype=dtype)
+
+    def _memmap(self, group: str, key: str):
+        offsets = self._offsets[group]
+        pieces = np.flatnonzero(np.diff(offsets))
+        if len(pieces) != 1:
+            return None
+        data = self._maps[int(pieces[0])][group][key]
+        if data.dtype != self.particles(group)._fields[key][1]:
+            return None
+        unit = self._get_unit(group, key)
+        return u.unyt_array(data, unit) if unit is not None else data
+
+    def _open(self, piece: int = 0):
+        raise TypeError("Gadget binary snapshots are not HDF5 files")
+
+    def close(self):
+        super().close()
+        self._maps = []
+
+    def __str__(self) -> str:
+        return f"GADGET binary Dataset at {self.fname!r}"
+
+
+def _constant(mass: float):
+    def masses(ids):
+        data = np.full(len(ids), mass, dtype=np.float32)
+        return u.unyt_array(data, GadgetFrontend.units["mass"])
+
+    return masses
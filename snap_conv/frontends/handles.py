@@ -0,0 +1,43 @@
+import os
+import threading
+from typing import Optional
+
+import h5py
+
+
+class FileHandle:
+    """A lazily opened, read-only h5py file shared by everything in a frontend.
+
+    The file is opened on first use and kept open until `close` is called.
+    A handle inherited across `fork` is never reused; the child opens its own.
+    """
+
+    def __init__(self, fname):
+        self.fname = fname
+        self._file: Optional[h5py.File] = None
+        self._pid: Optional[int] = None
+        self._lock = threading.Lock()
+
+    def get(self) -> h5py.File:
+        f = self._file
+        if f is not None and self._pid == os.getpid() and f.id.valid:
+            return f
+        with self._lock:
+            if self._pid != os.getpid():
+                # Do not close the parent's handle from the child.
+                self._file = None
+            if self._file is None or not self._file.id.valid:
+                self._file = h5py.File(self.fname, "r")
+                self._pid = os.getpid()
+            return self._file
+
+    def close(self):
+        with self._lock:
+            if self._file is not None and self._pid == os.getpid():
+                self._file.close()
+            self._file = None
+            self._pid = None
+
+    @property
+    def is_open(self) -> bool:
+        return self._file is not None and self._pid == os.getpid()
@@ -1,62 +1,351 @@
+import asyncio
+import math
 import os
+import threading
+import time
+import weakref
 from abc import ABC, abstractmethod
-from typing import Any, Dict, Optional, Union
+from concurrent.futures import Future, ThreadPoolExecutor
+from contextlib import ExitStack
+from functools import cached_property, partial
+from typing import Any, Dict, Iterable, List, Optional, Tuple, Union
 
 import h5py
+import numpy as np
 import unyt as u
 
+from .cache import CacheStats, CacheView, FieldCache, shared_view
+from .derived import DerivedField, make_derived, registry, values
+from .disk_cache import DiskCache, as_disk_cache, function_token
+from .dtypes import DtypePolicy, as_policy
+from .files import piece_name, resolve_snapshot, snapshot_files
+from .handles import FileHandle
 from .header import Header
+from .ids import IDIndex
+from .instruments import Hook, Instruments, IOStats
+from .lazy import LazyField
+from .parallel import Task, map_ordered, stored_key
+from .prefetch import Prefetch, field_pairs, particles_of
+from .region import Region, RegionParticles, Selection, box_mask, in_units
+from .schema import Layout, Schema
+from .spatial import SpatialIndex
+from .storage import StoragePolicy
+from .units import CONVERT, deferred, plan_conversion
 
 StrPath = Union[str, bytes, os.PathLike]
 _particle_names = ["gas", "dark_matter", None, None, "stars", "black_holes"]
 _particle_class_names = ["Gas", "DarkMatter", None, None, "Stars", "BlackHoles"]
+_derived_chunk_bytes = 64 * 1024**2
+# Selected rows closer than this are read together, gap included.
+_merge_gap_bytes = 4096
+# Largest single read of a selection, bounding the temporary buffer.
+_span_bytes = 4 * 1024**2
 
 
 class Hdf5Frontend(ABC):
     fname: StrPath
-    cache_size: Optional[int]
+    files: List[str]
+    cache: Union[FieldCache, CacheView]
     header: Header
-    load_num: int
+    io_workers: Optional[int]
+    mmap: bool
+    header_only: bool
+    instruments: Optional[Instruments]
+    dtypes: Optional[DtypePolicy]
 
-    def __init__(self, fname: StrPath, cache_size: Optional[int] = 1024**3):
+    # group -> [(output name, *alternative source names)]
+    output_fields: Dict[str, List[Tuple[str, ...]]] = {}
+    field_units: Dict[str, Dict[str, Any]] = {}
+    # group -> {alias: field}
+    field_aliases: Dict[str, Dict[str, str]] = {}
+    # Whether written datasets record their own units, so that values can be
+    # stored in the source units instead of being converted.
+    self_describing_units: bool = False
+    # Read-only frontends cannot be the target of `write`.
+    writable: bool = True
+    # Registered with `register_derived`, merged along the class hierarchy.
+    _derived_fields: Dict[str, DerivedField] = {}
+    # Threads serving `aget` and `aload_many`.
+    async_workers: int = 4
+
+    def __init__(
+        self,
+        fname: StrPath,
+        cache_size: Optional[int] = 1024**3,
+        io_workers: Optional[int] = None,
+        mmap: bool = False,
+        header_only: bool = False,
+        instruments: Optional[Instruments] = None,
+        cache: Union[FieldCache, CacheView, str, None] = None,
+        schema: Optional[Schema] = None,
+        dtypes: Union[DtypePolicy, str, None] = None,
+        disk_cache: Union[DiskCache, StrPath, None] = None,
+    ):
         self.fname = fname
-        self.cache_size = cache_size
+        # A cache passed in is shared with other frontends, and its budget
+        # replaces `cache_size`.
+        if isinstance(cache, str):
+            if cache != "shared":
+                raise ValueError(f"unknown cache {cache!r}")
+            cache = shared_view()
+        self.cache = cache if cache is not None else FieldCache(cache_size)
+        if isinstance(self.cache, CacheView):
+            # Entries of a snapshot no longer in use only take up the budget.
+            weakref.finalize(self, self.cache.clear)
+        self.io_workers = io_workers
+        self.mmap = mmap
+        self.header_only = header_only
+        # Applied by HDF5 during the read, so no full-precision copy is made.
+        self.dtypes = as_policy(dtypes)
+        # Derived and unit-converted fields kept on disk between runs.
+        self.disk_cache = as_disk_cache(disk_cache)
+        self.instruments = None
+        if instruments is not None:
+            self.instruments = instruments
+            self.cache.add_evict_hook(instruments.on_evict)
+        self._instance_derived: List[DerivedField] = []
+        self._build_lock = threading.Lock()
+        self._schema = schema
+        # (group, field) -> the load in progress
+        self._inflight: Dict[Tuple[str, str], Future] = {}
+        self._inflight_lock = threading.Lock()
+        self._prefetcher: Optional[ThreadPoolExecutor] = None
+        # Reads the pieces of multi-file snapshots, started on first use.
+        self._io_pool: Optional[ThreadPoolExecutor] = None
+        self._io_lock = threading.Lock()
+        self._async_pool: Optional[ThreadPoolExecutor] = None
+        # (event loop, group, field) -> the read being awaited
+        self._async_inflight: Dict[Tuple[Any, str, str], asyncio.Future] = {}
 
+        self._open_files(fname)
         self._get_metadata()
         self.header = self.load_header()
-        self.load_num = 0
-        self._make_aliases()
+
+    def _open_files(self, fname: StrPath):
+        first = FileHandle(resolve_snapshot(fname))
+        start = time.perf_counter()
+        f = first.get()
+        if self.instruments is not None:
+            self.instruments.record(
+                "open", None, first.fname, start, time.perf_counter()
+            )
+        self.files = snapshot_files(first.fname, f)
+        self._handles = [
+            first if piece == first.fname else FileHandle(piece) for piece in self.files
+        ]
+        if first not in self._handles:
+            first.close()
+
+    @property
+    def cache_size(self) -> Optional[int]:
+        return self.cache.max_bytes
+
+    @cache_size.setter
+    def cache_size(self, value: Optional[int]):
+        self.cache.max_bytes = value
+        self.cache.make_room(0)
+
+    @property
+    def cache_stats(self) -> CacheStats:
+        return self.cache.stats
+
+    def _open(self, piece: int = 0) -> h5py.File:
+        handle = self._handles[piece]
+        if self.instruments is None or handle.is_open:
+            return handle.get()
+        start = time.perf_counter()
+        f = handle.get()
+        self.instruments.record("open", None, handle.fname, start, time.perf_counter())
+        return f
+
+    def instrument(self, *hooks: Hook) -> Instruments:
+        """Start recording timings and counters, passing each event to `hooks`."""
+        if self.instruments is None:
+            self.instruments = Instruments()
+            self.cache.add_evict_hook(self.instruments.on_evict)
+        for hook in hooks:
+            self.instruments.add_hook(hook)
+        return self.instruments
+
+    def uninstrument(self):
+        if self.instruments is not None:
+            self.cache.remove_evict_hook(self.instruments.on_evict)
+            self.instruments = None
+
+    @property
+    def io_stats(self) -> Optional[IOStats]:
+        return self.instruments.stats if self.instruments is not None else None
+
+    def close(self):
+        if self._prefetcher is not None:
+            self._prefetcher.shutdown(cancel_futures=True)
+            self._prefetcher = None
+        if self._async_pool is not None:
+            self._async_pool.shutdown(cancel_futures=True)
+            self._async_pool = None
+        if self._io_pool is not None:
+            self._io_pool.shutdown()
+            self._io_pool = None
+        for handle in self._handles:
+            handle.close()
+        if isinstance(self.cache, CacheView):
+            self.cache.clear()
+        if getattr(self, "_spatial_index", None) is not None:
+            self._spatial_index.close()
+            del self._spatial_index
+        if getattr(self, "_id_index", None) is not None:
+            self._id_index.close()
+            del self._id_index
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc_info):
+        self.close()
 
     def _get_metadata(self):
-        with h5py.File(self.fname) as f:
-            keys = f.keys()
-            for i in range(6):
-                group = f"PartType{i}"
-                if group in keys:
-                    name = _particle_names[i]
-                    value = self._load_particles(
-                        self.fname, f[group], group, _particle_class_names[i]
+        if len(self.files) > 1:
+            counts = np.array(
+                [
+                    self._open(i)["Header"].attrs["NumPart_ThisFile"]
+                    for i in range(len(self.files))
+                ],
+                dtype=np.int64,
+            )
+        self._offsets = {}
+        self._group_sources = {}
+        for i in range(6):
+            group = f"PartType{i}"
+            piece = next(
+                (p for p in range(len(self.files)) if group in self._open(p)), None
+            )
+            if piece is None:
+                continue
+            dataset = self._open(piece)[group]
+            if len(self.files) > 1:
+                self._offsets[group] = np.concatenate([[0], np.cumsum(counts[:, i])])
+            else:
+                rows = next((v.shape[0] for v in dataset.values()), 0)
+                self._offsets[group] = np.array([0, rows])
+            self._group_sources[group] = piece
+        if not self.header_only:
+            for group in self._group_sources:
+                self._build_particles(group)
+
+    def _group_datasets(self, group: str):
+        # name -> dataset (anything with a shape and dtype) in the first piece.
+        return self._open(self._group_sources[group])[group]
+
+    def _group_layout(self, group: str) -> Layout:
+        layout = {
+            k: (v.shape[1:], v.dtype) for k, v in self._group_datasets(group).items()
+        }
+        schema = self._schema
+        if (
+            schema is not None
+            and group in schema.fields
+            and set(layout) == set(schema.fields[group])
+        ):
+            self._check_schema(group, layout)
+            # Matching members share the first snapshot's layout.
+            return schema.fields[group]
+        return layout
+
+    def _check_schema(self, group: str, layout: Layout):
+        # A type with the fields of the schema must also store them the same
+        # way, or values would be mixed up across the series.
+        expected = self._schema.fields[group]
+        units = self._schema.units.get(group, {})
+        for name, (shape, dtype) in layout.items():
+            unit = self._get_unit(group, name)
+            for what, own, theirs in (
+                ("shape", shape, expected[name][0]),
+                ("dtype", dtype, expected[name][1]),
+                ("units", unit, units.get(name)),
+            ):
+                if own != theirs:
+                    raise ValueError(
+                        f"{os.fsdecode(self.fname)}: {group}/{name} has {what} "
+                        f"{own}, but the first snapshot of the series has {theirs}"
                     )
-                    setattr(self, name, value)
+
+    def _build_particles(self, group: str):
+        i = int(group.removeprefix("PartType"))
+        layout = self._group_layout(group)
+        if self.dtypes is not None:
+            layout = {
+                k: (shape, self.dtypes.lookup(group, k, dtype))
+                for k, (shape, dtype) in layout.items()
+            }
+        particles = self._load_particles(
+            layout,
+            group,
+            _particle_class_names[i],
+            int(self._offsets[group][-1]),
+        )
+        for name, target in self.field_aliases.get(group, {}).items():
+            particles.alias(name, target)
+        for field in [*registry(type(self)).values(), *self._instance_derived]:
+            self._apply_derived(particles, field)
+        setattr(self, _particle_names[i], particles)
+        return particles
+
+    def __getattr__(self, name: str) -> Any:
+        # With header_only, particle types are built on first access.
+        if name in _particle_names and "_group_sources" in self.__dict__:
+            group = f"PartType{_particle_names.index(name)}"
+            if group in self._group_sources:
+                with self._build_lock:
+                    if name not in self.__dict__:
+                        self._build_particles(group)
+                return self.__dict__[name]
+        raise AttributeError(name)
+
+    @cached_property
+    def _compressed(self) -> bool:
+        return any(
+            v.compression is not None
+            for group, piece in self._group_sources.items()
+            for v in self._open(piece)[group].values()
+        )
 
     @abstractmethod
     def load_header(self) -> Header: ...
 
+    def schema(self) -> Schema:
+        """The fields and units of every particle type in this snapshot."""
+        fields, units = {}, {}
+        for group in self._group_sources:
+            # As stored, before any dtype policy.
+            fields[group] = self._group_layout(group)
+            units[group] = {k: self._get_unit(group, k) for k in fields[group]}
+        return Schema(fields=fields, units=units)
+
     def _load_particles(
         self,
-        fname: StrPath,
-        dataset,
+        layout: Layout,
         group: str,
         ptype_name: str,
+        rows: int,
     ):
-        type_dict: Dict[str, Any] = {"_parent": self}
-        for k in dataset.keys():
-            type_dict[k] = property(_make_getter(fname, group, k))
+        type_dict: Dict[str, Any] = {
+            "_parent": self,
+            "_group": group,
+            "_fields": {
+                k: ((rows, *shape), dtype) for k, (shape, dtype) in layout.items()
+            },
+            "_derived": {},
+            "_derived_info": {},
+        }
+        for k in layout:
+            type_dict[k] = property(_make_getter(group, k))
 
         def alias(self, destination: str, target):
             self.aliases[destination] = target
 
         def __getattr__(self, name: str, /) -> Any:
+            if name in self._derived:
+                return LazyField(self, name)
             if name in self.aliases:
                 target = self.aliases[name]
                 if isinstance(target, str):
@@ -65,62 +354,695 @@ class Hdf5Frontend(ABC):
                     return target(self._parent)
             raise AttributeError(name)
 
-        def check_cache(self, key: str):
-            if hasattr(self, f"_key_{key}"):
-                attr = getattr(self, f"_key_{key}")
-                if attr is not None:
-                    return attr[0]
+        def has(self, name: str) -> bool:
+            # An alias only counts if the field it ends up at is there.
+            name = self.resolve(name)
+            return (
+                name in self._fields
+                or name in self._derived
+                or callable(self.aliases.get(name))
+            )
+
+        def resolve(self, name: str):
+            while (
+                name not in self._fields
+                and name not in self._derived
+                and isinstance(self.aliases.get(name), str)
+            ):
+                name = self.aliases[name]
+            return name
+
+        def field_info(self, name: str):
+            name = self.resolve(name)
+            if name in self._derived:
+                if name not in self._derived_info:
+                    # Evaluate one row for the trailing shape, dtype and units.
+                    n = self._parent._offsets[self._group][-1]
+                    sample = self.read_selection(name, slice(0, min(1, n)))
+                    self._derived_info[name] = (
+                        (int(n), *sample.shape[1:]),
+                        sample.dtype,
+                        getattr(sample, "units", None),
+                    )
+                return self._derived_info[name]
+            if name not in self._fields:
+                return None
+            shape, dtype = self._fields[name]
+            return shape, dtype, self._parent._get_unit(self._group, name)
+
+        def derive(self, name: str, depends, function):
+            field = make_derived(name, depends, function)
+            seen, stack = set(), list(field.depends)
+            while stack:
+                dep = self.resolve(stack.pop())
+                if dep == name:
+                    raise ValueError(f"derived field {name!r} depends on itself")
+                if dep in self._derived and dep not in seen:
+                    seen.add(dep)
+                    stack.extend(self._derived[dep].depends)
+            self.invalidate(name)
+            self._derived[name] = field
+
+        def dependents(self, name: str) -> List[str]:
+            name = self.resolve(name)
+            return [
+                field.name
+                for field in self._derived.values()
+                if name in map(self.resolve, field.depends)
+            ]
+
+        def invalidate(self, name: str):
+            name = self.resolve(name)
+            self._parent.cache.discard((self._group, name))
+            self._derived_info.pop(name, None)
+            for dependent in self.dependents(name):
+                self.invalidate(dependent)
+
+        def _compute(self, name: str):
+            field = self._derived[name]
+            shape, dtype, unit = self.field_info(name)
+            cache = self._parent.cache
+            depends = [self.resolve(dep) for dep in field.depends]
+            row_bytes = math.prod(shape[1:]) * dtype.itemsize
+            for dep in depends:
+                if cache.peek((self._group, dep)) is None and (
+                    info := self.field_info(dep)
+                ):
+                    row_bytes += math.prod(info[0][1:]) * info[1].itemsize
+            step = max(1, _derived_chunk_bytes // max(1, row_bytes))
+            if step >= shape[0]:
+                return field.function(*(self.load(dep) for dep in depends))
+
+            # Only one chunk of the inputs is held at a time.
+            out = np.empty(shape, dtype)
+            for lo in range(0, shape[0], step):
+                hi = min(lo + step, shape[0])
+                out[lo:hi] = values(self.read_selection(name, slice(lo, hi)))
+            return u.unyt_array(out, unit) if unit is not None else out
+
+        def load(self, name: str):
+            name = self.resolve(name)
+            if name not in self._fields and name not in self._derived:
+                data = getattr(self, name)
+                return data.load() if isinstance(data, LazyField) else data
+            if (data := self.check_cache(name)) is not None:
+                return data
+            # Concurrent loads of a field (prefetch, threads) share one read.
+            key = (self._group, name)
+            return self._parent._load_once(key, partial(self._load, name))
+
+        def _load(self, name: str):
+            if (data := self._parent.cache.peek((self._group, name))) is not None:
+                # Loaded by another thread since the check.
+                return data
+            if name in self._derived:
+                data = self._parent._compute_derived(self, name)
+                self.add_cache(data, name)
+                return data
+            if self._parent.mmap:
+                data = self._parent._memmap(self._group, name)
+                if data is not None:
+                    # Mapped pages belong to the page cache, not to the budget.
+                    self.add_cache(data, name, nbytes=0)
+                    return data
+
+            shape, dtype = self._fields[name]
+            self._parent.make_room(math.prod(shape) * dtype.itemsize)
+            data = self._parent.read_rows(self._group, name, 0, shape[0])
+            self.add_cache(data, name)
+            return data
+
+        def read_rows(self, name: str, start: int, stop: int):
+            name = self.resolve(name)
+            if name in self._derived:
+                return self.read_selection(name, slice(start, stop))
+            if name not in self._fields:
+                return self.load(name)[start:stop]
+            if (data := self.check_cache(name)) is not None:
+                return data[start:stop]
+            return self._parent.read_rows(self._group, name, start, stop)
+
+        def read_selection(self, name: str, index):
+            name = self.resolve(name)
+            if name in self._derived:
+                if (data := self.check_cache(name)) is not None:
+                    return data[index]
+                if isinstance(index, tuple) and index:
+                    rows, rest = index[0], index[1:]
                 else:
-                    return None
+                    rows, rest = index, ()
+                if rows is None or rows is Ellipsis:
+                    return self.load(name)[index]
+                field = self._derived[name]
+                if isinstance(rows, (int, np.integer)):
+                    # Keep the row axis for the function, then drop it.
+                    row = slice(rows, rows + 1 or None)
+                    data = field.function(
+                        *(self.read_selection(dep, row) for dep in field.depends)
+                    )
+                    return data[0][rest]
+                data = field.function(
+                    *(self.read_selection(dep, rows) for dep in field.depends)
+                )
+                return data[(slice(None), *rest)] if rest else data
+            if name not in self._fields:
+                return self.load(name)[index]
+            if (data := self.check_cache(name)) is not None:
+                return data[index]
+            return self._parent.read_selection(self._group, name, index)
+
+        def check_cache(self, key: str):
+            data = self._parent.cache.get((self._group, key))
+            if (instruments := self._parent.instruments) is not None:
+                kind = "miss" if data is None else "hit"
+                instruments.record(kind, self._group, key, time.perf_counter())
+            return data
+
+        def add_cache(self, data, key, nbytes: Optional[int] = None):
+            if (self._group, key) in self._parent.cache:
+                # Replacing a field makes everything derived from it stale.
+                for dependent in self.dependents(key):
+                    self.invalidate(dependent)
+            self._parent.cache.put((self._group, key), data, nbytes)
 
-        def add_cache(self, data, key):
-            setattr(self, f"_key_{key}", (data, self._parent.load_num))
-            self._parent.load_num += 1
+        async def aget(self, name: str, index=None):
+            """`load(name)`, or `read_selection(name, index)`, run on a
+            thread so as not to block the event loop."""
+            return await self._parent._aload(self, name, index)
+
+        def pin(self, key: str):
+            self._parent.cache.pin((self._group, key))
+
+        def unpin(self, key: str):
+            self._parent.cache.unpin((self._group, key))
 
         type_dict["aliases"] = {}
         type_dict["alias"] = alias
         type_dict["__getattr__"] = __getattr__
+        type_dict["has"] = has
+        type_dict["resolve"] = resolve
+        type_dict["field_info"] = field_info
+        type_dict["derive"] = derive
+        type_dict["dependents"] = dependents
+        type_dict["invalidate"] = invalidate
+        type_dict["_compute"] = _compute
+        type_dict["load"] = load
+        type_dict["_load"] = _load
+        type_dict["read_rows"] = read_rows
+        type_dict["read_selection"] = read_selection
         type_dict["check_cache"] = check_cache
         type_dict["add_cache"] = add_cache
+        type_dict["aget"] = aget
+        type_dict["pin"] = pin
+        type_dict["unpin"] = unpin
 
         return type(ptype_name + "Dataset", (), type_dict)()
 
-    def make_room(self, incoming):
-        if self.cache_size is None:
-            return
-        loaded = self._get_loaded_fields()
-        loaded.sort(key=lambda x: x[2])
-        total_size = sum(e[3] for e in loaded)
-        bytes_left = total_size - self.cache_size + incoming
-        while bytes_left > 0:
-            ptype, key, _, nbytes = loaded[0]
-            setattr(getattr(self, ptype), key, None)
-            bytes_left -= nbytes
+    def _load_once(self, key: Tuple[str, str], load):
+        """Run `load`, unless a load of `key` is already running, in which
+        case wait for that one instead."""
+        with self._inflight_lock:
+            future = self._inflight.get(key)
+            running = future is not None
+            if not running:
+                future = self._inflight[key] = Future()
+        if running:
+            return future.result()
+        try:
+            data = load()
+        except BaseException as e:
+            future.set_exception(e)
+            raise
+        else:
+            future.set_result(data)
+            return data
+        finally:
+            with self._inflight_lock:
+                del self._inflight[key]
 
-    def get_loaded_size(self):
-        loaded = self._get_loaded_fields()
-        total_size = sum(e[3] for e in loaded)
-        return total_size
+    def prefetch(self, fields) -> Prefetch:
+        """Load `fields` into the cache on a background thread.
 
-    def _get_loaded_fields(self):
-        loaded = []
-        for ptype in _particle_names:
-            if ptype is None:
+        `fields` maps particle types to field names, or is a list of
+        (particle type, field) pairs. They are loaded in order, as long as
+        each fits in the space left in the cache, so that nothing is evicted
+        for them; the rest are left to load when used. Requests are served
+        one after another.
+        """
+        request = Prefetch(fields)
+        with self._build_lock:
+            if self._prefetcher is None:
+                self._prefetcher = ThreadPoolExecutor(
+                    1, thread_name_prefix="snap_conv-prefetch"
+                )
+            request.future = self._prefetcher.submit(request.run, self)
+        return request
+
+    def _io_executor(self) -> ThreadPoolExecutor:
+        # Not `_build_lock`, which is held while particle types are built.
+        with self._io_lock:
+            if self._io_pool is None:
+                self._io_pool = ThreadPoolExecutor(
+                    self.io_workers, thread_name_prefix="snap_conv-io"
+                )
+            return self._io_pool
+
+    def _async_executor(self) -> ThreadPoolExecutor:
+        with self._build_lock:
+            if self._async_pool is None:
+                self._async_pool = ThreadPoolExecutor(
+                    self.async_workers, thread_name_prefix="snap_conv-async"
+                )
+            return self._async_pool
+
+    async def _aload(self, particles, name: str, index=None):
+        loop = asyncio.get_running_loop()
+        key = particles.resolve(name)
+        if index is not None:
+            return await loop.run_in_executor(
+                self._async_executor(), particles.read_selection, key, index
+            )
+        # Peeked first: on a miss, the one load below records it.
+        if self.cache.peek((particles._group, key)) is not None:
+            if (data := particles.check_cache(key)) is not None:
+                return data
+        # Every coroutine asking for the field awaits one read.
+        inflight = (loop, particles._group, key)
+        future = self._async_inflight.get(inflight)
+        if future is None:
+            future = loop.run_in_executor(self._async_executor(), particles.load, key)
+            self._async_inflight[inflight] = future
+            future.add_done_callback(lambda _: self._async_inflight.pop(inflight, None))
+        # A cancelled waiter leaves the read running for the others.
+        return await asyncio.shield(future)
+
+    async def aload_many(self, fields) -> Dict[Tuple[str, str], Any]:
+        """Load several fields without blocking the event loop.
+
+        `fields` is given as for `prefetch`. Reads run on a pool of
+        `async_workers` threads, and cached fields are returned directly.
+        """
+        fields = field_pairs(fields)
+        loaded = await asyncio.gather(
+            *(particles_of(self, ptype).aget(name) for ptype, name in fields)
+        )
+        return dict(zip(fields, loaded))
+
+    def disk_key(self, particles, name: str) -> Optional[Tuple]:
+        """Identifies the values of a field in `disk_cache`: its dtype and,
+        for derived fields, the function computing it and its inputs. None
+        for derived fields whose function cannot be identified."""
+        name = particles.resolve(name)
+        key = (particles._group, name, particles.field_info(name)[1].str)
+        if name in particles._derived:
+            field = particles._derived[name]
+            inputs = tuple(self.disk_key(particles, dep) for dep in field.depends)
+            token = function_token(field.function)
+            if token is None or None in inputs:
+                return None
+            key += (token, inputs)
+        return key
+
+    def _compute_derived(self, particles, name: str):
+        if self.disk_cache is None:
+            return particles._compute(name)
+        if (key := self.disk_key(particles, name)) is None:
+            return particles._compute(name)
+        unit = particles.field_info(name)[2]
+        key = (*key, str(unit))
+        if (data := self.disk_cache.get(self.files, key)) is None:
+            data = particles._compute(name)
+            self.disk_cache.put(self.files, key, data)
+        elif unit is not None:
+            data = u.unyt_array(data, unit)
+        return data
+
+    def particles(self, group: str):
+        name = _particle_names[int(group.removeprefix("PartType"))]
+        return getattr(self, name, None) if name is not None else None
+
+    def read_rows(self, group: str, key: str, start: int, stop: int):
+        data = self._read(group, key, start, stop)
+        unit = self._get_unit(group, key)
+        return u.unyt_array(data, unit) if unit is not None else data
+
+    def read_selection(self, group: str, key: str, index):
+        if isinstance(index, tuple) and index:
+            rows, rest = index[0], index[1:]
+        else:
+            rows, rest = index, ()
+        n = self.particles(group)._fields[key][0][0]
+
+        if isinstance(rows, (int, np.integer)):
+            row = int(rows) + n if rows < 0 else int(rows)
+            if not 0 <= row < n:
+                raise IndexError(f"index {rows} is out of bounds for size {n}")
+            return self.read_rows(group, key, row, row + 1)[0][rest]
+        if isinstance(rows, slice):
+            start, stop, step = rows.indices(n)
+            if (start, stop, step) == (0, n, 1):
+                return self.particles(group).load(key)[index]
+            if step == 1:
+                data = self.read_rows(group, key, start, max(start, stop))
+            else:
+                data = self.read_index(group, key, np.arange(start, stop, step))
+        elif rows is None or rows is Ellipsis:
+            return self.particles(group).load(key)[index]
+        else:
+            rows = np.asarray(rows)
+            if rows.dtype == bool:
+                if rows.shape != (n,):
+                    raise IndexError(
+                        f"boolean index of shape {rows.shape} for {n} rows"
+                    )
+                rows = np.flatnonzero(rows)
+            data = self.read_index(group, key, rows)
+        return data[(slice(None), *rest)] if rest else data
+
+    def read_index(self, group: str, key: str, rows) -> Any:
+        data = self._read_index(group, key, rows)
+        unit = self._get_unit(group, key)
+        return u.unyt_array(data, unit) if unit is not None else data
+
+    def _read_index(self, group: str, key: str, rows) -> np.ndarray:
+        shape, dtype = self.particles(group)._fields[key]
+        rows = np.asarray(rows, dtype=np.int64)
+        rows = np.where(rows < 0, rows + shape[0], rows)
+        if rows.size and (rows.min() < 0 or rows.max() >= shape[0]):
+            raise IndexError(f"index out of bounds for size {shape[0]}")
+
+        unique, inverse = np.unique(rows, return_inverse=True)
+        data = np.empty((len(unique), *shape[1:]), dtype=dtype)
+        # Merge rows separated by small gaps into one contiguous read, and
+        # split the result so that no read covers more than `_span_bytes`.
+        row_bytes = max(1, math.prod(shape[1:]) * dtype.itemsize)
+        max_gap = max(1, _merge_gap_bytes // row_bytes)
+        span_rows = max(1, _span_bytes // row_bytes)
+        new = np.ones(len(unique), dtype=bool)
+        new[1:] = np.diff(unique) > max_gap
+        run_start = np.maximum.accumulate(np.where(new, unique, 0))
+        part = (unique - run_start) // span_rows
+        new[1:] |= part[1:] != part[:-1]
+        pos = 0
+        for span in (
+            np.split(unique, np.flatnonzero(new[1:]) + 1) if unique.size else []
+        ):
+            chunk = self._read(group, key, int(span[0]), int(span[-1]) + 1)
+            data[pos : pos + len(span)] = chunk[span - span[0]]
+            pos += len(span)
+        if not np.array_equal(unique, rows):
+            data = data[inverse.reshape(rows.shape)]
+        return data
+
+    def _read(self, group: str, key: str, start: int, stop: int) -> np.ndarray:
+        if (instruments := self.instruments) is None:
+            return self._read_pieces(group, key, start, stop)
+        begin = time.perf_counter()
+        data = self._read_pieces(group, key, start, stop)
+        dataset = self._group_datasets(group)[key]
+        instruments.record(
+            "read",
+            group,
+            key,
+            begin,
+            time.perf_counter(),
+            data.nbytes,
+            rows=len(data),
+            compression=getattr(dataset, "compression", None),
+        )
+        return data
+
+    def _read_pieces(self, group: str, key: str, start: int, stop: int) -> np.ndarray:
+        if len(self.files) == 1:
+            dataset = self._open()[group][key]
+            dtype = self.particles(group)._fields[key][1]
+            if dataset.dtype != dtype:
+                dataset = dataset.astype(dtype)
+            return dataset[start:stop]
+
+        offsets = self._offsets[group]
+        shape, dtype = self.particles(group)._fields[key]
+        start, stop = max(start, 0), min(stop, shape[0])
+        out = np.empty((max(stop - start, 0), *shape[1:]), dtype=dtype)
+        pieces = []
+        for piece in range(len(self.files)):
+            lo = max(start, offsets[piece])
+            hi = min(stop, offsets[piece + 1])
+            if lo < hi:
+                pieces.append((piece, lo - offsets[piece], hi - offsets[piece], lo))
+
+        def read(args):
+            piece, lo, hi, dest = args
+            self._open(piece)[group][key].read_direct(
+                out, np.s_[lo:hi], np.s_[dest - start : dest - start + hi - lo]
+            )
+
+        if len(pieces) > 1 and self.io_workers != 1:
+            list(self._io_executor().map(read, pieces))
+        else:
+            for args in pieces:
+                read(args)
+        return out
+
+    def load_fields(
+        self,
+        fields: Iterable[Tuple[str, str]],
+        workers: Optional[int] = None,
+        executor: str = "auto",
+    ) -> Dict[Tuple[str, str], Any]:
+        fields = list(fields)
+        loaded = {}
+        tasks: List[Task] = []
+        for ptype, name in fields:
+            particles = getattr(self, ptype)
+            key = particles.resolve(name)
+            if (data := particles.check_cache(key)) is not None:
+                loaded[(ptype, name)] = data
+            else:
+                tasks.append((particles._group, name, None, None))
+        missing = [field for field in fields if field not in loaded]
+        for (ptype, name), (data, _) in zip(
+            missing, map_ordered(self, tasks, workers, executor)
+        ):
+            particles = getattr(self, ptype)
+            key = particles.resolve(name)
+            info = particles.field_info(key)
+            if info is not None and particles.check_cache(key) is None:
+                # Arrays returned from worker processes carry unpickled units.
+                if (unit := info[2]) is not None:
+                    data = u.unyt_array(data.view(np.ndarray), unit)
+                particles.add_cache(data, key)
+            loaded[(ptype, name)] = data
+        return {field: loaded[field] for field in fields}
+
+    def _worker_knows(self, group: str, name: str) -> bool:
+        # Whether a new frontend, as built in a worker process, defines the
+        # field the same way: only fields from the file, `field_aliases`
+        # and the class registry of derived fields.
+        particles = self.particles(group)
+        if name in particles._fields:
+            return True
+        if name in particles.aliases:
+            target = particles.aliases[name]
+            return self.field_aliases.get(group, {}).get(name) == target and (
+                not isinstance(target, str) or self._worker_knows(group, target)
+            )
+        if (field := particles._derived.get(name)) is None:
+            return True
+        registered = registry(type(self)).get(name)
+        return (
+            registered is not None
+            and registered.function is field.function
+            and registered.depends == field.depends
+            and all(self._worker_knows(group, dep) for dep in field.depends)
+        )
+
+    def _worker_kwargs(self) -> Dict[str, Any]:
+        return {
+            "io_workers": 1,
+            "mmap": self.mmap,
+            "header_only": True,
+            "dtypes": self.dtypes,
+            "disk_cache": self.disk_cache,
+        }
+
+    def _memmap(self, group: str, key: str):
+        offsets = self._offsets[group]
+        pieces = np.flatnonzero(np.diff(offsets))
+        if len(pieces) != 1:
+            return None
+        piece = int(pieces[0])
+        dataset = self._open(piece)[group][key]
+        if dataset.chunks is not None or dataset.is_virtual or dataset.external:
+            return None
+        if dataset.dtype.hasobject:
+            return None
+        if dataset.dtype != self.particles(group)._fields[key][1]:
+            # Mapped pages keep the dtype of the file.
+            return None
+        offset = dataset.id.get_offset()
+        if offset is None:
+            return None
+        data = np.memmap(
+            self.files[piece],
+            dtype=dataset.dtype,
+            mode="r",
+            offset=offset,
+            shape=dataset.shape,
+        )
+        unit = self._get_unit(group, key)
+        return u.unyt_array(data, unit) if unit is not None else data
+
+    def region(
+        self,
+        center,
+        half_width,
+        fields: Optional[Iterable[str]] = None,
+        ptypes: Optional[Iterable[str]] = None,
+    ) -> Region:
+        region = Region(center, half_width)
+        for name in _particle_names:
+            if name is None or not hasattr(self, name):
+                continue
+            if ptypes is not None and name not in ptypes:
                 continue
+            particles = getattr(self, name)
+            group = particles._group
+            unit = self._get_unit(group, "Coordinates")
+            c = in_units(center, unit)
+            h = in_units(half_width, unit)
+            box = in_units(self.header.box_size, unit)
+
+            rows = self._region_rows(group, c, h, box)
+            if rows is None:
+                n = particles._fields["Coordinates"][0][0]
+                coords = self._read(group, "Coordinates", 0, n)
+                rows = np.arange(n)
+            else:
+                coords = self._read_index(group, "Coordinates", rows)
+            rows = rows[box_mask(coords, c, h, box)]
+
+            loaded = {}
+            for field in particles._fields if fields is None else fields:
+                if particles.has(field):
+                    loaded[field] = particles.read_selection(field, rows)
+            setattr(region, name, RegionParticles(rows, loaded))
+        return region
+
+    def _region_rows(
+        self, group: str, center: np.ndarray, half_width: np.ndarray, box: np.ndarray
+    ) -> Optional[np.ndarray]:
+        index = self.spatial_index
+        if index is None:
+            return None
+        return index.query(group, center, half_width)
+
+    @property
+    def spatial_index(self) -> Optional[SpatialIndex]:
+        if not hasattr(self, "_spatial_index"):
+            self._spatial_index = SpatialIndex.load(
+                self._spatial_index_path(), self.files
+            )
+        return self._spatial_index
+
+    def _spatial_index_path(self) -> str:
+        return os.path.splitext(self.files[0])[0] + ".sindex.hdf5"
+
+    def build_spatial_index(
+        self, level: int = 6, path: Optional[StrPath] = None, save: bool = True
+    ) -> SpatialIndex:
+        if getattr(self, "_spatial_index", None) is not None:
+            self._spatial_index.close()
+        self._spatial_index = SpatialIndex.build(self, level)
+        if save:
+            self._spatial_index.save(path or self._spatial_index_path())
+        return self._spatial_index
 
-            if not hasattr(self, ptype):
+    @property
+    def id_index(self) -> Optional[IDIndex]:
+        if not hasattr(self, "_id_index"):
+            self._id_index = IDIndex.load(self._id_index_path(), self.files)
+        return self._id_index
+
+    def _id_index_path(self) -> str:
+        return os.path.splitext(self.files[0])[0] + ".idindex.hdf5"
+
+    def build_id_index(
+        self, path: Optional[StrPath] = None, save: bool = True
+    ) -> IDIndex:
+        if getattr(self, "_id_index", None) is not None:
+            self._id_index.close()
+        self._id_index = IDIndex.build(self)
+        if save:
+            self._id_index.save(path or self._id_index_path())
+        return self._id_index
+
+    def select_by_ids(
+        self,
+        ids,
+        fields: Optional[Iterable[str]] = None,
+        ptypes: Optional[Iterable[str]] = None,
+    ) -> Selection:
+        """Read `fields` of the particles with the given IDs only.
+
+        Each particle type of the result holds the matching rows in the order
+        of `ids`, with IDs not in this snapshot left out. Without a saved
+        index, one is built in memory on first use.
+        """
+        index = self.id_index
+        if index is None:
+            index = self.build_id_index(save=False)
+        selection = Selection(ids)
+        for name in _particle_names:
+            if name is None or not hasattr(self, name):
                 continue
-            particle_dataset = getattr(self, ptype)
-            for key in dir(particle_dataset):
-                if not key.startswith("_key_"):
-                    continue
-                field = getattr(particle_dataset, key)
-                if field is not None:
-                    loaded.append((ptype, key, field[1], field[0].nbytes))
-        return loaded
+            if ptypes is not None and name not in ptypes:
+                continue
+            particles = getattr(self, name)
+            rows = index.lookup(particles._group, selection.ids)
+            hit = rows >= 0
+            rows = rows[hit]
+            loaded = {"ParticleIDs": selection.ids[hit]}
+            for field in particles._fields if fields is None else fields:
+                if field != "ParticleIDs" and particles.has(field):
+                    loaded[field] = particles.read_selection(field, rows)
+            setattr(selection, name, RegionParticles(rows, loaded))
+        return selection
+
+    def make_room(self, incoming):
+        self.cache.make_room(incoming)
 
-    def _make_aliases(self):
-        pass
+    def get_loaded_size(self):
+        return self.cache.nbytes
+
+    def _apply_derived(self, particles, field: DerivedField):
+        name = _particle_names[int(particles._group.removeprefix("PartType"))]
+        if field.ptypes is not None and name not in field.ptypes:
+            return
+        if all(particles.has(dep) for dep in field.depends):
+            particles.derive(field.name, field.depends, field.function)
+
+    def derive(self, name: str, depends, function=None, ptypes=None):
+        """Add a derived field to this snapshot, for use as a decorator or not."""
+        if function is None:
+            return partial(self.derive, name, depends, ptypes=ptypes)
+        field = make_derived(name, depends, function, ptypes)
+        self._instance_derived.append(field)
+        for ptype in _particle_names:
+            # Types not built yet pick the field up when they are.
+            if ptype is not None and ptype in self.__dict__:
+                self._apply_derived(self.__dict__[ptype], field)
+        return function
+
+    @classmethod
+    def register_derived(cls, name: str, depends, function=None, ptypes=None):
+        """Add a derived field to every snapshot of this format opened from now on."""
+        if function is None:
+            return partial(cls.register_derived, name, depends, ptypes=ptypes)
+        if "_derived_fields" not in vars(cls):
+            cls._derived_fields = {}
+        cls._derived_fields[name] = make_derived(name, depends, function, ptypes)
+        return function
 
     @abstractmethod
     def _get_unit(self, group, key): ...
@@ -131,32 +1053,255 @@ class Hdf5Frontend(ABC):
     def __repr__(self) -> str:
         return str(self)
 
+    @classmethod
+    def _get_output_unit(cls, group, key):
+        if group in cls.field_units:
+            if key in cls.field_units[group]:
+                return cls.field_units[group][key]
+        return None
+
     @classmethod
     @abstractmethod
-    def write(cls, source, fname): ...
+    def _write_header(cls, source, f: h5py.File, num_part, num_files: int): ...
 
-    def write_as(self, target, fname):
-        target.write(self, fname)
+    @classmethod
+    def _write_attrs(cls, dataset: h5py.Dataset, unit): ...
 
+    @classmethod
+    def _output_nbytes(cls, source) -> int:
+        total = 0
+        for group, fields in cls.output_fields.items():
+            particles = source.particles(group)
+            if particles is None:
+                continue
+            for names in fields:
+                name = next((n for n in names if particles.has(n)), None)
+                if name is None:
+                    continue
+                if (info := particles.field_info(name)) is not None:
+                    total += math.prod(info[0]) * info[1].itemsize
+                else:
+                    total += int(source.header.num_part[int(group[8:])]) * 8
+        return total
 
-def _make_getter(fname: StrPath, group: str, key: str):
-    def getter(self):
-        if (data := self.check_cache(key)) is not None:
-            return data
+    @classmethod
+    def write(
+        cls,
+        source,
+        fname,
+        chunk_bytes: Optional[int] = None,
+        max_file_bytes: Optional[int] = None,
+        workers: Optional[int] = None,
+        executor: str = "auto",
+        reorder: bool = False,
+        storage: Optional[StoragePolicy] = None,
+        units: str = "auto",
+        dtypes: Union[DtypePolicy, str, None] = None,
+        prefetch: bool = True,
+    ) -> Dict[Tuple[str, str], str]:
+        """Write `source` in this format.
 
-        with h5py.File(fname) as f:
-            loaded_group = f[group]
-            assert isinstance(loaded_group, h5py.Group)
-            loaded_data = loaded_group[key]
-            assert isinstance(loaded_data, h5py.Dataset)
-            nbytes = loaded_data.nbytes
-            self._parent.make_room(nbytes)
-            unit = self._parent._get_unit(group, key)
-            if unit is not None:
-                loaded_data = u.unyt_array(loaded_data[:], unit)
-            else:
-                loaded_data = loaded_data[:]
-            self.add_cache(loaded_data, key)
-            return loaded_data
+        Returns the unit conversion strategy used for each written field,
+        keyed by (group, output name). With `units="auto"` formats that record
+        units per dataset keep the source values as they are; `units="convert"`
+        always stores the values in `field_units`. `dtypes` narrows the
+        stored dtypes, keyed by output name. With `prefetch`, serial writes
+        read the next whole field in the background while the current one is
+        converted and written.
+        """
+        cls.check_writable()
+        if units not in ("auto", "convert"):
+            raise ValueError(f"unknown units mode {units!r}")
+        dtypes = as_policy(dtypes)
+        self_describing = cls.self_describing_units and units == "auto"
+        index = None
+        if reorder and (index := source.spatial_index) is None:
+            raise ValueError("reorder=True needs a spatial index on the source")
+
+        num_part = np.asarray(source.header.num_part, dtype=np.int64)
+        num_files = 1
+        if max_file_bytes is not None:
+            num_files = max(1, math.ceil(cls._output_nbytes(source) / max_file_bytes))
+        bounds = np.linspace(0, num_part, num_files + 1).astype(np.int64)
+        if num_files == 1:
+            fnames = [fname]
+        else:
+            fnames = [piece_name(fname, i) for i in range(num_files)]
+
+        with ExitStack() as stack:
+            files = [stack.enter_context(h5py.File(p, "w")) for p in fnames]
+            for i, f in enumerate(files):
+                cls._write_header(source, f, bounds[i + 1] - bounds[i], num_files)
+            tasks: List[Task] = []
+            sinks = []
+            report: Dict[Tuple[str, str], str] = {}
+            for group, fields in cls.output_fields.items():
+                particles = source.particles(group)
+                if particles is None:
+                    continue
+                ptype = int(group.removeprefix("PartType"))
+                outs = [
+                    (
+                        f.create_group(group),
+                        int(bounds[i][ptype]),
+                        int(bounds[i + 1][ptype]),
+                    )
+                    for i, f in enumerate(files)
+                ]
+                for names in fields:
+                    name = next((n for n in names if particles.has(n)), None)
+                    if name is None:
+                        continue
+                    unit = cls._get_output_unit(group, names[0])
+                    order = index.orders.get(group) if index is not None else None
+                    for task, sink in cls._plan_field(
+                        particles,
+                        name,
+                        outs,
+                        names[0],
+                        unit,
+                        chunk_bytes,
+                        order,
+                        storage,
+                        self_describing,
+                        dtypes,
+                    ):
+                        tasks.append(task)
+                        sinks.append((group, names[0], sink))
+
+            # Sinks run in submission order, so the output is deterministic.
+            if prefetch and (workers is None or workers <= 1):
+                tasks = _prefetching(source, tasks)
+            results = map_ordered(source, tasks, workers, executor)
+            instruments = source.instruments
+            for (group, out_name, sink), (data, conversion) in zip(sinks, results):
+                report[(group, out_name)] = conversion.strategy
+                if instruments is None:
+                    sink(data, conversion)
+                    continue
+                start = time.perf_counter()
+                sink(data, conversion)
+                instruments.record(
+                    "write",
+                    group,
+                    out_name,
+                    start,
+                    time.perf_counter(),
+                    data.nbytes,
+                    strategy=conversion.strategy,
+                )
+        return report
+
+    @classmethod
+    def _plan_field(
+        cls,
+        particles,
+        name: str,
+        outs: List[Tuple[h5py.Group, int, int]],
+        out_name: str,
+        unit,
+        chunk_bytes: Optional[int],
+        order=None,
+        storage: Optional[StoragePolicy] = None,
+        self_describing: bool = False,
+        dtypes: Optional[DtypePolicy] = None,
+    ):
+        group = particles._group
+        info = particles.field_info(name)
+        if info is None:
+            # Computed fields only know their units once evaluated.
+            conversion = deferred(unit, self_describing)
+        else:
+            conversion = plan_conversion(info[2], unit, info[1], self_describing)
+        if chunk_bytes is None or info is None:
+            # Computed fields have no on-disk layout to stream from.
+            rows = None if order is None else np.asarray(order)
+            yield (group, name, rows, conversion), partial(
+                cls._write_whole, outs, out_name, storage, dtypes
+            )
+            return
+
+        shape, dtype, source_unit = info
+        out_dtype = dtype
+        if conversion.strategy == CONVERT:
+            out_dtype = u.unyt_array(np.empty(0, dtype), source_unit).to(unit).dtype
+        if dtypes is not None:
+            # HDF5 narrows each chunk as it is written.
+            out_dtype = dtypes.lookup(group, out_name, out_dtype)
+
+        row_bytes = math.prod(shape[1:]) * max(dtype.itemsize, out_dtype.itemsize)
+        step = max(1, chunk_bytes // max(1, row_bytes))
+        for out, start, stop in outs:
+            out_shape = (stop - start, *shape[1:])
+            dataset = out.create_dataset(
+                out_name,
+                shape=out_shape,
+                dtype=out_dtype,
+                **_storage_kwargs(storage, group, out_name, out_shape, out_dtype),
+            )
+            cls._write_attrs(dataset, conversion.unit)
+            for lo in range(start, stop, step):
+                hi = min(lo + step, stop)
+                rows = slice(lo, hi) if order is None else np.asarray(order[lo:hi])
+                yield (group, name, rows, conversion), partial(
+                    _write_rows, dataset, lo - start, storage
+                )
+
+    @classmethod
+    def _write_whole(cls, outs, out_name: str, storage, dtypes, data, conversion):
+        for out, start, stop in outs:
+            group = out.name.lstrip("/")
+            piece = data[start:stop]
+            if storage is not None:
+                piece = storage.transform(group, out_name, piece)
+            dtype = piece.dtype
+            if dtypes is not None:
+                dtype = dtypes.lookup(group, out_name, dtype)
+            out.create_dataset(
+                out_name,
+                data=piece,
+                dtype=dtype,
+                **_storage_kwargs(storage, group, out_name, piece.shape, dtype),
+            )
+            cls._write_attrs(out[out_name], conversion.unit)
+
+    @classmethod
+    def check_writable(cls):
+        if not cls.writable:
+            raise NotImplementedError(
+                f"{cls.__name__} is a read-only frontend, convert to another "
+                "format such as GadgetFrontend or SwiftFrontend"
+            )
+
+    def write_as(self, target, fname, **kwargs) -> Dict[Tuple[str, str], str]:
+        target.check_writable()
+        return target.write(self, fname, **kwargs)
+
+
+def _prefetching(source, tasks: List[Task]) -> Iterable[Task]:
+    for i, task in enumerate(tasks):
+        if i + 1 < len(tasks) and tasks[i + 1][2] is None:
+            key = stored_key(source, *tasks[i + 1])
+            if key is None or not source.disk_cache.has(source.files, key):
+                source.prefetch([tasks[i + 1][:2]])
+        yield task
+
+
+def _write_rows(dataset: h5py.Dataset, offset: int, storage, data, conversion):
+    if storage is not None:
+        group, name = dataset.name.lstrip("/").rsplit("/", 1)
+        data = storage.transform(group, name, data)
+    dataset[offset : offset + len(data)] = data
+
+
+def _storage_kwargs(storage, group: str, name: str, shape, dtype) -> Dict[str, Any]:
+    if storage is None:
+        return {}
+    return storage.dataset_kwargs(group, name, shape, dtype)
+
+
+def _make_getter(group: str, key: str):
+    def getter(self):
+        return LazyField(self, key)
 
     return getter
@@ -0,0 +1,129 @@
+import os
+from typing import Any, Dict, List, Optional
+
+import h5py
+import numpy as np
+
+from .spatial import file_stamps
+
+# Sorted IDs are read from disk in blocks of this many rows.
+_block_rows = 1024
+# Indices smaller than this are read into memory when loaded.
+_in_memory_bytes = 64 * 1024**2
+
+
+class IDIndex:
+    """ParticleIDs of each type in sorted order, with the row each one is at.
+
+    `ids[group]` is sorted and `rows[group][i]` is the row holding
+    `ids[group][i]`. Loaded from disk, large indices stay there, and only
+    every `block`-th ID (`fences[group]`) is kept in memory to find the
+    blocks a lookup needs.
+    """
+
+    stamps: np.ndarray
+    block: int
+    ids: Dict[str, Any]
+    rows: Dict[str, Any]
+    fences: Dict[str, np.ndarray]
+
+    def __init__(self, stamps, block: int = _block_rows):
+        self.stamps = np.asarray(stamps, dtype=np.int64)
+        self.block = block
+        self.ids = {}
+        self.rows = {}
+        self.fences = {}
+        self._file: Optional[h5py.File] = None
+
+    @classmethod
+    def build(cls, source) -> "IDIndex":
+        index = cls(file_stamps(source.files))
+        for group in source._group_sources:
+            particles = source.particles(group)
+            if "ParticleIDs" not in particles._fields:
+                continue
+            n = particles._fields["ParticleIDs"][0][0]
+            ids = np.asarray(source._read(group, "ParticleIDs", 0, n)).reshape(n)
+            order = np.argsort(ids, kind="stable")
+            index.ids[group] = ids[order]
+            index.rows[group] = order
+            index.fences[group] = index.ids[group][:: index.block]
+        return index
+
+    def save(self, path):
+        with h5py.File(path, "w") as f:
+            f.attrs["stamps"] = self.stamps
+            f.attrs["block"] = self.block
+            for group in self.ids:
+                f[f"{group}/ids"] = self.ids[group]
+                f[f"{group}/rows"] = self.rows[group]
+                f[f"{group}/fences"] = self.fences[group]
+
+    @classmethod
+    def load(cls, path, files: Optional[List[str]] = None) -> Optional["IDIndex"]:
+        if not os.path.exists(path):
+            return None
+        f = h5py.File(path, "r")
+        stamps = f.attrs["stamps"]
+        if files is not None and not np.array_equal(stamps, file_stamps(files)):
+            f.close()
+            return None
+        index = cls(stamps, int(f.attrs["block"]))
+        on_disk = False
+        for group in f:
+            ids, rows = f[group]["ids"], f[group]["rows"]
+            if ids.nbytes + rows.nbytes <= _in_memory_bytes:
+                ids, rows = ids[:], rows[:]
+            else:
+                on_disk = True
+            index.ids[group] = ids
+            index.rows[group] = rows
+            index.fences[group] = f[group]["fences"][:]
+        if on_disk:
+            index._file = f
+        else:
+            f.close()
+        return index
+
+    def close(self):
+        if self._file is not None:
+            self._file.close()
+            self._file = None
+
+    def lookup(self, group: str, ids) -> np.ndarray:
+        """The row of each of `ids`, or -1 for IDs not in this snapshot."""
+        query = np.asarray(ids).reshape(-1)
+        found = np.full(len(query), -1, dtype=np.int64)
+        if group not in self.ids or not len(query):
+            return found
+        sorted_ids = self.ids[group]
+        if not len(sorted_ids):
+            return found
+        query = query.astype(sorted_ids.dtype)
+        if isinstance(sorted_ids, np.ndarray):
+            self._match(sorted_ids, self.rows[group], query, found, slice(None))
+            return found
+
+        # Sort the query so each block is read once, merging adjacent blocks.
+        order = np.argsort(query, kind="stable")
+        blocks = np.searchsorted(self.fences[group], query[order], side="right") - 1
+        blocks = np.maximum(blocks, 0)
+        unique = np.unique(blocks)
+        breaks = np.flatnonzero(np.diff(unique) > 1) + 1
+        n = len(sorted_ids)
+        for run in np.split(unique, breaks):
+            lo = int(run[0]) * self.block
+            hi = min(n, (int(run[-1]) + 1) * self.block)
+            a, b = np.searchsorted(blocks, [run[0], run[-1] + 1])
+            self._match(
+                sorted_ids[lo:hi], self.rows[group][lo:hi], query, found, order[a:b]
+            )
+        return found
+
+    @staticmethod
+    def _match(sorted_ids, rows, query, found, which):
+        q = query[which]
+        pos = np.minimum(np.searchsorted(sorted_ids, q), len(sorted_ids) - 1)
+        hit = sorted_ids[pos] == q
+        where = np.arange(len(query))[which][hit]
+        found[where] = rows[pos[hit]]
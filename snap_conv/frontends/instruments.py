@@ -0,0 +1,184 @@
+import json
+import os
+import threading
+import time
+from collections import defaultdict
+from dataclasses import dataclass, field, fields
+from typing import Any, Callable, Dict, List, Optional, Tuple
+
+# Events without a duration.
+_instant = {"hit", "miss", "evict"}
+
+
+@dataclass(kw_only=True, slots=True, frozen=True)
+class Event:
+    # "open", "read", "convert", "write", "hit", "miss" or "evict".
+    kind: str
+    group: Optional[str]
+    name: str
+    # time.perf_counter() at the start, and the duration, in seconds.
+    start: float
+    duration: float = 0.0
+    nbytes: int = 0
+    thread: int = 0
+    args: Optional[Dict[str, Any]] = None
+
+
+Hook = Callable[[Event], None]
+
+
+@dataclass(slots=True)
+class FieldStats:
+    read_s: float = 0.0
+    convert_s: float = 0.0
+    write_s: float = 0.0
+    bytes_read: int = 0
+    bytes_written: int = 0
+    reads: int = 0
+    cache_hits: int = 0
+    cache_misses: int = 0
+    evictions: int = 0
+
+    def add(self, other: "FieldStats"):
+        for f in fields(self):
+            setattr(self, f.name, getattr(self, f.name) + getattr(other, f.name))
+
+
+@dataclass(slots=True)
+class IOStats:
+    open_s: float = 0.0
+    opens: int = 0
+    # (group, field) -> counters
+    fields: Dict[Tuple[str, str], FieldStats] = field(
+        default_factory=lambda: defaultdict(FieldStats)
+    )
+
+    @property
+    def total(self) -> FieldStats:
+        total = FieldStats()
+        for stats in self.fields.values():
+            total.add(stats)
+        return total
+
+    def table(self) -> str:
+        lines = [
+            f"{'field':<36} {'read s':>8} {'conv s':>8} {'write s':>8}"
+            f" {'MB read':>9} {'MB written':>10} {'hits':>6} {'misses':>6} {'evict':>6}"
+        ]
+        rows = sorted(self.fields.items(), key=lambda kv: -kv[1].read_s)
+        for (group, name), s in [*rows, (("", "total"), self.total)]:
+            label = f"{group}/{name}" if group else name
+            lines.append(
+                f"{label:<36} {s.read_s:8.3f} {s.convert_s:8.3f} {s.write_s:8.3f}"
+                f" {s.bytes_read / 1e6:9.1f} {s.bytes_written / 1e6:10.1f}"
+                f" {s.cache_hits:6} {s.cache_misses:6} {s.evictions:6}"
+            )
+        lines.append(f"files opened: {self.opens} in {self.open_s:.3f} s")
+        return "\n".join(lines)
+
+
+class Instruments:
+    """Collects timings and counters from a frontend and passes events to hooks.
+
+    Frontends only call into this when one is attached, so there is no cost
+    when instrumentation is off.
+    """
+
+    stats: IOStats
+
+    def __init__(self, *hooks: Hook):
+        self.stats = IOStats()
+        self._hooks: List[Hook] = list(hooks)
+        self._lock = threading.Lock()
+
+    def add_hook(self, hook: Hook):
+        self._hooks.append(hook)
+
+    def remove_hook(self, hook: Hook):
+        self._hooks.remove(hook)
+
+    def record(
+        self,
+        kind: str,
+        group: Optional[str],
+        name: str,
+        start: float,
+        stop: Optional[float] = None,
+        nbytes: int = 0,
+        **args,
+    ):
+        duration = 0.0 if stop is None else stop - start
+        with self._lock:
+            if kind == "open":
+                self.stats.open_s += duration
+                self.stats.opens += 1
+            else:
+                stats = self.stats.fields[(group, name)]
+                if kind == "read":
+                    stats.read_s += duration
+                    stats.bytes_read += nbytes
+                    stats.reads += 1
+                elif kind == "convert":
+                    stats.convert_s += duration
+                elif kind == "write":
+                    stats.write_s += duration
+                    stats.bytes_written += nbytes
+                elif kind == "hit":
+                    stats.cache_hits += 1
+                elif kind == "miss":
+                    stats.cache_misses += 1
+                elif kind == "evict":
+                    stats.evictions += 1
+        if self._hooks:
+            event = Event(
+                kind=kind,
+                group=group,
+                name=name,
+                start=start,
+                duration=duration,
+                nbytes=nbytes,
+                thread=threading.get_ident(),
+                args=args or None,
+            )
+            for hook in self._hooks:
+                hook(event)
+
+    def on_evict(self, key, data):
+        group, name = key
+        self.record("evict", group, name, time.perf_counter(), nbytes=data.nbytes)
+
+
+class ChromeTrace:
+    """A hook that collects events for chrome://tracing or Perfetto."""
+
+    def __init__(self):
+        self.events: List[Event] = []
+        self._lock = threading.Lock()
+
+    def __call__(self, event: Event):
+        with self._lock:
+            self.events.append(event)
+
+    def to_json(self) -> Dict[str, Any]:
+        origin = min((e.start for e in self.events), default=0.0)
+        pid = os.getpid()
+        trace = []
+        for e in self.events:
+            entry = dict(
+                name=f"{e.group}/{e.name}" if e.group else e.name,
+                cat=e.kind,
+                ts=(e.start - origin) * 1e6,
+                pid=pid,
+                tid=e.thread,
+                args=dict(nbytes=e.nbytes, **(e.args or {})),
+            )
+            if e.kind in _instant:
+                entry.update(ph="i", s="t")
+            else:
+                entry.update(ph="X", dur=e.duration * 1e6)
+            trace.append(entry)
+        return {"traceEvents": trace, "displayTimeUnit": "ms"}
+
+    def save(self, path):
+        with open(path, "w") as f:
+            json.dump(self.to_json(), f)
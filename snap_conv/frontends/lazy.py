@@ -0,0 +1,128 @@
+import operator
+
+import numpy as np
+
+
+class LazyField:
+    """An unloaded field that reads only the rows it is indexed with.
+
+    Slicing, integer index arrays and boolean masks along the first axis are
+    read straight from the file. Anything else (arithmetic, ufuncs, attribute
+    access such as `.to`) loads and caches the whole field first.
+    """
+
+    __slots__ = ("_particles", "_name", "_units", "shape", "dtype")
+
+    def __init__(self, particles, name: str):
+        self._particles = particles
+        self._name = name
+        self.shape, self.dtype, self._units = particles.field_info(name)
+
+    @property
+    def name(self) -> str:
+        return self._name
+
+    @property
+    def units(self):
+        # Mirror the loaded array: unitless fields are plain ndarrays.
+        if self._units is None:
+            raise AttributeError("units")
+        return self._units
+
+    @property
+    def ndim(self) -> int:
+        return len(self.shape)
+
+    @property
+    def size(self) -> int:
+        return int(np.prod(self.shape))
+
+    @property
+    def nbytes(self) -> int:
+        return self.size * self.dtype.itemsize
+
+    def __len__(self) -> int:
+        return self.shape[0]
+
+    def load(self):
+        return self._particles.load(self._name)
+
+    def __getitem__(self, index):
+        return self._particles.read_selection(self._name, index)
+
+    def __array__(self, dtype=None, copy=None):
+        return np.asarray(self.load(), dtype=dtype)
+
+    def __array_ufunc__(self, ufunc, method, *inputs, **kwargs):
+        inputs = tuple(_load(x) for x in inputs)
+        if "out" in kwargs:
+            kwargs["out"] = tuple(_load(x) for x in kwargs["out"])
+        return getattr(ufunc, method)(*inputs, **kwargs)
+
+    def __array_function__(self, func, types, args, kwargs):
+        args = tuple(_load(x) for x in args)
+        kwargs = {k: _load(v) for k, v in kwargs.items()}
+        return func(*args, **kwargs)
+
+    def __getattr__(self, name: str):
+        if name.startswith("_"):
+            raise AttributeError(name)
+        return getattr(self.load(), name)
+
+    def __iter__(self):
+        return iter(self.load())
+
+    def __repr__(self) -> str:
+        return (
+            f"LazyField({self._name}, shape={self.shape}, dtype={self.dtype}, "
+            f"units={self._units})"
+        )
+
+
+def _load(x):
+    if isinstance(x, LazyField):
+        return x.load()
+    if isinstance(x, (list, tuple)):
+        return type(x)(_load(v) for v in x)
+    return x
+
+
+def _forward(op):
+    def method(self, *args):
+        return op(self.load(), *map(_load, args))
+
+    return method
+
+
+def _reflect(op):
+    def method(self, other):
+        return op(_load(other), self.load())
+
+    return method
+
+
+for _name in [
+    "add",
+    "sub",
+    "mul",
+    "truediv",
+    "floordiv",
+    "mod",
+    "pow",
+    "matmul",
+    "and_",
+    "or_",
+    "xor",
+    "lt",
+    "le",
+    "eq",
+    "ne",
+    "gt",
+    "ge",
+]:
+    _dunder = f"__{_name.rstrip('_')}__"
+    setattr(LazyField, _dunder, _forward(getattr(operator, _name)))
+    if _name not in ("lt", "le", "eq", "ne", "gt", "ge"):
+        setattr(LazyField, f"__r{_dunder[2:]}", _reflect(getattr(operator, _name)))
+for _name in ["neg", "pos", "abs", "invert"]:
+    setattr(LazyField, f"__{_name}__", _forward(getattr(operator, _name)))
@@ -0,0 +1,130 @@
+import time
+from collections import deque
+from contextlib import nullcontext
+from concurrent.futures import Executor, ProcessPoolExecutor, ThreadPoolExecutor
+from functools import partial
+from typing import Any, Iterable, Iterator, Optional, Tuple, Union
+
+import numpy as np
+import unyt as u
+
+from .units import CONVERT, SCALE, Conversion, apply_conversion
+
+# (group, field, rows, conversion), where rows is None for the whole field, a
+# slice of rows, or an array of row indices. Tasks return (data, conversion),
+# with the conversion that was actually applied.
+Task = Tuple[str, str, Union[None, slice, np.ndarray], Optional[Conversion]]
+
+_worker_source = None
+
+
+def stored_key(source, group, name, rows, conversion) -> Optional[Tuple]:
+    """The `disk_cache` key of a task's converted result, if it is kept."""
+    if (
+        rows is None
+        and source.disk_cache is not None
+        and conversion is not None
+        and conversion.strategy in (SCALE, CONVERT)
+    ):
+        key = source.disk_key(source.particles(group), name)
+        if key is not None:
+            return (*key, str(conversion.unit))
+    return None
+
+
+def run_task(source, group, name, rows, conversion):
+    particles = source.particles(group)
+    key = particles.resolve(name)
+    # Whole fields are kept converted, to skip both the read and the
+    # conversion next time.
+    stored = stored_key(source, group, name, rows, conversion)
+    if stored is not None:
+        if (data := source.disk_cache.get(source.files, stored)) is not None:
+            return u.unyt_array(data, conversion.unit), conversion
+    cached = source.cache.peek((group, key))
+    if rows is None:
+        data, owned = particles.load(name), False
+    elif cached is not None:
+        # Fancy indexing copies, slicing returns a view of the cached field.
+        data, owned = cached[rows], not isinstance(rows, slice)
+    elif key not in particles._fields:
+        # Derived fields are evaluated on just these rows.
+        data, owned = particles.read_selection(name, rows), False
+    elif isinstance(rows, slice):
+        data, owned = source.read_rows(group, key, rows.start, rows.stop), True
+    else:
+        data, owned = source.read_index(group, key, rows), True
+    if (instruments := source.instruments) is None or conversion is None:
+        data, conversion = apply_conversion(data, conversion, owned)
+    else:
+        start = time.perf_counter()
+        data, conversion = apply_conversion(data, conversion, owned)
+        instruments.record(
+            "convert",
+            group,
+            key,
+            start,
+            time.perf_counter(),
+            data.nbytes,
+            strategy=conversion.strategy,
+        )
+    if stored is not None:
+        source.disk_cache.put(source.files, stored, data)
+    return data, conversion
+
+
+def _init_worker(cls, fname, kwargs):
+    global _worker_source
+    _worker_source = cls(fname, cache_size=None, **kwargs)
+
+
+def _run_worker_task(*task):
+    return run_task(_worker_source, *task)
+
+
+def make_executor(source, workers: int, executor: str) -> Tuple[Executor, Any]:
+    if executor == "auto":
+        executor = "process" if source._compressed else "thread"
+    if executor == "thread":
+        return ThreadPoolExecutor(workers), partial(run_task, source)
+    if executor == "process":
+        pool = ProcessPoolExecutor(
+            workers,
+            initializer=_init_worker,
+            initargs=(type(source), source.fname, source._worker_kwargs()),
+        )
+        return pool, _run_worker_task
+    raise ValueError(f"unknown executor {executor!r}")
+
+
+def map_ordered(
+    source,
+    tasks: Iterable[Task],
+    workers: Optional[int] = None,
+    executor: str = "auto",
+) -> Iterator[Any]:
+    """Run `tasks` against `source`, yielding results in submission order.
+
+    At most `workers` tasks are in flight at once, which bounds the memory
+    held by finished but not yet consumed results.
+    """
+    if workers is None or workers <= 1:
+        for task in tasks:
+            yield run_task(source, *task)
+        return
+
+    pool, fn = make_executor(source, workers, executor)
+    # Worker processes only know the fields a new frontend has, so fields
+    # added to this one with `derive` or `alias` are read here, on threads.
+    local = ThreadPoolExecutor(workers) if fn is _run_worker_task else None
+    with pool, local or nullcontext():
+        pending = deque()
+        for task in tasks:
+            if local is not None and not source._worker_knows(*task[:2]):
+                pending.append(local.submit(run_task, source, *task))
+            else:
+                pending.append(pool.submit(fn, *task))
+            if len(pending) >= workers:
+                yield pending.popleft().result()
+        while pending:
+            yield pending.popleft().result()
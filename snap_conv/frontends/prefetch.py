@@ -0,0 +1,71 @@
+import math
+import threading
+from concurrent.futures import Future
+from typing import Iterable, List, Optional, Tuple
+
+
+def field_pairs(fields) -> List[Tuple[str, str]]:
+    # {ptype: [field, ...]} or [(ptype, field), ...]
+    if isinstance(fields, dict):
+        return [(ptype, name) for ptype, names in fields.items() for name in names]
+    return list(fields)
+
+
+def particles_of(source, ptype: str):
+    # Particle types are named ("gas") or given as groups ("PartType0").
+    if ptype.startswith("PartType"):
+        return source.particles(ptype)
+    return getattr(source, ptype, None)
+
+
+class Prefetch:
+    """Fields being loaded into a frontend's cache in the background."""
+
+    fields: List[Tuple[str, str]]
+    loaded: List[Tuple[str, str]]
+    # Fields left out, because they did not fit in the budget, do not exist
+    # or the request was cancelled before reaching them.
+    skipped: List[Tuple[str, str]]
+    future: Optional[Future]
+
+    def __init__(self, fields: Iterable[Tuple[str, str]]):
+        self.fields = field_pairs(fields)
+        self.loaded = []
+        self.skipped = []
+        self.future = None
+        self._cancelled = threading.Event()
+
+    def run(self, source):
+        cache = source.cache
+        for ptype, name in self.fields:
+            particles = particles_of(source, ptype)
+            if self._cancelled.is_set() or particles is None or not particles.has(name):
+                self.skipped.append((ptype, name))
+                continue
+            if cache.peek((particles._group, particles.resolve(name))) is None:
+                info = particles.field_info(name)
+                nbytes = math.prod(info[0]) * info[1].itemsize if info else 0
+                # Only free space is used: evicting fields to make room would
+                # throw away what the caller is working on.
+                if (free := cache.free_bytes) is not None and nbytes > free:
+                    self.skipped.append((ptype, name))
+                    continue
+            particles.load(name)
+            self.loaded.append((ptype, name))
+        return self
+
+    def cancel(self):
+        """Skip the fields not started yet."""
+        self._cancelled.set()
+
+    def done(self) -> bool:
+        return self.future is not None and self.future.done()
+
+    def wait(self, timeout: Optional[float] = None) -> "Prefetch":
+        if self.future is not None:
+            self.future.result(timeout)
+        return self
+
+    def __repr__(self) -> str:
+        state = "done" if self.done() else "running"
+        return f"Prefetch({len(self.loaded)}/{len(self.fields)} loaded, {state})"
@@ -0,0 +1,77 @@
+from typing import Any, Dict, List, Tuple
+
+import numpy as np
+import unyt as u
+
+Ranges = List[Tuple[int, int]]
+
+
+class RegionParticles:
+    rows: np.ndarray
+
+    def __init__(self, rows: np.ndarray, fields: Dict[str, Any]):
+        self.rows = rows
+        self._fields = fields
+
+    def __getattr__(self, name: str) -> Any:
+        if name.startswith("_"):
+            raise AttributeError(name)
+        try:
+            return self._fields[name]
+        except KeyError:
+            raise AttributeError(name) from None
+
+    def __len__(self) -> int:
+        return len(self.rows)
+
+    def keys(self):
+        return self._fields.keys()
+
+
+class Region:
+    def __init__(self, center, half_width):
+        self.center = center
+        self.half_width = half_width
+
+    def __repr__(self) -> str:
+        return f"Region(center={self.center}, half_width={self.half_width})"
+
+
+class Selection:
+    """Particles picked out of a snapshot by ParticleIDs."""
+
+    def __init__(self, ids):
+        self.ids = np.asarray(ids).reshape(-1)
+
+    def __repr__(self) -> str:
+        return f"Selection({len(self.ids)} ids)"
+
+
+def in_units(value, unit) -> np.ndarray:
+    if isinstance(value, u.unyt_array):
+        if unit is not None:
+            value = value.to(unit)
+        value = value.view(np.ndarray)
+    return np.asarray(value, dtype=np.float64)
+
+
+def periodic_offset(x: np.ndarray, center: np.ndarray, box: np.ndarray) -> np.ndarray:
+    return (x - center + box / 2) % box - box / 2
+
+
+def box_mask(coords, center, half_width, box) -> np.ndarray:
+    dx = periodic_offset(coords, center, box)
+    return np.all(np.abs(dx) <= half_width, axis=1)
+
+
+def merge_ranges(starts, stops) -> Ranges:
+    order = np.argsort(starts, kind="stable")
+    merged: Ranges = []
+    for start, stop in zip(np.asarray(starts)[order], np.asarray(stops)[order]):
+        if stop <= start:
+            continue
+        if merged and start <= merged[-1][1]:
+            merged[-1] = (merged[-1][0], max(merged[-1][1], int(stop)))
+        else:
+            merged.append((int(start), int(stop)))
+    return merged
@@ -0,0 +1,18 @@
+from dataclasses import dataclass
+from typing import Any, Dict, Tuple
+
+import numpy as np
+
+# field -> (shape after the particle axis, dtype)
+Layout = Dict[str, Tuple[Tuple[int, ...], np.dtype]]
+
+
+@dataclass(kw_only=True, slots=True, frozen=True)
+class Schema:
+    """The fields and units of each particle type in the first snapshot of a
+    `SnapshotSeries`. Later members are checked against it and, where they
+    match, take their layout from it."""
+
+    fields: Dict[str, Layout]
+    # group -> {field: unit, or None}
+    units: Dict[str, Dict[str, Any]]
@@ -0,0 +1,133 @@
+import glob
+import os
+import threading
+from functools import cached_property
+from typing import Any, Dict, Iterator, List, Optional
+
+import numpy as np
+
+from .cache import CacheStats, CacheView, FieldCache
+from .detect import detect_format
+from .files import is_later_piece
+from .header import Header
+from .schema import Schema
+
+
+class SnapshotSeries:
+    """The snapshots of one simulation, opened as they are used.
+
+    The fields and units of the first snapshot become the schema of the
+    series. In later snapshots, every particle type with the same field
+    names must store them with the same trailing shape, dtype and units, or
+    opening it raises ValueError naming the snapshot and field (a type with
+    different fields is read as usual). All snapshots share one cache, with
+    a single `cache_size` budget and LRU order.
+    """
+
+    def __init__(
+        self,
+        fnames,
+        frontend: Optional[type] = None,
+        cache_size: Optional[int] = 1024**3,
+        **kwargs,
+    ):
+        if isinstance(fnames, (str, bytes, os.PathLike)):
+            # A glob pattern, with only the first piece of multi-file snapshots.
+            pattern = os.fsdecode(fnames)
+            fnames = [f for f in sorted(glob.glob(pattern)) if not is_later_piece(f)]
+        self.fnames: List[str] = [os.fsdecode(f) for f in fnames]
+        if not self.fnames:
+            raise ValueError("no snapshots in the series")
+        self.frontend = frontend or detect_format(self.fnames[0])
+        if self.frontend is None:
+            raise ValueError(f"{self.fnames[0]} is not a recognised snapshot")
+        self.cache = FieldCache(cache_size)
+        self._kwargs = kwargs
+        self._members: Dict[int, Any] = {}
+        self._lock = threading.RLock()
+
+    def __len__(self) -> int:
+        return len(self.fnames)
+
+    def __getitem__(self, index):
+        if isinstance(index, slice):
+            return [self[i] for i in range(*index.indices(len(self)))]
+        i = range(len(self))[index]
+        with self._lock:
+            if i not in self._members:
+                self._members[i] = self._open(i)
+            return self._members[i]
+
+    def __iter__(self) -> Iterator[Any]:
+        for i in range(len(self)):
+            yield self[i]
+
+    def _open(self, i: int):
+        schema = None if i == 0 else self.schema
+        kwargs = {"header_only": True, **self._kwargs}
+        return self.frontend(
+            self.fnames[i], cache=CacheView(self.cache, i), schema=schema, **kwargs
+        )
+
+    @cached_property
+    def schema(self) -> Schema:
+        return self[0].schema()
+
+    @property
+    def cache_size(self) -> Optional[int]:
+        return self.cache.max_bytes
+
+    @cache_size.setter
+    def cache_size(self, value: Optional[int]):
+        self.cache.max_bytes = value
+        self.cache.make_room(0)
+
+    @property
+    def cache_stats(self) -> CacheStats:
+        return self.cache.stats
+
+    @cached_property
+    def headers(self) -> List[Header]:
+        headers = []
+        for i in range(len(self)):
+            opened = i in self._members
+            member = self[i]
+            headers.append(member.header)
+            if not opened:
+                # Reopened on first use, so that a long series does not hold
+                # a file handle per snapshot just for its header.
+                for handle in member._handles:
+                    handle.close()
+        return headers
+
+    def _header_array(self, name: str, dtype=np.float64) -> np.ndarray:
+        return np.array([getattr(h, name) for h in self.headers], dtype=dtype)
+
+    @property
+    def redshift(self) -> np.ndarray:
+        return self._header_array("redshift")
+
+    @property
+    def scale(self) -> np.ndarray:
+        return self._header_array("scale")
+
+    @property
+    def num_part(self) -> np.ndarray:
+        # One row of six particle counts per snapshot.
+        return self._header_array("num_part", np.int64)
+
+    def close(self):
+        with self._lock:
+            for member in self._members.values():
+                member.close()
+            self._members.clear()
+        self.cache.clear()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc_info):
+        self.close()
+
+    def __repr__(self) -> str:
+        return f"SnapshotSeries({len(self)} {self.frontend.__name__} snapshots)"
@@ -0,0 +1,138 @@
+import itertools
+import os
+from typing import Any, Dict, List, Optional
+
+import h5py
+import numpy as np
+
+from .region import in_units, merge_ranges
+
+_bits = 21
+
+
+def _spread(v: np.ndarray) -> np.ndarray:
+    v = v.astype(np.uint64) & np.uint64(0x1FFFFF)
+    v = (v | v << np.uint64(32)) & np.uint64(0x1F00000000FFFF)
+    v = (v | v << np.uint64(16)) & np.uint64(0x1F0000FF0000FF)
+    v = (v | v << np.uint64(8)) & np.uint64(0x100F00F00F00F00F)
+    v = (v | v << np.uint64(4)) & np.uint64(0x10C30C30C30C30C3)
+    v = (v | v << np.uint64(2)) & np.uint64(0x1249249249249249)
+    return v
+
+
+def morton_index(cells: np.ndarray) -> np.ndarray:
+    cells = np.asarray(cells)
+    return (
+        _spread(cells[..., 0]) << np.uint64(2)
+        | _spread(cells[..., 1]) << np.uint64(1)
+        | _spread(cells[..., 2])
+    )
+
+
+def morton_keys(coords: np.ndarray, box: np.ndarray, bits: int = _bits) -> np.ndarray:
+    scaled = np.floor((coords % box) / box * 2**bits)
+    return morton_index(np.clip(scaled, 0, 2**bits - 1).astype(np.uint64))
+
+
+def file_stamps(files: List[str]) -> np.ndarray:
+    stats = [os.stat(f) for f in files]
+    return np.array([(s.st_size, s.st_mtime_ns) for s in stats], dtype=np.int64)
+
+
+class SpatialIndex:
+    """Particles of each type ordered along a Morton curve.
+
+    `orders[group]` is the permutation sorting that type's rows by key and
+    `offsets[group][c]:offsets[group][c + 1]` is the slice of it that falls
+    in top-level cell `c` of a `2**level` grid (cells numbered in Morton order).
+    """
+
+    level: int
+    box: np.ndarray
+    stamps: np.ndarray
+    orders: Dict[str, Any]
+    offsets: Dict[str, np.ndarray]
+
+    def __init__(self, level: int, box, stamps, orders=None, offsets=None):
+        self.level = level
+        self.box = np.asarray(box, dtype=np.float64)
+        self.stamps = np.asarray(stamps, dtype=np.int64)
+        self.orders = orders if orders is not None else {}
+        self.offsets = offsets if offsets is not None else {}
+        self._file: Optional[h5py.File] = None
+
+    @classmethod
+    def build(cls, source, level: int = 6, chunk_rows: int = 1 << 20) -> "SpatialIndex":
+        box = _coordinate_box(source)
+        index = cls(level, box, file_stamps(source.files))
+        shift = np.uint64(3 * (_bits - level))
+        for group in source._group_sources:
+            n = source.particles(group)._fields["Coordinates"][0][0]
+            keys = np.empty(n, dtype=np.uint64)
+            for start in range(0, n, chunk_rows):
+                stop = min(start + chunk_rows, n)
+                coords = source._read(group, "Coordinates", start, stop)
+                keys[start:stop] = morton_keys(coords, box)
+            order = np.argsort(keys, kind="stable")
+            cells = keys[order] >> shift
+            counts = np.bincount(cells.astype(np.int64), minlength=8**level)
+            index.orders[group] = order
+            index.offsets[group] = np.concatenate([[0], np.cumsum(counts)])
+        return index
+
+    def save(self, path):
+        with h5py.File(path, "w") as f:
+            f.attrs["level"] = self.level
+            f.attrs["box"] = self.box
+            f.attrs["stamps"] = self.stamps
+            for group, order in self.orders.items():
+                f[f"{group}/order"] = order
+                f[f"{group}/offsets"] = self.offsets[group]
+
+    @classmethod
+    def load(cls, path, files: Optional[List[str]] = None) -> Optional["SpatialIndex"]:
+        if not os.path.exists(path):
+            return None
+        f = h5py.File(path, "r")
+        stamps = f.attrs["stamps"]
+        if files is not None and not np.array_equal(stamps, file_stamps(files)):
+            f.close()
+            return None
+        index = cls(int(f.attrs["level"]), f.attrs["box"], stamps)
+        for group in f:
+            # Permutations stay on disk and are sliced per query.
+            index.orders[group] = f[group]["order"]
+            index.offsets[group] = f[group]["offsets"][:]
+        index._file = f
+        return index
+
+    def close(self):
+        if self._file is not None:
+            self._file.close()
+            self._file = None
+
+    def query(self, group: str, center, half_width) -> Optional[np.ndarray]:
+        if group not in self.orders:
+            return None
+        n = 2**self.level
+        size = self.box / n
+        axes = []
+        for c, h, s in zip(center, half_width * np.ones(3), size):
+            lo = int(np.floor((c - h) / s))
+            hi = int(np.floor((c + h) / s))
+            axes.append(np.arange(lo, hi + 1) % n if hi - lo + 1 < n else np.arange(n))
+        cells = np.array(list(itertools.product(*axes)), dtype=np.uint64)
+        cells = np.unique(morton_index(cells)).astype(np.int64)
+
+        # Cells next to each other on the curve are read as one slice.
+        offsets = self.offsets[group]
+        order = self.orders[group]
+        ranges = merge_ranges(offsets[cells], offsets[cells + 1])
+        if not ranges:
+            return np.empty(0, dtype=np.int64)
+        return np.sort(np.concatenate([order[lo:hi] for lo, hi in ranges]))
+
+
+def _coordinate_box(source) -> np.ndarray:
+    group = next(iter(source._group_sources))
+    return in_units(source.header.box_size, source._get_unit(group, "Coordinates"))
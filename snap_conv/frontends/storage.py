@@ -0,0 +1,83 @@
+import math
+from dataclasses import dataclass, field
+from typing import Any, Dict, Optional
+
+import numpy as np
+
+
+@dataclass(kw_only=True, slots=True)
+class FieldStorage:
+    compression: Optional[str] = "gzip"
+    compression_opts: Optional[int] = 4
+    shuffle: bool = True
+    fletcher32: bool = False
+    # Target size of one chunk, or an explicit number of rows per chunk.
+    chunk_bytes: int = 1024**2
+    chunk_rows: Optional[int] = None
+    # Lossy options, only applied to floating point fields.
+    # scaleoffset keeps this many decimal digits (HDF5 scale-offset filter).
+    scaleoffset: Optional[int] = None
+    # precision keeps this many mantissa bits and zeroes the rest.
+    precision: Optional[int] = None
+
+
+@dataclass(kw_only=True, slots=True)
+class StoragePolicy:
+    """How `write_as` lays out output datasets.
+
+    `fields` overrides `default` per field, keyed either by field name or by
+    "PartTypeN/name" for a single particle type.
+    """
+
+    default: FieldStorage = field(default_factory=FieldStorage)
+    fields: Dict[str, FieldStorage] = field(default_factory=dict)
+
+    def lookup(self, group: str, name: str) -> FieldStorage:
+        storage = self.fields.get(f"{group}/{name}")
+        if storage is None:
+            storage = self.fields.get(name, self.default)
+        return storage
+
+    def dataset_kwargs(self, group: str, name: str, shape, dtype) -> Dict[str, Any]:
+        storage = self.lookup(group, name)
+        if shape[0] == 0:
+            return {}
+        row_bytes = max(1, math.prod(shape[1:]) * np.dtype(dtype).itemsize)
+        rows = storage.chunk_rows or max(1, storage.chunk_bytes // row_bytes)
+        kwargs: Dict[str, Any] = dict(
+            chunks=(min(rows, shape[0]), *shape[1:]),
+            shuffle=storage.shuffle,
+            fletcher32=storage.fletcher32,
+        )
+        if storage.compression is not None:
+            kwargs["compression"] = storage.compression
+            if storage.compression != "lzf":
+                kwargs["compression_opts"] = storage.compression_opts
+        is_float = np.issubdtype(dtype, np.floating)
+        if storage.scaleoffset is not None and is_float:
+            kwargs["scaleoffset"] = storage.scaleoffset
+        return kwargs
+
+    def transform(self, group: str, name: str, data):
+        bits = self.lookup(group, name).precision
+        if bits is None or not np.issubdtype(data.dtype, np.floating):
+            return data
+        return truncate_mantissa(data, bits)
+
+
+_mantissa_bits = {np.dtype(np.float32): 23, np.dtype(np.float64): 52}
+_uint_types = {np.dtype(np.float32): np.uint32, np.dtype(np.float64): np.uint64}
+
+
+def truncate_mantissa(data, bits: int):
+    dtype = np.dtype(data.dtype)
+    if dtype not in _mantissa_bits or bits >= _mantissa_bits[dtype]:
+        return data
+    uint = _uint_types[dtype]
+    mask = ~uint((1 << (_mantissa_bits[dtype] - bits)) - 1)
+    values = np.asarray(data)
+    truncated = (values.view(uint) & mask).view(dtype)
+    if values is data:
+        return truncated
+    # Keep the unit wrapper (and any other ndarray subclass) of the input.
+    return data.__array_wrap__(truncated)
@@ -1,300 +1,267 @@
-import h5py
+from functools import lru_cache
+
 import numpy as np
 import unyt as u
 
 from snap_conv.util import git_version
 
+from .derived import clip_negative, make_derived
 from .hdf5 import Hdf5Frontend
 from .header import Header
+from .region import merge_ranges, periodic_offset
 
 _units = [u.Ampere, u.cm, u.g, u.K, u.s]
+_dimensions = [
+    u.dimensions.current_mks,
+    u.dimensions.length,
+    u.dimensions.mass,
+    u.dimensions.temperature,
+    u.dimensions.time,
+]
+_cgs_factor = "Conversion factor to CGS (not including cosmological corrections)"
+
+
+@lru_cache
+def _make_unit(factor, exponents):
+    unit = 1.0
+    for part, exp in zip(_units, exponents):
+        unit = unit * part**exp
+    if unit == 1 and factor == 1:
+        return None
+    return factor * unit
 
 
 class SwiftFrontend(Hdf5Frontend):
-    def _make_aliases(self):
-        self.gas.alias("Density", "Densities")
-        self.gas.alias("SmoothingLength", "SmoothingLengths")
-        self.gas.alias("StarFormationRate", SwiftFrontend.sanitize_sfr)
-        self.gas.alias("InternalEnergy", "InternalEnergies")
-        self.stars.alias("SmoothingLength", "SmoothingLengths")
-        self.stars.alias("InitialMass", "InitialMasses")
-        self.stars.alias("StellarFormationTime", "BirthScaleFactors")
-        self.black_holes.alias("Masses", "SubgridMasses")
-        self.black_holes.alias("SmoothingLength", "SmoothingLengths")
-        self.black_holes.alias("Mdot", "AccretionRates")
+    units = dict(
+        mass=1e10 * u.Msun,
+        length=u.Mpc,
+        velocity=u.km / u.s,
+    )
+    units["time"] = units["length"] / units["velocity"]
+
+    gas_units = dict(
+        Coordinates=units["length"],
+        StarFormationRates=u.Msun / u.yr,
+        Masses=units["mass"],
+        InternalEnergies=units["velocity"] ** 2,
+        Densities=units["mass"] / units["length"] ** 3,
+        Velocities=units["velocity"],
+        SmoothingLengths=units["length"],
+    )
+    dm_units = dict(
+        Coordinates=units["length"],
+        Masses=units["mass"],
+        Velocities=units["velocity"],
+    )
+    star_units = dict(
+        Coordinates=units["length"],
+        Masses=units["mass"],
+        Velocities=units["velocity"],
+        SmoothingLengths=units["length"],
+        InitialMasses=units["mass"],
+    )
+    bh_units = dict(
+        Coordinates=units["length"],
+        Masses=units["mass"],
+        Velocities=units["velocity"],
+        SmoothingLengths=units["length"],
+        AccretionRates=units["mass"] / units["time"],
+    )
+    field_units = dict(
+        PartType0=gas_units,
+        PartType1=dm_units,
+        PartType4=star_units,
+        PartType5=bh_units,
+    )
+    field_aliases = dict(
+        PartType0=dict(
+            Density="Densities",
+            SmoothingLength="SmoothingLengths",
+            InternalEnergy="InternalEnergies",
+        ),
+        PartType4=dict(
+            SmoothingLength="SmoothingLengths",
+            InitialMass="InitialMasses",
+            StellarFormationTime="BirthScaleFactors",
+        ),
+        PartType5=dict(
+            Masses="SubgridMasses",
+            SmoothingLength="SmoothingLengths",
+            Mdot="AccretionRates",
+        ),
+    )
+    # Negative rates hold the scale factor at which a particle last formed stars.
+    _derived_fields = {
+        "StarFormationRate": make_derived(
+            "StarFormationRate", "StarFormationRates", clip_negative, "gas"
+        )
+    }
+    # Every dataset carries its CGS conversion factor and unit exponents.
+    self_describing_units = True
+    output_fields = dict(
+        PartType0=[
+            ("ParticleIDs",),
+            ("Coordinates",),
+            ("StarFormationRates", "StarFormationRate"),
+            ("Masses",),
+            ("InternalEnergies", "InternalEnergy"),
+            ("Densities", "Density"),
+            ("Velocities",),
+            ("SmoothingLengths", "SmoothingLength"),
+        ],
+        PartType1=[
+            ("ParticleIDs",),
+            ("Coordinates",),
+            ("Masses",),
+            ("Velocities",),
+        ],
+        PartType4=[
+            ("ParticleIDs",),
+            ("Coordinates",),
+            ("Masses",),
+            ("Velocities",),
+            ("SmoothingLengths", "SmoothingLength"),
+            ("InitialMasses", "InitialMass"),
+            ("BirthScaleFactors", "StellarFormationTime"),
+        ],
+        PartType5=[
+            ("ParticleIDs",),
+            ("Coordinates",),
+            ("Masses",),
+            ("Velocities",),
+            ("SmoothingLengths", "SmoothingLength"),
+            ("AccretionRates", "Mdot"),
+        ],
+    )
 
     def sanitize_sfr(self):
-        if (data := self.gas.check_cache("StarFormationRate")) is not None:
-            return data
-        data = self.gas.StarFormationRates.copy()
-        data[data < 0] = 0
-        self.gas.add_cache(data, "StarFormationRate")
-        return data
+        return self.gas.load("StarFormationRate")
 
-    def _get_unit(self, group, key):
-        with h5py.File(self.fname) as f:
-            attrs = f[group][key].attrs
-            factor = attrs[
-                "Conversion factor to CGS (not including cosmological corrections)"
-            ][0]
-            exponents = [attrs[f"U_{c} exponent"][0] for c in "ILMTt"]
-            unit = 1.0
-            for part, exp in zip(_units, exponents):
-                unit = unit * part**exp
-            if unit == 1 and factor == 1:
-                return None
-            return factor * unit
+    def _get_metadata(self):
+        super()._get_metadata()
+        # group -> {field: unit}, read the first time a group is asked for.
+        self._unit_table = {}
 
-    @classmethod
-    def _get_output_unit(cls, group, key):
-        units = dict(
-            mass=1e10 * u.Msun,
-            length=u.Mpc,
-            velocity=u.km / u.s,
-        )
-        units["time"] = units["length"] / units["velocity"]
+    def _load_unit_table(self, group):
+        table = {}
+        if group not in self._group_sources:
+            return table
+        for key, dataset in self._open(self._group_sources[group])[group].items():
+            attrs = dataset.attrs
+            if _cgs_factor not in attrs:
+                continue
+            table[key] = _make_unit(
+                attrs[_cgs_factor][0],
+                tuple(attrs[f"U_{c} exponent"][0] for c in "ILMTt"),
+            )
+        return table
 
-        gas_units = dict(
-            Coordinates=units["length"],
-            StarFormationRate=u.Msun / u.yr,
-            Masses=units["mass"],
-            InternalEnergy=units["velocity"] ** 2,
-            Density=units["mass"] / units["length"] ** 3,
-            Velocities=units["velocity"],
-            SmoothingLength=units["length"],
-        )
-        dm_units = dict(
-            Coordinates=units["length"],
-            Masses=units["mass"],
-            Velocities=units["velocity"],
-        )
-        star_units = dict(
-            Coordinates=units["length"],
-            Masses=units["mass"],
-            Velocities=units["velocity"],
-            SmoothingLength=units["length"],
-            InitialMass=units["mass"],
-        )
-        bh_units = dict(
-            Coordinates=units["length"],
-            Masses=units["mass"],
-            Velocities=units["velocity"],
-            SmoothingLength=units["length"],
-            Mdot=units["mass"] / units["time"],
-        )
-        field_units = dict(
-            PartType0=gas_units,
-            PartType1=dm_units,
-            PartType4=star_units,
-            PartType5=bh_units,
-        )
+    def _get_unit(self, group, key):
+        if group not in self._unit_table:
+            self._unit_table[group] = self._load_unit_table(group)
+        return self._unit_table[group].get(key)
 
-        if group in field_units:
-            if key in field_units[group]:
-                return field_units[group][key]
-        return None
+    def _load_cells(self):
+        if hasattr(self, "_cells"):
+            return self._cells
+        self._cells = None
+        f = self._open()
+        if "Cells" not in f:
+            return None
+        cells = f["Cells"]
+        size = np.asarray(cells["Meta-data"].attrs["size"], dtype=np.float64)
+        self._cells = dict(centres=cells["Centres"][:], size=size, ranges={})
+        for group in self._group_sources:
+            if group not in cells["Counts"]:
+                continue
+            counts = cells["Counts"][group][:].astype(np.int64)
+            if "Offsets" in cells:
+                offsets = cells["Offsets"][group][:].astype(np.int64)
+            else:
+                offsets = cells["OffsetsInFile"][group][:].astype(np.int64)
+                if "Files" in cells:
+                    files = cells["Files"][group][:].astype(np.int64)
+                    offsets += self._offsets[group][files]
+            self._cells["ranges"][group] = (offsets, offsets + counts)
+        return self._cells
+
+    def _region_rows(self, group, center, half_width, box):
+        cells = self._load_cells()
+        if cells is None or group not in cells["ranges"]:
+            return super()._region_rows(group, center, half_width, box)
+        dx = np.abs(periodic_offset(cells["centres"], center, box))
+        overlap = np.all(dx <= half_width + cells["size"] / 2, axis=1)
+        starts, stops = cells["ranges"][group]
+        ranges = merge_ranges(starts[overlap], stops[overlap])
+        if not ranges:
+            return np.empty(0, dtype=np.int64)
+        return np.concatenate([np.arange(a, b) for a, b in ranges])
 
     def load_header(self):
-        with h5py.File(self.fname) as f:
-            header = f["Header"].attrs
-            cosmo = f["Cosmology"].attrs
+        f = self._open()
+        header = f["Header"].attrs
+        cosmo = f["Cosmology"].attrs
 
-            redshift = header["Redshift"][0]
-            scale = header["Scale-factor"][0]
-            h = cosmo["H0 [internal units]"][0] / 100
-            H = cosmo["H0 [internal units]"][0] * u.km / u.s / u.Mpc
-            box_size = header["BoxSize"] * u.Mpc
-            num_part = header["NumPart_Total"]
-            Omega_cdm = cosmo["Omega_cdm"]
-            Omega_b = cosmo["Omega_b"]
-            Omega_m = cosmo["Omega_m"]
-            Omega_Lambda = cosmo["Omega_lambda"]
+        redshift = header["Redshift"][0]
+        scale = header["Scale-factor"][0]
+        h = cosmo["H0 [internal units]"][0] / 100
+        H = cosmo["H0 [internal units]"][0] * u.km / u.s / u.Mpc
+        box_size = header["BoxSize"] * u.Mpc
+        num_part = header["NumPart_Total"]
+        Omega_cdm = cosmo["Omega_cdm"]
+        Omega_b = cosmo["Omega_b"]
+        Omega_m = cosmo["Omega_m"]
+        Omega_Lambda = cosmo["Omega_lambda"]
 
-            return Header(
-                redshift=redshift,
-                scale=scale,
-                h=h,
-                H=H,
-                box_size=box_size,
-                num_part=num_part,
-                Omega_cdm=Omega_cdm,
-                Omega_b=Omega_b,
-                Omega_m=Omega_m,
-                Omega_Lambda=Omega_Lambda,
-            )
+        return Header(
+            redshift=redshift,
+            scale=scale,
+            h=h,
+            H=H,
+            box_size=box_size,
+            num_part=num_part,
+            Omega_cdm=Omega_cdm,
+            Omega_b=Omega_b,
+            Omega_m=Omega_m,
+            Omega_Lambda=Omega_Lambda,
+        )
 
     def __str__(self) -> str:
         return "SWIFT " + super().__str__()
 
     @classmethod
-    def write(cls, source, fname):
-        with h5py.File(fname, "w") as f:
-            header = f.create_group("Header").attrs
-            header["BoxSize"] = source.header.box_size.to(u.Mpc)
-            header["NumFilesPerSnapshot"] = 1
-            header["NumPart_ThisFile"] = source.header.num_part
-            header["NumPart_Total"] = source.header.num_part
-            header["NumPart_Total_HighWord"] = np.zeros_like(source.header.num_part)
-            header["Time"] = source.header.scale
-            header["Redshift"] = [source.header.redshift]
-            header["Scale-factor"] = [source.header.scale]
-            header["snap_conv_version"] = git_version
+    def _write_header(cls, source, f, num_part, num_files):
+        header = f.create_group("Header").attrs
+        header["BoxSize"] = source.header.box_size.to(u.Mpc)
+        header["NumFilesPerSnapshot"] = num_files
+        header["NumPart_ThisFile"] = num_part
+        header["NumPart_Total"] = source.header.num_part
+        header["NumPart_Total_HighWord"] = np.zeros_like(source.header.num_part)
+        header["Time"] = source.header.scale
+        header["Redshift"] = [source.header.redshift]
+        header["Scale-factor"] = [source.header.scale]
+        header["snap_conv_version"] = git_version()
 
-            cosmo = f.create_group("Cosmology").attrs
-            cosmo["H0 [internal units]"] = [source.header.H.to(u.km / u.s / u.Mpc)]
-            cosmo["Omega_b"] = [source.header.Omega_b]
-            cosmo["Omega_cdm"] = [source.header.Omega_cdm]
-            cosmo["Omega_lambda"] = [source.header.Omega_Lambda]
-            cosmo["Omega_m"] = [source.header.Omega_m]
-            cosmo["Redshift"] = [source.header.redshift]
-            cosmo["Scale-factor"] = [source.header.scale]
-            cosmo["h"] = [source.header.h]
+        cosmo = f.create_group("Cosmology").attrs
+        cosmo["H0 [internal units]"] = [source.header.H.to(u.km / u.s / u.Mpc)]
+        cosmo["Omega_b"] = [source.header.Omega_b]
+        cosmo["Omega_cdm"] = [source.header.Omega_cdm]
+        cosmo["Omega_lambda"] = [source.header.Omega_Lambda]
+        cosmo["Omega_m"] = [source.header.Omega_m]
+        cosmo["Redshift"] = [source.header.redshift]
+        cosmo["Scale-factor"] = [source.header.scale]
+        cosmo["h"] = [source.header.h]
 
-            fields = [
-                ("ParticleIDs",),
-                ("Coordinates",),
-                ("StarFormationRates", "StarFormationRate"),
-                ("Masses",),
-                ("InternalEnergies", "InternalEnergy"),
-                ("Densities", "Density"),
-                ("Velocities",),
-                ("SmoothingLengths", "SmoothingLength"),
-            ]
-            gas = f.create_group("PartType0")
-            for names in fields:
-                name = names[0]
-                for n in names:
-                    if hasattr(source.gas, n):
-                        data = getattr(source.gas, name)
-                        unit = cls._get_output_unit("PartType5", name)
-                        if unit is not None:
-                            data = data.to(unit)
-                        gas[name] = data
-                        if unit is not None:
-                            gas[name].attrs[
-                                "Conversion factor to CGS (not including cosmological corrections)"
-                            ] = [
-                                unit.get_conversion_factor(unit.get_cgs_equivalent())[0]
-                            ]
-                        else:
-                            gas[name].attrs[
-                                "Conversion factor to CGS (not including cosmological corrections)"
-                            ] = [1.0]
-                        break
-            fields = [
-                ("ParticleIDs",),
-                ("Coordinates",),
-                ("Masses",),
-                ("Velocities",),
-                ("SmoothingLengths", "SmoothingLength"),
-                ("InitialMasses", "InitialMass"),
-                ("BirthScaleFactors", "StellarFormationTime"),
-            ]
-            stars = f.create_group("PartType4")
-            for names in fields:
-                name = names[0]
-                for n in names:
-                    if hasattr(source.gas, n):
-                        data = getattr(source.gas, name)
-                        unit = cls._get_output_unit("PartType5", name)
-                        if unit is not None:
-                            data = data.to(unit)
-                        stars[name] = data
-                        if unit is not None:
-                            stars[name].attrs[
-                                "Conversion factor to CGS (not including cosmological corrections)"
-                            ] = [
-                                unit.get_conversion_factor(unit.get_cgs_equivalent())[0]
-                            ]
-                        else:
-                            stars[name].attrs[
-                                "Conversion factor to CGS (not including cosmological corrections)"
-                            ] = [1.0]
-                        break
-            fields = [
-                ("ParticleIDs",),
-                ("Coordinates",),
-                ("Masses",),
-                ("Velocities",),
-            ]
-            dm = f.create_group("PartType1")
-            for names in fields:
-                name = names[0]
-                for n in names:
-                    if hasattr(source.gas, n):
-                        data = getattr(source.gas, name)
-                        unit = cls._get_output_unit("PartType5", name)
-                        if unit is not None:
-                            data = data.to(unit)
-                        dm[name] = data
-                        if unit is not None:
-                            dm[name].attrs[
-                                "Conversion factor to CGS (not including cosmological corrections)"
-                            ] = [
-                                unit.get_conversion_factor(unit.get_cgs_equivalent())[0]
-                            ]
-                        else:
-                            dm[name].attrs[
-                                "Conversion factor to CGS (not including cosmological corrections)"
-                            ] = [1.0]
-                        break
-            fields = [
-                ("ParticleIDs",),
-                ("Coordinates",),
-                ("Masses",),
-                ("Velocities",),
-                ("SmoothingLengths", "SmoothingLength"),
-                ("InitialMasses", "InitialMass"),
-                ("BirthScaleFactors", "StellarFormationTime"),
-            ]
-            stars = f.create_group("PartType4")
-            for names in fields:
-                name = names[0]
-                for n in names:
-                    if hasattr(source.gas, n):
-                        data = getattr(source.gas, name)
-                        unit = cls._get_output_unit("PartType5", name)
-                        if unit is not None:
-                            data = data.to(unit)
-                        stars[name] = data
-                        if unit is not None:
-                            stars[name].attrs[
-                                "Conversion factor to CGS (not including cosmological corrections)"
-                            ] = [
-                                unit.get_conversion_factor(unit.get_cgs_equivalent())[0]
-                            ]
-                        else:
-                            stars[name].attrs[
-                                "Conversion factor to CGS (not including cosmological corrections)"
-                            ] = [1.0]
-                        break
-
-            fields = [
-                ("ParticleIDs",),
-                ("Coordinates",),
-                ("Masses",),
-                ("Velocities",),
-                ("SmoothingLengths", "SmoothingLength"),
-                ("AccretionRates", "Mdot"),
-            ]
-            bhs = f.create_group("PartType5")
-            for names in fields:
-                name = names[0]
-                for n in names:
-                    if hasattr(source.gas, n):
-                        data = getattr(source.gas, name)
-                        unit = cls._get_output_unit("PartType5", name)
-                        if unit is not None:
-                            data = data.to(unit)
-                        bhs[name] = data
-                        if unit is not None:
-                            bhs[name].attrs[
-                                "Conversion factor to CGS (not including cosmological corrections)"
-                            ] = [
-                                unit.get_conversion_factor(unit.get_cgs_equivalent())[0]
-                            ]
-                        else:
-                            bhs[name].attrs[
-                                "Conversion factor to CGS (not including cosmological corrections)"
-                            ] = [1.0]
-                        break
+    @classmethod
+    def _write_attrs(cls, dataset, unit):
+        factor = 1.0
+        exponents = dict.fromkeys("ILMTt", 0.0)
+        if unit is not None:
+            unit = u.Unit(unit)
+            factor = unit.get_conversion_factor(unit.get_cgs_equivalent())[0]
+            powers = unit.dimensions.as_powers_dict()
+            for c, dim in zip("ILMTt", _dimensions):
+                exponents[c] = float(powers.get(dim, 0))
+        dataset.attrs[_cgs_factor] = [factor]
+        for c, exp in exponents.items():
+            dataset.attrs[f"U_{c} exponent"] = [exp]
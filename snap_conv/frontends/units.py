@@ -0,0 +1,83 @@
+from dataclasses import dataclass
+from typing import Any, Optional
+
+import numpy as np
+import unyt as u
+
+# Strategies, cheapest first.
+NOOP = "noop"  # already in the target units (or unitless)
+METADATA = "metadata"  # values kept as-is, the output records their units
+SCALE = "scale"  # multiplied by a scalar in place, no second buffer
+CONVERT = "convert"  # full `.to(unit)`, allocating a converted copy
+# Computed fields only know their units once evaluated.
+DEFERRED = "deferred"
+
+
+@dataclass(kw_only=True, slots=True, frozen=True)
+class Conversion:
+    strategy: str
+    # Units of the converted data (the units to record in the output).
+    unit: Any = None
+    factor: float = 1.0
+    # Request, kept for deferred conversions.
+    target: Any = None
+    self_describing: bool = False
+
+
+def plan_conversion(
+    source_unit, target_unit, dtype, self_describing: bool = False
+) -> Conversion:
+    if target_unit is None or source_unit is None:
+        return Conversion(strategy=NOOP, unit=source_unit)
+    source, target = u.Unit(source_unit), u.Unit(target_unit)
+    if source == target:
+        return Conversion(strategy=NOOP, unit=source)
+    if source.dimensions != target.dimensions:
+        raise u.exceptions.UnitConversionError(
+            source, source.dimensions, target, target.dimensions
+        )
+    factor, offset = source.get_conversion_factor(target)
+    if factor == 1.0 and not offset:
+        # Same units, spelled differently (e.g. g/s and kg/ms).
+        return Conversion(strategy=NOOP, unit=target)
+    if offset:
+        return Conversion(strategy=CONVERT, unit=target)
+    if self_describing:
+        return Conversion(strategy=METADATA, unit=source)
+    if dtype is not None and np.issubdtype(dtype, np.floating):
+        return Conversion(strategy=SCALE, unit=target, factor=factor)
+    # Integer fields need a new floating point buffer anyway.
+    return Conversion(strategy=CONVERT, unit=target)
+
+
+def deferred(target_unit, self_describing: bool = False) -> Conversion:
+    return Conversion(
+        strategy=DEFERRED, target=target_unit, self_describing=self_describing
+    )
+
+
+def apply_conversion(data, conversion: Optional[Conversion], owned: bool = False):
+    """Convert `data`, returning it with the conversion actually used.
+
+    `owned` says that nothing else references `data` (a fresh read rather
+    than a view of a cached field), so it may be scaled in place.
+    """
+    if conversion is None:
+        return data, None
+    if conversion.strategy == DEFERRED:
+        conversion = plan_conversion(
+            getattr(data, "units", None),
+            conversion.target,
+            data.dtype,
+            conversion.self_describing,
+        )
+    if conversion.strategy in (NOOP, METADATA):
+        return data, conversion
+    if conversion.strategy == SCALE:
+        values = data.view(np.ndarray)
+        if owned and values.flags.writeable:
+            np.multiply(values, conversion.factor, out=values, casting="unsafe")
+        else:
+            values = values * conversion.factor
+        return u.unyt_array(values, conversion.unit), conversion
+    return data.to(conversion.unit), conversion
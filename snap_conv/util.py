@@ -1,7 +1,22 @@
+from functools import lru_cache
 from pathlib import Path
 import subprocess
 
 
-git_version = subprocess.check_output(
-    ["git", "rev-parse", "HEAD"], cwd=Path(__file__).parent
-)
+@lru_cache
+def git_version() -> str:
+    # Resolved on first use rather than at import, and only from a checkout.
+    try:
+        return (
+            subprocess.check_output(
+                ["git", "rev-parse", "HEAD"],
+                cwd=Path(__file__).parent,
+                stderr=subprocess.DEVNULL,
+            )
+            .decode()
+            .strip()
+        )
+    except (OSError, subprocess.CalledProcessError):
+        from snap_conv import __version__
+
+        return __version__
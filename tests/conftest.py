@@ -0,0 +1,22 @@
+import os
+import sys
+
+import pytest
+
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), "..", "benchmarks"))
+
+import synthetic  # noqa: E402
+
+
+@pytest.fixture
+def swift_snapshot(tmp_path):
+    fname = tmp_path / "snap.hdf5"
+    synthetic.write_swift(fname, num_part=(2000, 2000, 0, 0, 100, 10))
+    return fname
+
+
+@pytest.fixture
+def gadget_snapshot(tmp_path):
+    fname = tmp_path / "gadget.hdf5"
+    synthetic.write_gadget(fname, num_part=(20000, 2000, 0, 0, 100, 0))
+    return fname
@@ -0,0 +1,70 @@
+import asyncio
+import threading
+
+import numpy as np
+import pytest
+
+from snap_conv import SwiftFrontend
+
+
+def test_waiters_share_one_read(swift_snapshot):
+    async def main(data):
+        return await asyncio.gather(*(data.gas.aget("Coordinates") for _ in range(5)))
+
+    with SwiftFrontend(swift_snapshot) as data:
+        data.instrument()
+        loaded = asyncio.run(main(data))
+        assert all(a is loaded[0] for a in loaded)
+        stats = data.io_stats.fields[("PartType0", "Coordinates")]
+        assert (stats.reads, stats.cache_misses, stats.cache_hits) == (1, 1, 0)
+        assert (data.cache_stats.misses, data.cache_stats.hits) == (1, 0)
+
+        # Later requests are cache hits.
+        asyncio.run(main(data))
+        assert (stats.reads, stats.cache_misses, stats.cache_hits) == (1, 1, 5)
+        assert data.cache_stats.hits == 5
+
+
+def test_cancelled_waiter_leaves_the_read_running(swift_snapshot):
+    release = threading.Event()
+
+    async def main(data):
+        first = asyncio.create_task(data.gas.aget("Coordinates"))
+        second = asyncio.create_task(data.gas.aget("Coordinates"))
+        await asyncio.sleep(0.05)
+        first.cancel()
+        with pytest.raises(asyncio.CancelledError):
+            await first
+        release.set()
+        return await second
+
+    with SwiftFrontend(swift_snapshot) as data:
+        read_rows = data.read_rows
+
+        def blocked(*args):
+            assert release.wait(5)
+            return read_rows(*args)
+
+        data.read_rows = blocked
+        data.instrument()
+        coords = asyncio.run(main(data))
+        assert data.cache.peek(("PartType0", "Coordinates")) is coords
+        stats = data.io_stats.fields[("PartType0", "Coordinates")]
+        assert (stats.reads, stats.cache_misses) == (1, 1)
+        assert not data._async_inflight
+
+
+def test_selection_and_many(swift_snapshot):
+    async def main(data):
+        part = await data.gas.aget("Masses", slice(10, 20))
+        many = await data.aload_many({"gas": ["Masses"], "dark_matter": ["Masses"]})
+        return part, many
+
+    with SwiftFrontend(swift_snapshot) as data:
+        part, many = asyncio.run(main(data))
+        masses = data.gas.load("Masses")
+        assert np.array_equal(part, masses[10:20])
+        assert many[("gas", "Masses")] is masses
+        assert np.array_equal(
+            many[("dark_matter", "Masses")], data.dark_matter.Masses[:]
+        )
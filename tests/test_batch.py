@@ -0,0 +1,151 @@
+import os
+import threading
+from concurrent.futures import ThreadPoolExecutor
+
+import h5py
+import pytest
+import synthetic
+
+from snap_conv import GadgetFrontend, SwiftFrontend, batch
+from snap_conv.batch import BatchConverter, convert_many
+
+
+@pytest.fixture
+def snapshots(tmp_path):
+    directory = tmp_path / "output"
+    directory.mkdir()
+    for i in range(3):
+        synthetic.write_swift(
+            directory / f"snap_{i:04d}.hdf5", num_part=(500, 500, 0, 0, 50, 5), seed=i
+        )
+    return directory
+
+
+def _statuses(results):
+    return {r.output: r.status for r in results}
+
+
+def test_rerun_skips_converted(snapshots, tmp_path):
+    out = tmp_path / "converted"
+    results = convert_many(snapshots, GadgetFrontend, out, workers=1)
+    assert set(_statuses(results).values()) == {"converted"}
+    assert not os.path.exists(out / ".partial")
+    results = convert_many(snapshots, GadgetFrontend, out, workers=1)
+    assert set(_statuses(results).values()) == {"skipped"}
+
+    # Other options make a different output.
+    results = convert_many(snapshots, GadgetFrontend, out, workers=1, units="convert")
+    assert set(_statuses(results).values()) == {"converted"}
+
+
+def test_resume_after_interruption(snapshots, tmp_path):
+    out = tmp_path / "converted"
+    convert_many(snapshots, GadgetFrontend, out, workers=1)
+    converter = BatchConverter(GadgetFrontend, out, workers=1)
+    # As if the run stopped before the last output was recorded.
+    del converter.manifest["snap_0002.hdf5"]
+    converter._save_manifest()
+    results = convert_many(snapshots, GadgetFrontend, out, workers=1)
+    assert _statuses(results) == {
+        "snap_0000.hdf5": "skipped",
+        "snap_0001.hdf5": "skipped",
+        "snap_0002.hdf5": "converted",
+    }
+
+
+def test_overwrite(snapshots, tmp_path):
+    out = tmp_path / "converted"
+    convert_many(snapshots, GadgetFrontend, out, workers=1)
+    results = convert_many(snapshots, GadgetFrontend, out, workers=1, overwrite=True)
+    assert set(_statuses(results).values()) == {"converted"}
+
+
+def test_changed_source_is_converted_again(snapshots, tmp_path):
+    out = tmp_path / "converted"
+    convert_many(snapshots, GadgetFrontend, out, workers=1)
+    os.utime(snapshots / "snap_0001.hdf5", ns=(1, 1))
+    results = convert_many(snapshots, GadgetFrontend, out, workers=1)
+    assert _statuses(results)["snap_0001.hdf5"] == "converted"
+    assert _statuses(results)["snap_0000.hdf5"] == "skipped"
+
+
+def test_missing_piece_is_converted_again(snapshots, tmp_path):
+    out = tmp_path / "converted"
+    convert_many(snapshots, GadgetFrontend, out, workers=1, max_file_bytes=20_000)
+    files = BatchConverter(GadgetFrontend, out).manifest["snap_0000.hdf5"]["files"]
+    assert len(files) > 1
+    os.remove(out / files[-1])
+    results = convert_many(
+        snapshots, GadgetFrontend, out, workers=1, max_file_bytes=20_000
+    )
+    assert _statuses(results)["snap_0000.hdf5"] == "converted"
+    assert all((out / f).exists() for f in files)
+
+
+def test_short_dataset_fails_validation(snapshots, tmp_path, monkeypatch):
+    write_as = SwiftFrontend.write_as
+
+    def drop_a_row(self, target, fname, **kwargs):
+        write_as(self, target, fname, **kwargs)
+        with h5py.File(fname, "a") as f:
+            masses = f["PartType1/Masses"][:-1]
+            del f["PartType1/Masses"]
+            f["PartType1/Masses"] = masses
+
+    monkeypatch.setattr(SwiftFrontend, "write_as", drop_a_row)
+    out = tmp_path / "converted"
+    results = convert_many(snapshots / "snap_0000.hdf5", GadgetFrontend, out)
+    assert results[0].status == "failed"
+    assert "PartType1/Masses" in results[0].error
+    assert not (out / "snap_0000.hdf5").exists()
+
+
+def test_budget_streams_large_snapshots(snapshots, tmp_path):
+    converter = BatchConverter(GadgetFrontend, tmp_path / "converted")
+    (whole,), _ = converter.plan([snapshots / "snap_0000.hdf5"])
+    assert whole.chunk_bytes is None
+
+    converter.memory_budget = whole.nbytes // 4
+    (streamed,), _ = converter.plan([snapshots / "snap_0000.hdf5"])
+    assert streamed.nbytes == converter.memory_budget
+    assert streamed.chunk_bytes == converter.memory_budget // 2
+    results = converter.run([snapshots / "snap_0000.hdf5"])
+    assert results[0].status == "converted"
+
+
+def test_budget_limits_concurrent_jobs(snapshots, tmp_path, monkeypatch):
+    lock = threading.Lock()
+    running, peak = [0], [0]
+    convert = batch._convert
+
+    def tracked(job, *args):
+        with lock:
+            running[0] += job.nbytes
+            peak[0] = max(peak[0], running[0])
+        try:
+            return convert(job, *args)
+        finally:
+            with lock:
+                running[0] -= job.nbytes
+
+    monkeypatch.setattr(batch, "ProcessPoolExecutor", ThreadPoolExecutor)
+    monkeypatch.setattr(batch, "_convert", tracked)
+    converter = BatchConverter(GadgetFrontend, tmp_path / "converted", workers=3)
+    jobs, _ = converter.plan([snapshots])
+    converter.memory_budget = 2 * max(job.nbytes for job in jobs)
+    results = converter.run([snapshots])
+    assert set(_statuses(results).values()) == {"converted"}
+    assert 0 < peak[0] <= converter.memory_budget
+
+
+def test_output_pieces_are_checked(snapshots, tmp_path):
+    out = tmp_path / "converted"
+    convert_many(snapshots, GadgetFrontend, out, workers=1, max_file_bytes=20_000)
+    converter = BatchConverter(GadgetFrontend, out, max_file_bytes=20_000)
+    files = converter.manifest["snap_0001.hdf5"]["files"]
+    assert converter.is_done("snap_0001.hdf5")
+    with h5py.File(out / files[0], "a") as f:
+        del f["PartType0/Masses"]
+    stamps = converter.manifest["snap_0001.hdf5"]
+    stamps["stamps"] = batch.file_stamps([str(out / f) for f in files]).tolist()
+    assert not converter.is_done("snap_0001.hdf5")
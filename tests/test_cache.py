@@ -0,0 +1,132 @@
+import numpy as np
+
+from snap_conv import SwiftFrontend
+from snap_conv.frontends.cache import CacheView, FieldCache
+
+
+def test_count_outside_evicts_only_what_is_needed():
+    cache = FieldCache(100, count_outside=True)
+    cache.put("a", np.zeros(5))
+    cache.put("b", np.zeros(5))
+    cache.put("c", np.zeros(5))
+    assert cache.keys() == ["b", "c"]
+    assert cache.outside_nbytes == 0
+
+
+def test_count_outside_keeps_referenced_evictions_in_budget():
+    cache = FieldCache(100, count_outside=True)
+    held = np.zeros(5)
+    cache.put("a", held)
+    cache.put("b", np.zeros(5))
+    cache.put("c", np.zeros(5))
+    # "a" is still referenced here, so it takes up 40 of the 100 bytes.
+    assert cache.keys() == ["c"]
+    assert cache.outside() == {"a": 40}
+    del held
+    assert cache.outside_nbytes == 0
+
+
+def test_least_recently_used_is_evicted():
+    cache = FieldCache(120)
+    for key in "abc":
+        cache.put(key, np.zeros(5))
+    assert cache.get("a") is not None
+    cache.put("d", np.zeros(5))
+    assert cache.keys() == ["c", "a", "d"]
+    # peek leaves the order alone.
+    cache.peek("c")
+    cache.put("e", np.zeros(5))
+    assert cache.keys() == ["a", "d", "e"]
+
+
+def test_byte_budget():
+    cache = FieldCache(100)
+    cache.put("a", np.zeros(5))
+    cache.put("b", np.zeros(5))
+    assert cache.nbytes == 80
+    assert cache.free_bytes == 20
+    # Replacing a key does not count it twice.
+    cache.put("b", np.zeros(5))
+    assert cache.keys() == ["a", "b"] and cache.nbytes == 80
+    cache.put("c", np.zeros(10))
+    assert cache.keys() == ["c"] and cache.nbytes == 80
+    # An entry larger than the budget still goes in, alone.
+    cache.put("d", np.zeros(20))
+    assert cache.keys() == ["d"] and cache.nbytes == 160
+
+    unbounded = FieldCache(None)
+    for key in range(10):
+        unbounded.put(key, np.zeros(100))
+    assert len(unbounded) == 10 and unbounded.free_bytes is None
+
+
+def test_pinned_entries_are_not_evicted():
+    cache = FieldCache(100)
+    cache.pin("a")
+    cache.put("a", np.zeros(5))
+    cache.put("b", np.zeros(5))
+    cache.put("c", np.zeros(5))
+    assert set(cache.keys()) == {"a", "c"}
+    # Pinned bytes count towards the budget.
+    assert cache.nbytes == 80
+    cache.put("d", np.zeros(10))
+    assert set(cache.keys()) == {"a", "d"} and cache.nbytes == 120
+
+    # Unpinned, it rejoins the LRU order as the most recent entry.
+    cache.unpin("a")
+    cache.put("e", np.zeros(1))
+    assert cache.keys() == ["a", "e"]
+
+    cache.put("f", np.zeros(1))
+    cache.pin("f")
+    cache.put("g", np.zeros(12))
+    assert "f" in cache and "e" not in cache
+
+
+def test_stats():
+    evicted = []
+    cache = FieldCache(100)
+    cache.add_evict_hook(lambda key, data: evicted.append(key))
+    assert cache.get("a") is None
+    cache.put("a", np.zeros(5))
+    cache.put("b", np.zeros(5))
+    cache.get("a")
+    cache.get("a")
+    cache.peek("b")
+    cache.put("c", np.zeros(5))
+    stats = cache.stats
+    assert (stats.hits, stats.misses, stats.evictions) == (2, 1, 1)
+    assert (stats.bytes_inserted, stats.bytes_evicted) == (120, 40)
+    assert stats.hit_rate == 2 / 3
+    assert evicted == ["b"]
+    # Discarding is not an eviction.
+    cache.discard("a")
+    assert stats.evictions == 1 and cache.nbytes == 40
+
+
+def test_views_share_the_budget():
+    shared = FieldCache(100)
+    first, second = CacheView(shared, 0), CacheView(shared, 1)
+    first.put("a", np.zeros(5))
+    second.put("a", np.zeros(5))
+    assert first.nbytes == second.nbytes == 40
+    assert first.get("a") is not second.get("a")
+    second.put("b", np.zeros(5))
+    assert first.keys() == [] and second.keys() == ["a", "b"]
+    second.clear()
+    assert len(shared) == 0
+    assert shared.stats.evictions == 1
+
+
+def test_frontend_cache_stats(swift_snapshot):
+    with SwiftFrontend(swift_snapshot, cache_size=60_000) as data:
+        data.gas.load("Coordinates")
+        data.gas.load("Coordinates")
+        data.gas.pin("Masses")
+        data.gas.load("Masses")
+        data.dark_matter.load("Coordinates")
+        stats = data.cache_stats
+        assert (stats.hits, stats.misses, stats.evictions) == (1, 3, 1)
+        assert ("PartType0", "Masses") in data.cache
+        assert ("PartType0", "Coordinates") not in data.cache
+        assert data.get_loaded_size() == 56_000
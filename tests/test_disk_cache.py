@@ -0,0 +1,70 @@
+import os
+import threading
+
+import numpy as np
+import unyt as u
+
+from snap_conv import DiskCache, SwiftFrontend
+from snap_conv.frontends.disk_cache import function_token
+
+
+def _radius_from(center):
+    def radius(x):
+        return np.sqrt(((x - center.to(x.units)) ** 2).sum(axis=1))
+
+    return radius
+
+
+def _radii(fname, cache, center):
+    with SwiftFrontend(fname, disk_cache=cache) as data:
+        data.derive("Radius", "Coordinates", _radius_from(center), "gas")
+        return data.gas.load("Radius")
+
+
+def test_closure_values_are_part_of_the_key(swift_snapshot, tmp_path):
+    cache = DiskCache(tmp_path / "cache")
+    near = _radii(swift_snapshot, cache, [0, 0, 0] * u.Mpc)
+    far = _radii(swift_snapshot, cache, [10, 10, 10] * u.Mpc)
+    assert not np.allclose(near, far)
+    assert np.array_equal(_radii(swift_snapshot, cache, [0, 0, 0] * u.Mpc), near)
+    assert len(cache.entries()) == 2
+
+
+def test_defaults_and_globals_are_part_of_the_key():
+    def scaled(x, factor=2.0):
+        return x * factor
+
+    first = function_token(scaled)
+    scaled.__defaults__ = (3.0,)
+    assert function_token(scaled) != first
+    assert function_token(_radius_from(1 * u.Mpc)) == function_token(
+        _radius_from(1 * u.Mpc)
+    )
+
+
+def test_unhashable_values_skip_the_cache(swift_snapshot, tmp_path):
+    lock = threading.Lock()
+
+    def masses(m):
+        with lock:
+            return m * 2
+
+    assert function_token(masses) is None
+    cache = DiskCache(tmp_path / "cache")
+    with SwiftFrontend(swift_snapshot, disk_cache=cache) as data:
+        data.derive("Double", "Masses", masses, "gas")
+        assert np.array_equal(data.gas.load("Double"), data.gas.Masses * 2)
+    assert cache.entries() == []
+
+
+def test_stale_snapshot_is_invalidated(swift_snapshot, tmp_path):
+    cache = DiskCache(tmp_path / "cache")
+    with SwiftFrontend(swift_snapshot, disk_cache=cache) as data:
+        data.gas.load("StarFormationRate")
+        cache.put(data.files, ("unused",), np.zeros(10))
+    assert len(cache.entries()) == 2
+    os.utime(swift_snapshot, ns=(1, 1))
+    with SwiftFrontend(swift_snapshot, disk_cache=DiskCache(cache.directory)) as data:
+        data.gas.load("Masses")
+        data.gas.load("StarFormationRate")
+    assert len(cache.entries()) == 1
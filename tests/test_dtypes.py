@@ -0,0 +1,70 @@
+import h5py
+import numpy as np
+
+from snap_conv import DtypePolicy, GadgetFrontend, SwiftFrontend
+
+
+def test_narrowed_dtype(swift_snapshot):
+    with SwiftFrontend(swift_snapshot) as full:
+        expected = full.gas.load("Coordinates")
+        assert expected.dtype == np.float64
+    with SwiftFrontend(swift_snapshot, dtypes="float32") as data:
+        assert data.gas.Coordinates.dtype == np.float32
+        coords = data.gas.load("Coordinates")
+        assert coords.dtype == np.float32 and coords.units == expected.units
+        assert np.array_equal(coords.v, expected.v.astype(np.float32))
+        assert data.gas.Coordinates[10:20].dtype == np.float32
+        assert data.gas.Coordinates[[5, 1, 9]].dtype == np.float32
+        assert data.gas.load("ParticleIDs").dtype == np.uint64
+        assert data.gas.load("Masses").dtype == np.float32
+
+
+def test_policy_per_field(swift_snapshot):
+    policy = DtypePolicy(
+        floats="float32",
+        fields={"PartType1/Coordinates": None, "ParticleIDs": "int32"},
+    )
+    with SwiftFrontend(swift_snapshot, dtypes=policy) as data:
+        assert data.gas.load("Coordinates").dtype == np.float32
+        assert data.dark_matter.load("Coordinates").dtype == np.float64
+        assert data.gas.load("ParticleIDs").dtype == np.int32
+
+
+def test_cache_charges_narrowed_size(swift_snapshot):
+    with SwiftFrontend(swift_snapshot, dtypes="float32") as data:
+        data.gas.load("Coordinates")
+        assert data.get_loaded_size() == 2000 * 3 * 4
+        assert data.cache_stats.bytes_inserted == 2000 * 3 * 4
+    # The budget is that of the narrowed fields: both fit in 48 kB.
+    with SwiftFrontend(swift_snapshot, dtypes="float32", cache_size=48_000) as data:
+        data.gas.load("Coordinates")
+        data.dark_matter.load("Coordinates")
+        assert data.cache_stats.evictions == 0
+
+
+def test_multifile_narrowed_reads(swift_snapshot, tmp_path):
+    with SwiftFrontend(swift_snapshot) as source:
+        source.write_as(SwiftFrontend, tmp_path / "snap.hdf5", max_file_bytes=50_000)
+        expected = source.gas.load("Coordinates")
+    with h5py.File(tmp_path / "snap.0.hdf5", "r") as f:
+        assert f["PartType0/Coordinates"].dtype == np.float64
+    with SwiftFrontend(
+        tmp_path / "snap.0.hdf5", dtypes="float32", cache_size=0
+    ) as data:
+        assert len(data.files) > 2
+        narrowed = expected.v.astype(np.float32)
+        coords = data.gas.load("Coordinates")
+        assert coords.dtype == np.float32
+        assert np.array_equal(coords.v, narrowed)
+        # Rows from several pieces, in and out of order.
+        rows = np.array([1999, 0, 700, 1300, 5])
+        assert np.array_equal(data.gas.Coordinates[rows].v, narrowed[rows])
+        assert np.array_equal(data.gas.Coordinates[600:1500].v, narrowed[600:1500])
+
+
+def test_write_narrowed(swift_snapshot, tmp_path):
+    with SwiftFrontend(swift_snapshot) as data:
+        data.write_as(GadgetFrontend, tmp_path / "out.hdf5", dtypes="float32")
+    with h5py.File(tmp_path / "out.hdf5", "r") as f:
+        assert f["PartType0/Coordinates"].dtype == np.float32
+        assert f["PartType0/ParticleIDs"].dtype == np.uint64
@@ -0,0 +1,55 @@
+import numpy as np
+import pytest
+import synthetic
+
+from snap_conv import GadgetBinaryFrontend, SwiftFrontend, convert_many
+from snap_conv.frontends.gadget_binary import scan_blocks
+
+
+def test_format1_without_mass_block(tmp_path):
+    masses = (0.5, 1.0, 0, 0, 0.1, 2.0)
+    synthetic.write_gadget_binary(tmp_path / "f1", snap_format=1, mass_table=masses)
+    # The same values, in labelled blocks.
+    synthetic.write_gadget_binary(tmp_path / "f2", snap_format=2, mass_table=masses)
+    labels = [label for label, _, _ in scan_blocks(tmp_path / "f1")[1]]
+    assert labels == ["HEAD", "POS", "VEL", "ID", "U", "RHO", "HSML"]
+
+    with (
+        GadgetBinaryFrontend(tmp_path / "f1") as f1,
+        GadgetBinaryFrontend(tmp_path / "f2") as f2,
+    ):
+        for name in ("InternalEnergy", "Density", "SmoothingLength", "Masses"):
+            assert np.array_equal(f1.gas.load(name).v, f2.gas.load(name).v)
+
+
+def test_format1_without_gas(tmp_path):
+    fname = tmp_path / "snap"
+    synthetic.write_gadget_binary(fname, num_part=(0, 100, 0, 0, 0, 0), snap_format=1)
+    labels = [label for label, _, _ in scan_blocks(fname)[1]]
+    assert labels == ["HEAD", "POS", "VEL", "ID", "MASS"]
+
+
+def test_format1_block_size_mismatch(tmp_path):
+    fname = tmp_path / "snap"
+    synthetic.write_gadget_binary(
+        fname, snap_format=1, mass_table=(0.5, 1.0, 0, 0, 0.1, 2.0)
+    )
+    # Clear the gas and dark matter MassTable entries, so that a MASS block
+    # of 2000 values is expected where the file has U.
+    raw = bytearray(open(fname, "rb").read())
+    massarr_at = 4 + 6 * 4
+    raw[massarr_at : massarr_at + 16] = np.zeros(2).tobytes()
+    open(fname, "wb").write(bytes(raw))
+    with pytest.raises(ValueError, match="MASS"):
+        scan_blocks(fname)
+
+
+def test_read_only(tmp_path, swift_snapshot):
+    with (
+        SwiftFrontend(swift_snapshot) as data,
+        pytest.raises(NotImplementedError, match="read-only"),
+    ):
+        data.write_as(GadgetBinaryFrontend, tmp_path / "out")
+    with pytest.raises(NotImplementedError, match="read-only"):
+        convert_many(swift_snapshot, GadgetBinaryFrontend, tmp_path / "out")
+    assert not (tmp_path / "out").exists()
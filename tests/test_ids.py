@@ -0,0 +1,79 @@
+import h5py
+import numpy as np
+import pytest
+
+from snap_conv import GadgetFrontend
+from snap_conv.frontends import ids as ids_module
+from snap_conv.frontends.ids import IDIndex
+
+
+@pytest.fixture
+def tracked(gadget_snapshot):
+    with GadgetFrontend(gadget_snapshot) as data:
+        gas_ids = np.asarray(data.gas.load("ParticleIDs"))
+        star_ids = np.asarray(data.stars.load("ParticleIDs"))
+    rng = np.random.default_rng(1)
+    wanted = np.concatenate([rng.choice(gas_ids, 300), star_ids[::7], [10**9]])
+    return rng.permutation(wanted), gas_ids, star_ids
+
+
+def _check(selection, data, wanted, gas_ids, star_ids):
+    for name, all_ids in (("gas", gas_ids), ("stars", star_ids)):
+        particles = getattr(selection, name)
+        expected = wanted[np.isin(wanted, all_ids)]
+        assert np.array_equal(np.asarray(particles.ParticleIDs), expected)
+        assert np.array_equal(all_ids[particles.rows], expected)
+        coords = getattr(data, name).load("Coordinates")
+        assert np.array_equal(particles.Coordinates.v, coords.v[particles.rows])
+
+
+def test_select_in_query_order(gadget_snapshot, tracked):
+    wanted, gas_ids, star_ids = tracked
+    with GadgetFrontend(gadget_snapshot) as data:
+        selection = data.select_by_ids(wanted, fields=["Coordinates"])
+        _check(selection, data, wanted, gas_ids, star_ids)
+        assert len(selection.dark_matter.rows) == 0
+
+
+def test_select_from_index_on_disk(gadget_snapshot, tracked, monkeypatch):
+    wanted, gas_ids, star_ids = tracked
+    with GadgetFrontend(gadget_snapshot) as data:
+        index = data.build_id_index(save=False)
+    # Small blocks, so the query spans many of them.
+    index.block = 64
+    index.fences = {g: ids[:: index.block] for g, ids in index.ids.items()}
+    path = gadget_snapshot.with_suffix(".idindex.hdf5")
+    index.save(path)
+
+    monkeypatch.setattr(ids_module, "_in_memory_bytes", -1)
+    with GadgetFrontend(gadget_snapshot) as data:
+        assert isinstance(data.id_index.ids["PartType0"], h5py.Dataset)
+        selection = data.select_by_ids(wanted, fields=["Coordinates"])
+        _check(selection, data, wanted, gas_ids, star_ids)
+
+
+def test_missing_ids():
+    index = IDIndex([])
+    index.ids["PartType0"] = np.array([2, 4, 6], dtype=np.uint64)
+    index.rows["PartType0"] = np.array([1, 0, 2])
+    found = index.lookup("PartType0", [7, 4, 1, 6])
+    assert np.array_equal(found, [-1, 0, -1, 2])
+    assert np.array_equal(index.lookup("PartType1", [4]), [-1])
+    assert index.lookup("PartType0", []).shape == (0,)
+
+
+def test_empty_type(gadget_snapshot, monkeypatch):
+    with h5py.File(gadget_snapshot, "a") as f:
+        group = f.create_group("PartType5")
+        for name, dset in f["PartType4"].items():
+            group.create_dataset(name, shape=(0, *dset.shape[1:]), dtype=dset.dtype)
+    with GadgetFrontend(gadget_snapshot) as data:
+        selection = data.select_by_ids([5, 3, 10**9])
+        assert np.array_equal(np.asarray(selection.gas.ParticleIDs), [5, 3])
+        assert len(selection.black_holes.rows) == 0
+
+        data.build_id_index()
+    monkeypatch.setattr(ids_module, "_in_memory_bytes", -1)
+    with GadgetFrontend(gadget_snapshot) as data:
+        assert isinstance(data.id_index.ids["PartType5"], h5py.Dataset)
+        assert len(data.select_by_ids([5]).black_holes.rows) == 0
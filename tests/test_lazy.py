@@ -0,0 +1,73 @@
+import numpy as np
+import pytest
+
+from snap_conv import GadgetFrontend
+from snap_conv.frontends import hdf5
+from snap_conv.frontends.lazy import LazyField
+
+
+@pytest.fixture
+def data(gadget_snapshot):
+    with GadgetFrontend(gadget_snapshot, cache_size=0) as data:
+        data.instrument()
+        yield data
+
+
+def _full(data, name="Coordinates"):
+    with GadgetFrontend(data.fname) as other:
+        return other.gas.load(name).v
+
+
+def _stats(data, name="Coordinates"):
+    return data.io_stats.fields[("PartType0", name)]
+
+
+@pytest.mark.parametrize(
+    "index",
+    [
+        slice(10, 20),
+        slice(None, None, 7),
+        slice(-50, None),
+        slice(100, 10, -3),
+        -1,
+        5,
+        np.array([3, -1, 3, 0, 19999]),
+        [7, 2, 2],
+        (slice(0, 5), 1),
+        (np.array([4, 1]), slice(0, 2)),
+    ],
+)
+def test_indexing_matches_loaded_field(data, index):
+    field = data.gas.Coordinates
+    assert isinstance(field, LazyField)
+    assert np.array_equal(np.asarray(field[index]), _full(data)[index])
+
+
+def test_boolean_mask(data):
+    mask = np.zeros(len(data.gas.Coordinates), dtype=bool)
+    mask[[1, 500, 19999]] = True
+    assert np.array_equal(data.gas.Coordinates[mask].v, _full(data)[mask])
+    with pytest.raises(IndexError):
+        data.gas.Coordinates[mask[:-1]]
+
+
+def test_out_of_bounds(data):
+    with pytest.raises(IndexError):
+        data.gas.Coordinates[20000]
+    with pytest.raises(IndexError):
+        data.gas.Coordinates[np.array([0, -20001])]
+
+
+def test_sparse_selection_reads_only_selected_rows(data):
+    rows = np.arange(0, 20000, 1000)
+    selected = data.gas.Coordinates[rows]
+    assert _stats(data).bytes_read == selected.nbytes
+
+
+def test_dense_selection_reads_bounded_spans(data, monkeypatch):
+    monkeypatch.setattr(hdf5, "_span_bytes", 12 * 1000)
+    selected = data.gas.Coordinates[np.arange(0, 20000, 2)]
+    assert np.array_equal(selected.v, _full(data)[::2])
+    stats = _stats(data)
+    # Every span holds at most 1000 rows of 12 bytes.
+    assert stats.reads >= 20 and stats.bytes_read <= 20000 * 12
@@ -0,0 +1,22 @@
+import numpy as np
+
+from snap_conv import GadgetFrontend, SwiftFrontend
+
+
+def test_pieces_share_one_read_pool(swift_snapshot, tmp_path):
+    with SwiftFrontend(swift_snapshot) as source:
+        source.write_as(GadgetFrontend, tmp_path / "snap.hdf5", max_file_bytes=50000)
+    one = tmp_path / "single.hdf5"
+    with SwiftFrontend(swift_snapshot) as source:
+        source.write_as(GadgetFrontend, one)
+
+    with GadgetFrontend(tmp_path / "snap.0.hdf5", cache_size=0) as data:
+        assert len(data.files) > 2
+        with GadgetFrontend(one) as single:
+            for name in ("Coordinates", "Masses", "ParticleIDs"):
+                assert np.array_equal(data.gas.load(name), single.gas.load(name))
+        pool = data._io_pool
+        assert pool is not None
+        data.dark_matter.load("Coordinates")
+        assert data._io_pool is pool
+    assert data._io_pool is None
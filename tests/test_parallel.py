@@ -0,0 +1,36 @@
+import numpy as np
+import pytest
+import synthetic
+
+from snap_conv import SwiftFrontend
+
+
+@pytest.fixture
+def compressed_snapshot(tmp_path):
+    fname = tmp_path / "snap.hdf5"
+    synthetic.write_swift(
+        fname, num_part=(2000, 2000, 0, 0, 100, 10), compression="gzip"
+    )
+    return fname
+
+
+@pytest.mark.parametrize("executor", ["auto", "process", "thread"])
+def test_instance_fields_in_workers(compressed_snapshot, executor):
+    with SwiftFrontend(compressed_snapshot, cache_size=0) as data:
+        data.derive("Speed", "Velocities", lambda v: np.sqrt((v**2).sum(axis=1)))
+        data.gas.alias("Positions", "Coordinates")
+        data.gas.alias("Energy", "InternalEnergies")
+        fields = [
+            ("gas", "Speed"),
+            ("dark_matter", "Speed"),
+            ("gas", "Positions"),
+            ("gas", "Energy"),
+            ("gas", "StarFormationRate"),
+            ("gas", "Masses"),
+        ]
+        loaded = data.load_fields(fields, workers=2, executor=executor)
+        for (ptype, name), values in loaded.items():
+            particles = getattr(data, ptype)
+            expected = particles.read_rows(name, 0, len(values))
+            assert np.array_equal(values, expected), (ptype, name)
+            assert str(values.units) == str(expected.units)
@@ -0,0 +1,19 @@
+from snap_conv import SwiftFrontend
+
+
+def test_prefetch_does_not_evict(swift_snapshot):
+    # 2000 particles: 48000 bytes of coordinates, 8000 of masses.
+    with SwiftFrontend(swift_snapshot, cache_size=60000) as data:
+        data.dark_matter.load("Coordinates")
+        request = data.prefetch({"gas": ["Coordinates", "Masses"]}).wait()
+        assert request.skipped == [("gas", "Coordinates")]
+        assert request.loaded == [("gas", "Masses")]
+        assert ("PartType1", "Coordinates") in data.cache
+        assert data.cache_stats.evictions == 0
+
+
+def test_prefetch_of_cached_fields(swift_snapshot):
+    with SwiftFrontend(swift_snapshot, cache_size=50000) as data:
+        data.gas.load("Coordinates")
+        request = data.prefetch([("gas", "Coordinates")]).wait()
+        assert request.loaded == [("gas", "Coordinates")]
@@ -0,0 +1,51 @@
+import h5py
+import numpy as np
+import pytest
+import synthetic
+
+from snap_conv import SnapshotSeries
+
+
+@pytest.fixture
+def series_files(tmp_path):
+    fnames = [tmp_path / f"snap_{i:04d}.hdf5" for i in range(3)]
+    for i, fname in enumerate(fnames):
+        synthetic.write_swift(fname, num_part=(200, 200, 0, 0, 0, 0), seed=i)
+    return fnames
+
+
+def test_matching_snapshots(series_files):
+    with SnapshotSeries(series_files) as series:
+        for member in series:
+            assert member.gas.Masses.shape == (200,)
+        assert series[2].gas.Masses.units == series[0].gas.Masses.units
+        # Members take the schema's layout and unit objects rather than copies.
+        schema = series.schema
+        for group in ("PartType0", "PartType1"):
+            assert series[1]._group_layout(group) is schema.fields[group]
+            unit = series[2]._get_unit(group, "Coordinates")
+            assert unit is schema.units[group]["Coordinates"]
+
+
+def test_dtype_mismatch_is_reported(series_files):
+    with h5py.File(series_files[1], "r+") as f:
+        attrs = dict(f["PartType0/Masses"].attrs)
+        data = f["PartType0/Masses"][:].astype(np.float64)
+        del f["PartType0/Masses"]
+        f["PartType0/Masses"] = data
+        f["PartType0/Masses"].attrs.update(attrs)
+    with SnapshotSeries(series_files) as series:
+        series[0].gas
+        with pytest.raises(ValueError, match=r"snap_0001.*PartType0/Masses.*dtype"):
+            series[1].gas
+
+
+def test_unit_mismatch_is_reported(series_files):
+    with h5py.File(series_files[2], "r+") as f:
+        f["PartType1/Coordinates"].attrs[synthetic._cgs_name] = [3.08567758e21]
+    with SnapshotSeries(series_files) as series:
+        series[1].dark_matter
+        with pytest.raises(
+            ValueError, match=r"snap_0002.*PartType1/Coordinates.*units"
+        ):
+            series[2].dark_matter
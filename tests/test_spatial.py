@@ -0,0 +1,80 @@
+import os
+
+import numpy as np
+import pytest
+
+from snap_conv import GadgetFrontend, SwiftFrontend
+from snap_conv.frontends import hdf5
+from snap_conv.frontends.spatial import SpatialIndex, morton_keys
+
+
+@pytest.fixture
+def indexed(swift_snapshot):
+    with SwiftFrontend(swift_snapshot) as data:
+        data.build_spatial_index(level=3, save=True)
+    return swift_snapshot
+
+
+def test_build_orders_by_morton_key(indexed):
+    with SwiftFrontend(indexed) as data:
+        index = data.spatial_index
+        assert isinstance(index, SpatialIndex)
+        for group in ("PartType0", "PartType1"):
+            coords = data.particles(group).load("Coordinates").v
+            keys = morton_keys(coords, index.box)
+            order = np.asarray(index.orders[group])
+            assert np.array_equal(np.sort(order), np.arange(len(coords)))
+            assert np.all(np.diff(keys[order].astype(np.float64)) >= 0)
+            assert index.offsets[group][-1] == len(coords)
+
+
+def test_saved_index_goes_stale(indexed):
+    os.utime(indexed, ns=(1, 1))
+    with SwiftFrontend(indexed) as data:
+        assert data.spatial_index is None
+
+
+@pytest.mark.parametrize("half_width", [1.0, 3.0, 20.0])
+def test_region_matches_brute_force(indexed, half_width):
+    center = np.array([2.0, 20.0, 12.5])
+    with SwiftFrontend(indexed) as data:
+        coords = data.gas.load("Coordinates")
+        box = data.header.box_size.to(coords.units).v
+        coords = coords.v
+        offset = (coords - center + box / 2) % box - box / 2
+        expected = np.flatnonzero(np.all(np.abs(offset) <= half_width, axis=1))
+
+        rows = data.spatial_index.query("PartType0", center, half_width)
+        assert np.all(np.isin(expected, rows))
+        region = data.region(center, half_width, fields=["Masses"], ptypes=["gas"])
+        assert np.array_equal(np.sort(region.gas.rows), expected)
+
+
+def test_reorder(indexed, tmp_path):
+    with SwiftFrontend(indexed) as data:
+        order = np.asarray(data.spatial_index.orders["PartType0"])
+        data.write_as(GadgetFrontend, tmp_path / "whole.hdf5", reorder=True)
+        ids = np.asarray(data.gas.load("ParticleIDs"))
+    with GadgetFrontend(tmp_path / "whole.hdf5") as out:
+        assert np.array_equal(np.asarray(out.gas.load("ParticleIDs")), ids[order])
+
+
+def test_reorder_streams_in_bounded_reads(indexed, tmp_path, monkeypatch):
+    monkeypatch.setattr(hdf5, "_span_bytes", 4096)
+    with SwiftFrontend(indexed, cache_size=0) as data:
+        data.write_as(GadgetFrontend, tmp_path / "whole.hdf5", reorder=True)
+        events = []
+        data.instrument(events.append)
+        data.write_as(
+            GadgetFrontend, tmp_path / "chunked.hdf5", reorder=True, chunk_bytes=8192
+        )
+        reads = [e.nbytes for e in events if e.kind == "read"]
+        assert reads and max(reads) <= 8192
+    with (
+        GadgetFrontend(tmp_path / "whole.hdf5") as a,
+        GadgetFrontend(tmp_path / "chunked.hdf5") as b,
+    ):
+        for name in ("Coordinates", "Masses", "ParticleIDs"):
+            assert np.array_equal(
+                np.asarray(a.gas.load(name)), np.asarray(b.gas.load(name))
+            )
@@ -0,0 +1,115 @@
+import numpy as np
+import pytest
+import unyt as u
+
+from snap_conv import GadgetFrontend, SwiftFrontend
+from snap_conv.frontends.units import (
+    CONVERT,
+    METADATA,
+    NOOP,
+    SCALE,
+    apply_conversion,
+    deferred,
+    plan_conversion,
+)
+
+
+@pytest.mark.parametrize(
+    "source, target, dtype, self_describing, strategy",
+    [
+        (u.Mpc, u.Mpc, np.float32, False, NOOP),
+        (None, u.Mpc, np.float32, False, NOOP),
+        (u.Mpc, None, np.float32, False, NOOP),
+        (u.g / u.s, u.kg / u.ks, np.float32, False, NOOP),
+        (u.Mpc, u.kpc, np.float32, True, METADATA),
+        (u.Mpc, u.kpc, np.float64, False, SCALE),
+        (u.Mpc, u.kpc, np.int64, False, CONVERT),
+        (u.degC, u.K, np.float64, False, CONVERT),
+        (u.degC, u.K, np.float64, True, CONVERT),
+    ],
+)
+def test_plan(source, target, dtype, self_describing, strategy):
+    conversion = plan_conversion(source, target, np.dtype(dtype), self_describing)
+    assert conversion.strategy == strategy
+    if strategy == SCALE:
+        assert conversion.factor == 1000.0
+        assert conversion.unit == u.kpc
+    if strategy == METADATA:
+        assert conversion.unit == u.Mpc
+
+
+def test_plan_rejects_other_dimensions():
+    with pytest.raises(u.exceptions.UnitConversionError):
+        plan_conversion(u.Mpc, u.Msun, np.dtype(np.float32))
+
+
+def test_scale_in_place_only_when_owned():
+    conversion = plan_conversion(u.Mpc, u.kpc, np.dtype(np.float64))
+    shared = u.unyt_array(np.arange(4.0), u.Mpc)
+    data, _ = apply_conversion(shared, conversion)
+    assert np.array_equal(shared.v, np.arange(4.0))
+    assert np.array_equal(data.to(u.Mpc).v, np.arange(4.0))
+
+    owned = u.unyt_array(np.arange(4.0), u.Mpc)
+    data, _ = apply_conversion(owned, conversion, owned=True)
+    assert np.shares_memory(data, owned)
+    assert data.units == u.kpc and data[1] == 1000 * u.kpc
+
+    read_only = u.unyt_array(np.arange(4.0), u.Mpc)
+    read_only.flags.writeable = False
+    data, _ = apply_conversion(read_only, conversion, owned=True)
+    assert not np.shares_memory(data, read_only)
+
+
+def test_apply_deferred_and_convert():
+    data, conversion = apply_conversion(
+        u.unyt_array(np.arange(3), u.Mpc), deferred(u.kpc)
+    )
+    assert conversion.strategy == CONVERT
+    assert data.dtype.kind == "f" and data[2] == 2000 * u.kpc
+    data, conversion = apply_conversion(
+        u.unyt_array(np.ones(3), u.Mpc), deferred(u.kpc, self_describing=True)
+    )
+    assert conversion.strategy == METADATA and data.units == u.Mpc
+
+
+def test_write_reports_strategies(swift_snapshot, tmp_path):
+    with SwiftFrontend(swift_snapshot) as data:
+        report = data.write_as(GadgetFrontend, tmp_path / "gadget.hdf5")
+        assert report[("PartType0", "Coordinates")] == SCALE
+        assert report[("PartType0", "ParticleIDs")] == NOOP
+    with GadgetFrontend(tmp_path / "gadget.hdf5") as data:
+        report = data.write_as(SwiftFrontend, tmp_path / "swift.hdf5")
+        assert report[("PartType0", "Coordinates")] == METADATA
+        report = data.write_as(
+            SwiftFrontend, tmp_path / "converted.hdf5", units="convert"
+        )
+        assert report[("PartType0", "Coordinates")] == SCALE
+    with (
+        SwiftFrontend(swift_snapshot) as original,
+        SwiftFrontend(tmp_path / "swift.hdf5") as kept,
+        SwiftFrontend(tmp_path / "converted.hdf5") as converted,
+    ):
+        expected = original.gas.load("Coordinates")
+        for data in (kept, converted):
+            coords = data.gas.load("Coordinates").to(expected.units)
+            assert np.allclose(coords.v, expected.v, rtol=1e-6)
+
+
+@pytest.mark.parametrize(
+    "kwargs", [{}, {"chunk_bytes": 4096}, {"workers": 2}, {"reorder": True}]
+)
+def test_cached_fields_are_not_scaled(swift_snapshot, tmp_path, kwargs):
+    if kwargs.get("reorder"):
+        with SwiftFrontend(swift_snapshot) as data:
+            data.build_spatial_index(level=2)
+    with SwiftFrontend(swift_snapshot) as data:
+        coords = data.gas.load("Coordinates")
+        before = coords.copy()
+        for _ in range(2):
+            report = data.write_as(GadgetFrontend, tmp_path / "out.hdf5", **kwargs)
+            assert report[("PartType0", "Coordinates")] == SCALE
+        assert data.cache.peek(("PartType0", "Coordinates")) is not None
+        assert np.array_equal(data.gas.load("Coordinates"), before)
+        assert coords.units == before.units
+        assert np.array_equal(coords, before)
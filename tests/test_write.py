@@ -0,0 +1,54 @@
+import h5py
+import numpy as np
+import pytest
+
+from snap_conv import GadgetFrontend, SwiftFrontend
+
+
+def _assert_same_files(a, b):
+    with h5py.File(a, "r") as fa, h5py.File(b, "r") as fb:
+        names = []
+        fa.visit(names.append)
+        other = []
+        fb.visit(other.append)
+        assert names == other
+        for name in names:
+            if isinstance(fa[name], h5py.Dataset):
+                assert fa[name].dtype == fb[name].dtype
+                assert np.array_equal(fa[name][()], fb[name][()])
+            assert dict(fa[name].attrs).keys() == dict(fb[name].attrs).keys()
+
+
+@pytest.mark.parametrize("chunk_bytes", [4096, 100_000])
+@pytest.mark.parametrize(
+    "source, target",
+    [
+        (SwiftFrontend, GadgetFrontend),
+        (GadgetFrontend, SwiftFrontend),
+    ],
+)
+def test_streamed_output_matches_whole_fields(
+    swift_snapshot, tmp_path, source, target, chunk_bytes
+):
+    fname = swift_snapshot
+    if source is GadgetFrontend:
+        with SwiftFrontend(swift_snapshot) as data:
+            data.write_as(GadgetFrontend, tmp_path / "gadget.hdf5")
+        fname = tmp_path / "gadget.hdf5"
+    with source(fname) as data:
+        data.write_as(target, tmp_path / "whole.hdf5")
+    with source(fname, cache_size=0) as data:
+        data.write_as(target, tmp_path / "streamed.hdf5", chunk_bytes=chunk_bytes)
+    _assert_same_files(tmp_path / "whole.hdf5", tmp_path / "streamed.hdf5")
+
+
+def test_alias_to_missing_field(swift_snapshot, tmp_path):
+    with h5py.File(swift_snapshot, "a") as f:
+        del f["PartType4/BirthScaleFactors"]
+    with SwiftFrontend(swift_snapshot) as data:
+        assert not data.stars.has("StellarFormationTime")
+        assert data.stars.has("Masses")
+        data.write_as(GadgetFrontend, tmp_path / "out.hdf5", chunk_bytes=4096)
+    with h5py.File(tmp_path / "out.hdf5", "r") as f:
+        assert "StellarFormationTime" not in f["PartType4"]
+        assert "Masses" in f["PartType4"]